@@ -3,43 +3,87 @@ import json
 import re
 import subprocess
 import sys
+import tempfile
 from pathlib import Path
+from statistics import fmean
 from time import time
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from pytest_pyodide import (  # noqa: E402
-    SeleniumChromeRunner,
-    SeleniumFirefoxRunner,
-    spawn_web_server,
-)
+from history import record_run  # noqa: E402
 
 SKIP = {"fft", "hyantes"}
 
+# name -> (packages to load, modules to import) for the cold start benchmarks
+COLD_START_SCENARIOS = {
+    "python": ([], []),
+    "numpy": (["numpy"], ["numpy"]),
+    "pandas": (["pandas"], ["pandas"]),
+    "xarray": (["xarray"], ["xarray"]),
+}
+
 
 def print_entry(name, res):
     print(" - ", name)
     print(" " * 4, end="")
-    for res_name, dt in res.items():
-        print(f"{res_name}: {dt:.6f}  ", end="")
+    for res_name, samples in res.items():
+        print(f"{res_name}: {trimmed_mean(samples):.6f}  ", end="")
     print("")
 
 
-def run_native(code):
+def trimmed_mean(samples):
+    """The mean of the samples without the fastest and the slowest one."""
+    samples = sorted(samples)
+    if len(samples) > 2:
+        samples = samples[1:-1]
+    return fmean(samples) if samples else float("NaN")
+
+
+def parse_samples(output):
+    """Parse the samples printed as a JSON list on the last line of the output
+    of a benchmark script."""
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_script(cmd, timeout, env=None):
+    """Run a benchmark script and return its samples. A benchmark that fails or
+    times out has no samples, so that it doesn't stop the other ones."""
+    try:
+        output = subprocess.check_output(
+            cmd,
+            cwd=Path(__file__).resolve().parent,
+            env=env,
+            timeout=timeout,
+            text=True,
+        )
+    except subprocess.TimeoutExpired:
+        print(f"Timed out after {timeout} seconds", file=sys.stderr)
+        return []
+    except subprocess.CalledProcessError as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        return []
+    return parse_samples(output)
+
+
+def run_native(code, timeout=None):
     if "# non-native" in code:
-        return float("NaN")
+        return []
 
     root = Path(__file__).resolve().parents[1]
-    output = subprocess.check_output(
+    return run_script(
         [sys.executable, "-c", code],
-        cwd=Path(__file__).resolve().parent,
+        timeout,
         env={
             "PYTHONPATH": str(root / "src/py/lib")
             + ":"
             + str(root / "packages" / ".artifacts" / "lib" / "python")
         },
     )
-    return float(output.strip().split()[-1])
+
+
+def run_node(code, python, timeout):
+    """Run a benchmark script with the Pyodide command line runner in Node."""
+    return run_script([str(python), "-c", code], timeout)
 
 
 def run_wasm(code, selenium, interrupt_buffer):
@@ -53,25 +97,86 @@ def run_wasm(code, selenium, interrupt_buffer):
 
     selenium.run(code)
     try:
-        runtime = float(selenium.logs.split("\n")[-1])
+        return parse_samples(selenium.logs)
     except ValueError:
         print(selenium.logs)
         raise
-    return runtime
 
 
-def run_all(selenium_backends, code):
-    result = {"native": run_native(code)}
+def run_all(selenium_backends, code, timeout=None):
+    result = {"native": run_native(code, timeout)}
 
     for browser_name, selenium in selenium_backends.items():
         for interrupt_buffer in [False, True]:
-            dt = run_wasm(code, selenium, interrupt_buffer)
+            samples = run_wasm(code, selenium, interrupt_buffer)
             if interrupt_buffer:
                 browser_name += "(w/ ib)"
-            result[browser_name] = dt
+            result[browser_name] = samples
     return result
 
 
+def run_cold_start_once(node, dist_dir, packages=(), imports=(), snapshot=None):
+    cmd = [
+        node,
+        str(Path(__file__).resolve().parent / "cold_start.mjs"),
+        str(dist_dir),
+        "--packages",
+        ",".join(packages),
+        "--imports",
+        ",".join(imports),
+    ]
+    if snapshot:
+        cmd += ["--snapshot", str(snapshot)]
+    output = subprocess.check_output(cmd, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_cold_start(node, dist_dir, repeat):
+    """Run each cold start scenario ``repeat`` times in fresh Node processes and
+    yield the durations of each phase."""
+
+    def measure(name, **kwargs):
+        try:
+            runs = [
+                run_cold_start_once(node, dist_dir, **kwargs) for _ in range(repeat)
+            ]
+        except subprocess.CalledProcessError as e:
+            print(f"Skipping cold start {name}: {e}", file=sys.stderr)
+            return
+        for phase in runs[0]:
+            times = [run[phase] for run in runs if phase in run]
+            yield f"cold start {name}: {phase}", {"node": times}
+
+    lock_file = Path(dist_dir) / "pyodide-lock.json"
+    built = set(json.loads(lock_file.read_text())["packages"])
+    for name, (packages, imports) in COLD_START_SCENARIOS.items():
+        if missing := [pkg for pkg in packages if pkg not in built]:
+            print(
+                f"Skipping cold start {name}: {', '.join(missing)} not built",
+                file=sys.stderr,
+            )
+            continue
+        yield from measure(name, packages=packages, imports=imports)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot = Path(tmpdir) / "snapshot.bin"
+        try:
+            subprocess.run(
+                [
+                    node,
+                    str(Path(__file__).resolve().parent / "cold_start.mjs"),
+                    str(dist_dir),
+                    "--make-snapshot",
+                    str(snapshot),
+                ],
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"Skipping cold start snapshot: {e}", file=sys.stderr)
+            return
+        yield from measure("snapshot", snapshot=snapshot)
+
+
 def parse_benchmark(filename):
     lines = []
     with open(filename) as fp:
@@ -83,7 +188,7 @@ def parse_benchmark(filename):
     return "".join(lines)
 
 
-def get_benchmark_scripts(scripts_dir, repeat=5, number=5):
+def get_benchmark_scripts(scripts_dir, repeat=5, number=5, warmup=0):
     root = Path(__file__).resolve().parent / scripts_dir
     for filename in sorted(root.iterdir()):
         name = filename.stem
@@ -98,41 +203,44 @@ def get_benchmark_scripts(scripts_dir, repeat=5, number=5):
             f"setup = setup + '\\nfrom __main__ import {name}'\n"
             "from timeit import Timer\n"
             "t = Timer(run, setup)\n"
+            f"for _ in range({warmup}): t.timeit({number})\n"
             f"r = t.repeat({repeat}, {number})\n"
-            "r.remove(min(r))\n"
-            "r.remove(max(r))\n"
-            "print(np.mean(r))\n"
+            "import json\n"
+            "print(json.dumps(r))\n"
         )
 
         yield name, content
 
 
-def get_pystone_benchmarks():
-    return get_benchmark_scripts("benchmarks/pystone_benchmarks", repeat=5, number=1)
+def get_pystone_benchmarks(**kwargs):
+    return get_benchmark_scripts(
+        "benchmarks/pystone_benchmarks", **{"repeat": 5, "number": 1, **kwargs}
+    )
 
 
-def get_numpy_benchmarks():
-    return get_benchmark_scripts("benchmarks/numpy_benchmarks")
+def get_numpy_benchmarks(**kwargs):
+    return get_benchmark_scripts("benchmarks/numpy_benchmarks", **kwargs)
 
 
-def get_matplotlib_benchmarks():
-    return get_benchmark_scripts("benchmarks/matplotlib_benchmarks")
+def get_matplotlib_benchmarks(**kwargs):
+    return get_benchmark_scripts("benchmarks/matplotlib_benchmarks", **kwargs)
 
 
-def get_pandas_benchmarks():
-    return get_benchmark_scripts("benchmarks/pandas_benchmarks")
+def get_pandas_benchmarks(**kwargs):
+    return get_benchmark_scripts("benchmarks/pandas_benchmarks", **kwargs)
 
 
-def get_benchmarks(benchmarks, targets=("all",)):
+def get_benchmarks(benchmarks, targets=("all",), **kwargs):
     if "all" in targets:
         for benchmark in benchmarks.values():
-            yield from benchmark()
+            yield from benchmark(**kwargs)
     else:
         for target in targets:
-            yield from benchmarks[target]()
+            yield from benchmarks[target](**kwargs)
 
 
 def parse_args(benchmarks):
+    benchmarks.append("cold-start")
     benchmarks.append("all")
 
     parser = argparse.ArgumentParser("Run benchmarks on Pyodide's performance")
@@ -152,33 +260,97 @@ def parse_args(benchmarks):
         "--timeout",
         default=1200,
         type=int,
-        help="Browser timeout(sec) for each benchmark (default: %(default)s)",
+        help="Timeout(sec) for each benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--runner",
+        choices=["selenium", "node"],
+        default="selenium",
+        help=(
+            "Run the benchmarks in Firefox and Chrome with selenium or in Node "
+            "with the Pyodide command line runner (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--python",
+        default=str(Path(__file__).parents[1] / "dist" / "python"),
+        help=(
+            "Pyodide command line runner for --runner=node. It needs to be able "
+            "to import the packages the benchmarks use, e.g. the python of a "
+            "Pyodide virtual environment (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help=(
+            "Number of measurements of each benchmark, the fastest and the "
+            "slowest are discarded (default: depends on the benchmark)"
+        ),
+    )
+    parser.add_argument(
+        "--history",
+        help=(
+            "Append the raw samples of this run to this JSON file, see "
+            "benchmark/history.py for comparing runs"
+        ),
+    )
+    parser.add_argument(
+        "--label",
+        help="Label of this run in the history file, e.g. a version",
+    )
+    parser.add_argument(
+        "--warmup",
+        default=0,
+        type=int,
+        help="Number of unmeasured runs before each benchmark (default: %(default)s)",
     )
     parser.add_argument(
         "--dist-dir",
         default=str(Path(__file__).parents[1] / "dist"),
         help="Pyodide dist directory (default: %(default)s)",
     )
+    parser.add_argument(
+        "--node",
+        default="node",
+        help="Node executable for the cold-start benchmarks (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cold-start-repeat",
+        default=5,
+        type=int,
+        help="Number of runs of each cold-start benchmark (default: %(default)s)",
+    )
 
     return parser.parse_args()
 
 
-def main():
-    BENCHMARKS = {
-        "pystone": get_pystone_benchmarks,
-        "numpy": get_numpy_benchmarks,
-        # TODO: matplotlib benchmark occasionally fails after https://github.com/pyodide/pyodide/pull/3130
-        #       but it is not clear why.
-        # "matplotlib": get_matplotlib_benchmarks,
-        "pandas": get_pandas_benchmarks,
-    }
+def benchmark_options(args):
+    options = {"warmup": args.warmup}
+    if args.repeat is not None:
+        options["repeat"] = args.repeat
+    return options
 
-    args = parse_args(list(BENCHMARKS.keys()))
-    targets = [t.lower() for t in args.target]
-    output = Path(args.output).resolve()
-    timeout = args.timeout
 
-    results = {}
+def run_node_benchmarks(benchmarks, targets, args, results):
+    for benchmark_name, content in get_benchmarks(
+        benchmarks, targets, **benchmark_options(args)
+    ):
+        results[benchmark_name] = {
+            "native": run_native(content, args.timeout),
+            "node": run_node(content, args.python, args.timeout),
+        }
+        print_entry(benchmark_name, results[benchmark_name])
+
+
+def run_selenium_benchmarks(benchmarks, targets, args, results):
+    from pytest_pyodide import (
+        SeleniumChromeRunner,
+        SeleniumFirefoxRunner,
+        spawn_web_server,
+    )
+
+    timeout = args.timeout
     selenium_backends = {}
     browser_cls = [
         ("firefox", SeleniumFirefoxRunner),
@@ -187,13 +359,13 @@ def main():
 
     with spawn_web_server(args.dist_dir) as (hostname, port, log_path):
         # selenium initialization time
-        result = {"native": float("NaN")}
+        result = {"native": []}
         for browser_name, cls in browser_cls:
             try:
                 t0 = time()
                 selenium = cls(port)
                 selenium.set_script_timeout(timeout)
-                result[browser_name] = time() - t0
+                result[browser_name] = [time() - t0]
             finally:
                 selenium.driver.quit()
 
@@ -202,14 +374,14 @@ def main():
 
         # package loading time
         for package_name in ["numpy", "pandas", "matplotlib"]:
-            result = {"native": float("NaN")}
+            result = {"native": []}
             for browser_name, cls in browser_cls:
                 selenium = cls(port)
                 selenium.set_script_timeout(timeout)
                 try:
                     t0 = time()
                     selenium.load_package(package_name)
-                    result[browser_name] = time() - t0
+                    result[browser_name] = [time() - t0]
                 finally:
                     selenium.driver.quit()
 
@@ -217,7 +389,9 @@ def main():
             print_entry(f"load {package_name}", result)
 
         # run benchmarks
-        for benchmark_name, content in get_benchmarks(BENCHMARKS, targets):
+        for benchmark_name, content in get_benchmarks(
+            benchmarks, targets, **benchmark_options(args)
+        ):
             try:
                 # instantiate browsers for each benchmark to prevent side effects
                 for browser_name, cls in browser_cls:
@@ -228,14 +402,53 @@ def main():
                         ["numpy", "matplotlib", "pandas"]
                     )
 
-                results[benchmark_name] = run_all(selenium_backends, content)
+                results[benchmark_name] = run_all(selenium_backends, content, timeout)
                 print_entry(benchmark_name, results[benchmark_name])
             finally:
                 for selenium in selenium_backends.values():
                     selenium.driver.quit()
 
+
+def main():
+    BENCHMARKS = {
+        "pystone": get_pystone_benchmarks,
+        "numpy": get_numpy_benchmarks,
+        # TODO: matplotlib benchmark occasionally fails after https://github.com/pyodide/pyodide/pull/3130
+        #       but it is not clear why.
+        # "matplotlib": get_matplotlib_benchmarks,
+        "pandas": get_pandas_benchmarks,
+    }
+
+    args = parse_args(list(BENCHMARKS.keys()))
+    targets = [t.lower() for t in args.target]
+    output = Path(args.output).resolve()
+
+    results = {}
+    if "all" in targets or "cold-start" in targets:
+        for name, result in run_cold_start(
+            args.node, args.dist_dir, args.cold_start_repeat
+        ):
+            results[name] = result
+            print_entry(name, result)
+        targets = [t for t in targets if t != "cold-start"]
+
+    if targets and args.runner == "node":
+        run_node_benchmarks(BENCHMARKS, targets, args, results)
+    elif targets:
+        run_selenium_benchmarks(BENCHMARKS, targets, args, results)
+
+    # results contains all samples, the output file only the trimmed means.
     output.parent.mkdir(exist_ok=True, parents=True)
-    output.write_text(json.dumps(results))
+    output.write_text(
+        json.dumps(
+            {
+                name: {runner: trimmed_mean(samples) for runner, samples in res.items()}
+                for name, res in results.items()
+            }
+        )
+    )
+    if args.history:
+        record_run(args.history, results, label=args.label)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+// Measure a cold start of Pyodide in a fresh Node process and print the
+// duration of each phase in seconds as JSON. This is run by benchmark.py, see
+// the cold-start target there.
+//
+// Usage:
+//   node cold_start.mjs DIST_DIR [--packages a,b] [--imports a,b]
+//     [--snapshot FILE] [--make-snapshot FILE]
+
+import { readFile, writeFile } from "node:fs/promises";
+import { resolve } from "node:path";
+import { pathToFileURL } from "node:url";
+import { parseArgs } from "node:util";
+
+const { values: args, positionals } = parseArgs({
+  options: {
+    packages: { type: "string", default: "" },
+    imports: { type: "string", default: "" },
+    snapshot: { type: "string" },
+    "make-snapshot": { type: "string" },
+  },
+  allowPositionals: true,
+});
+
+const splitList = (value) => value.split(",").filter((item) => item);
+
+const distDir = resolve(positionals[0]);
+const { loadPyodide } = await import(
+  pathToFileURL(`${distDir}/pyodide.mjs`).href
+);
+
+if (args["make-snapshot"]) {
+  const pyodide = await loadPyodide({ indexURL: distDir, _makeSnapshot: true });
+  await writeFile(args["make-snapshot"], pyodide.makeMemorySnapshot());
+  process.exit(0);
+}
+
+const options = { indexURL: distDir };
+if (args.snapshot) {
+  options._loadSnapshot = readFile(args.snapshot);
+}
+
+const result = {};
+const secondsSince = (start) => (performance.now() - start) / 1000;
+
+let start = performance.now();
+const pyodide = await loadPyodide(options);
+result.loadPyodide = secondsSince(start);
+for (const [phase, duration] of Object.entries(pyodide._api.startupTimings)) {
+  result[phase] = duration / 1000;
+}
+
+const packages = splitList(args.packages);
+if (packages.length > 0) {
+  start = performance.now();
+  const loaded = await pyodide.loadPackage(packages, {
+    messageCallback() {},
+  });
+  result.loadPackage = secondsSince(start);
+  for (const phase of ["download", "extract", "dynlibLoad", "dynlibLookup"]) {
+    result[`package ${phase}`] =
+      loaded.reduce((sum, pkg) => sum + (pkg.timings?.[phase] ?? 0), 0) / 1000;
+  }
+}
+
+for (const name of splitList(args.imports)) {
+  start = performance.now();
+  pyodide.runPython(`import ${name}`);
+  result[`import ${name}`] = secondsSince(start);
+}
+
+console.log(JSON.stringify(result));
@@ -0,0 +1,252 @@
+"""
+Store benchmark results per commit and detect regressions.
+
+benchmark.py appends every run to a JSON history file when it is called with
+--history. This script compares two runs from that file:
+
+    python benchmark/history.py compare dist/benchmark-history.json \
+        --baseline v0.27.0 --threshold 0.05
+
+For each benchmark it prints the mean time with its confidence interval for
+both runs and flags a regression if the candidate is significantly slower than
+the baseline (Welch's t-test) by more than the threshold. The exit status is 1
+if there are regressions and 0 otherwise.
+"""
+
+import argparse
+import json
+import math
+import subprocess
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
+from statistics import NormalDist, fmean, variance
+
+
+def t_quantile(p, df):
+    """The p-quantile of Student's t-distribution with df degrees of freedom.
+
+    Exact for one and two degrees of freedom and a Cornish-Fisher expansion
+    otherwise. Non-integer degrees of freedom are rounded down, which only
+    widens the intervals.
+    """
+    df = max(1, math.floor(df))
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    terms = [
+        (z**3 + z) / 4,
+        (5 * z**5 + 16 * z**3 + 3 * z) / 96,
+        (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384,
+        (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160,
+    ]
+    return z + sum(term / df ** (i + 1) for i, term in enumerate(terms))
+
+
+def confidence_interval(samples, confidence=0.95):
+    """Confidence interval of the mean of ``samples`` as (low, high)."""
+    mean = fmean(samples)
+    if len(samples) < 2:
+        return mean, mean
+    half_width = t_quantile((1 + confidence) / 2, len(samples) - 1) * math.sqrt(
+        variance(samples) / len(samples)
+    )
+    return mean - half_width, mean + half_width
+
+
+def difference_interval(baseline, candidate, confidence=0.95):
+    """Welch confidence interval of ``mean(candidate) - mean(baseline)``."""
+    var_b = variance(baseline) / len(baseline)
+    var_c = variance(candidate) / len(candidate)
+    diff = fmean(candidate) - fmean(baseline)
+    if var_b + var_c == 0:
+        return diff, diff
+    df = (var_b + var_c) ** 2 / (
+        var_b**2 / (len(baseline) - 1) + var_c**2 / (len(candidate) - 1)
+    )
+    half_width = t_quantile((1 + confidence) / 2, df) * math.sqrt(var_b + var_c)
+    return diff - half_width, diff + half_width
+
+
+def compare_samples(baseline, candidate, threshold=0.05, confidence=0.95):
+    """Compare the samples of one benchmark from two runs.
+
+    Returns
+    -------
+        A tuple of the relative change of the mean and a status, one of
+        "regression", "improvement", "unchanged" or "insufficient samples".
+    """
+    baseline = [x for x in baseline if not math.isnan(x)]
+    candidate = [x for x in candidate if not math.isnan(x)]
+    if len(baseline) < 2 or len(candidate) < 2:
+        return float("nan"), "insufficient samples"
+
+    base_mean = fmean(baseline)
+    change = (fmean(candidate) - base_mean) / base_mean
+    low, high = difference_interval(baseline, candidate, confidence)
+    if low > 0 and change > threshold:
+        return change, "regression"
+    if high < 0 and change < -threshold:
+        return change, "improvement"
+    return change, "unchanged"
+
+
+def current_commit(cwd):
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=cwd, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.exists():
+        return {"runs": []}
+    return json.loads(path.read_text())
+
+
+def record_run(path, samples, label=None, commit=None):
+    """Append the raw samples of a benchmark run to the history file.
+
+    Parameters
+    ----------
+    samples
+        A dict of benchmark name -> runner -> list of measured times.
+    """
+    path = Path(path)
+    history = load_history(path)
+    history["runs"].append(
+        {
+            "commit": commit or current_commit(Path(__file__).parent),
+            "label": label,
+            "timestamp": datetime.now(UTC).isoformat(),
+            "samples": samples,
+        }
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(history, indent=1))
+
+
+def find_run(history, ref):
+    """Find the latest run whose label is ``ref`` or whose commit starts with
+    ``ref``."""
+    for run in reversed(history["runs"]):
+        if run.get("label") == ref or run["commit"].startswith(ref):
+            return run
+    raise LookupError(f"No run matching {ref!r} in the history")
+
+
+def compare_runs(baseline, candidate, threshold=0.05, confidence=0.95):
+    """Yield (benchmark, runner, baseline CI, candidate CI, change, status) for
+    each benchmark that is in both runs."""
+    for name, runners in candidate["samples"].items():
+        for runner, samples in runners.items():
+            base_samples = baseline["samples"].get(name, {}).get(runner)
+            if not base_samples:
+                continue
+            change, status = compare_samples(
+                base_samples, samples, threshold, confidence
+            )
+            yield (
+                name,
+                runner,
+                confidence_interval(base_samples, confidence),
+                confidence_interval(samples, confidence),
+                change,
+                status,
+            )
+
+
+def format_interval(interval):
+    low, high = interval
+    return f"{(low + high) / 2:.6f} ± {(high - low) / 2:.6f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List the recorded runs")
+    list_parser.add_argument("history", help="The history file")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two runs")
+    compare_parser.add_argument("history", help="The history file")
+    compare_parser.add_argument(
+        "--baseline",
+        help="Label or commit of the baseline run (default: the second to last run)",
+    )
+    compare_parser.add_argument(
+        "--candidate",
+        help="Label or commit of the run to check (default: the last run)",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="Relative slowdown below which changes are ignored (default: %(default)s)",
+    )
+    compare_parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the intervals (default: %(default)s)",
+    )
+    compare_parser.add_argument(
+        "--json", action="store_true", help="Print the comparison as JSON"
+    )
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.command == "list":
+        for run in history["runs"]:
+            print(run["timestamp"], run["commit"][:12], run.get("label") or "")
+        return 0
+
+    # Exit status 1 means a regression was found, so errors use argparse's 2.
+    runs = history["runs"]
+    if (not args.baseline and len(runs) < 2) or (not args.candidate and not runs):
+        parser.error(
+            f"Need at least two runs to compare, found {len(runs)}; "
+            "pass --baseline and --candidate to pick the runs"
+        )
+    try:
+        candidate = find_run(history, args.candidate) if args.candidate else runs[-1]
+        baseline = find_run(history, args.baseline) if args.baseline else runs[-2]
+    except LookupError as e:
+        parser.error(str(e))
+    rows = list(compare_runs(baseline, candidate, args.threshold, args.confidence))
+
+    if args.json:
+        print(
+            json.dumps(
+                [
+                    {
+                        "benchmark": name,
+                        "runner": runner,
+                        "baseline": base_ci,
+                        "candidate": cand_ci,
+                        "change": change,
+                        "status": status,
+                    }
+                    for name, runner, base_ci, cand_ci, change, status in rows
+                ]
+            )
+        )
+    else:
+        print(f"baseline:  {baseline['commit'][:12]} {baseline.get('label') or ''}")
+        print(f"candidate: {candidate['commit'][:12]} {candidate.get('label') or ''}")
+        for name, runner, base_ci, cand_ci, change, status in rows:
+            print(
+                f"{name} [{runner}]: {format_interval(base_ci)} -> "
+                f"{format_interval(cand_ci)} ({change:+.1%}) {status}"
+            )
+
+    return int(any(row[-1] == "regression" for row in rows))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
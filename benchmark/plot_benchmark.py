@@ -10,20 +10,25 @@ fig, ax = plt.subplots(constrained_layout=True, figsize=(8, 8))
 with open(sys.argv[-2]) as fp:
     content = json.load(fp)
 
+COLORS = {"firefox": "#ff9400", "chrome": "#45a1ff", "node": "#3c873a"}
+runners = [runner for runner in COLORS if any(runner in v for v in content.values())]
+
 results = []
 for k, v in content.items():
-    results.append((k, v["firefox"] / v["native"], v["chrome"] / v["native"]))
-results.sort(key=lambda x: x[1], reverse=True)
+    if "native" not in v or not all(runner in v for runner in runners):
+        # e.g. the cold start benchmarks, which have no native counterpart
+        continue
+    results.append((k, [v[runner] / v["native"] for runner in runners]))
+results.sort(key=lambda x: x[1][0], reverse=True)
 
 names = [x[0] for x in results]
-firefox = [x[1] for x in results]
-chrome = [x[2] for x in results]
 
-width = 0.35
+width = 0.7 / len(runners)
 y_pos = np.arange(len(results))
-ax.barh(y_pos, firefox, width, color="#ff9400", label="firefox")
-ax.barh(y_pos + width, chrome, width, color="#45a1ff", label="chrome")
-ax.set_yticks(y_pos + width / 2)
+for i, runner in enumerate(runners):
+    slowdowns = [x[1][i] for x in results]
+    ax.barh(y_pos + i * width, slowdowns, width, color=COLORS[runner], label=runner)
+ax.set_yticks(y_pos + width * (len(runners) - 1) / 2)
 ax.set_yticklabels(names)
 ax.invert_yaxis()
 ax.set_xlabel("Slowdown factor (WebAssembly:Native)")
@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[1]))
+import history
+
+
+@pytest.mark.parametrize(
+    "p,df,expected",
+    [
+        # Student's t-table
+        (0.975, 1, 12.706),
+        (0.975, 2, 4.303),
+        (0.975, 5, 2.571),
+        (0.975, 10, 2.228),
+        (0.975, 30, 2.042),
+        (0.95, 1, 6.314),
+        (0.95, 2, 2.920),
+        (0.95, 5, 2.015),
+        (0.95, 10, 1.812),
+        (0.95, 30, 1.697),
+        # Non-integer degrees of freedom are rounded down
+        (0.975, 10.9, 2.228),
+    ],
+)
+def test_t_quantile(p, df, expected):
+    assert history.t_quantile(p, df) == pytest.approx(expected, abs=1e-3)
+    assert history.t_quantile(1 - p, df) == pytest.approx(-expected, abs=1e-3)
+
+
+def test_confidence_interval():
+    # mean 3, standard error sqrt(2.5 / 5), t(0.975, 4) = 2.776
+    low, high = history.confidence_interval([1, 2, 3, 4, 5])
+    assert (low + high) / 2 == pytest.approx(3)
+    assert (high - low) / 2 == pytest.approx(2.776 * 0.5**0.5, abs=1e-3)
+    assert history.confidence_interval([2.0]) == (2.0, 2.0)
+
+
+def test_difference_interval():
+    # Welch: the standard error is sqrt(2.5 / 5 + 14 / 3 / 7) = 1.0801 with
+    # 9.97 degrees of freedom, rounded down to 9, so t(0.975, 9) = 2.262
+    low, high = history.difference_interval([1, 2, 3, 4, 5], [3, 4, 5, 6, 7, 8, 9])
+    assert (low + high) / 2 == pytest.approx(3)
+    assert (high - low) / 2 == pytest.approx(2.262 * 1.0801, abs=1e-3)
+
+    assert history.difference_interval([1, 1], [2, 2]) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "candidate,status",
+    [
+        ([1.2, 1.21, 1.19, 1.2], "regression"),
+        ([0.8, 0.81, 0.79, 0.8], "improvement"),
+        # Significant, but below the threshold
+        ([1.02, 1.021, 1.019, 1.02], "unchanged"),
+        # Above the threshold, but not significant
+        ([0.5, 2.0, 0.6, 1.9], "unchanged"),
+        ([1.2, float("nan")], "insufficient samples"),
+    ],
+)
+def test_compare_samples(candidate, status):
+    baseline = [1.0, 1.01, 0.99, 1.0]
+    change, result = history.compare_samples(baseline, candidate, threshold=0.05)
+    assert result == status
+
+
+def run_compare(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["history.py", "compare", *args])
+    return history.main()
+
+
+def test_compare_exit_status(monkeypatch, tmp_path, capsys):
+    path = tmp_path / "history.json"
+    samples = {"bench": {"node": [1.0, 1.01, 0.99, 1.0]}}
+    history.record_run(path, samples, label="base", commit="aaaa")
+
+    # A single run can't be compared with the default baseline
+    for args in [[], ["--candidate", "base"]]:
+        with pytest.raises(SystemExit) as e:
+            run_compare(monkeypatch, str(path), *args)
+        assert e.value.code == 2
+        assert "Need at least two runs" in capsys.readouterr().err
+
+    history.record_run(path, samples, label="same", commit="bbbb")
+    assert run_compare(monkeypatch, str(path)) == 0
+
+    slower = {"bench": {"node": [1.2, 1.21, 1.19, 1.2]}}
+    history.record_run(path, slower, label="slow", commit="cccc")
+    assert run_compare(monkeypatch, str(path)) == 1
+    assert "regression" in capsys.readouterr().out
+    assert run_compare(monkeypatch, str(path), "--candidate", "bbbb") == 0
+
+    with pytest.raises(SystemExit) as e:
+        run_compare(monkeypatch, str(path), "--baseline", "missing")
+    assert e.value.code == 2
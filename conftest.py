@@ -57,6 +57,8 @@ def set_configs():
         pyodide._api.package_loader.get_install_dir;
         pyodide._api.package_loader.unpack_buffer;
         pyodide._api.package_loader.get_dynlibs;
+        pyodide._api.package_loader.cache_package;
+        pyodide._api.package_loader.install_cached_package;
         pyodide._api.pyodide_code.eval_code;
         pyodide._api.pyodide_code.eval_code_async;
         pyodide._api.pyodide_code.relaxed_call
@@ -2,36 +2,102 @@
 
 """Used in test_aiohttp.py"""
 
+import asyncio
 from collections.abc import Iterable
 from contextlib import suppress
 from typing import Any
 
-from aiohttp import ClientSession, ClientTimeout, InvalidURL, hdrs, payload
+from aiohttp import (
+    ClientPayloadError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+    InvalidURL,
+    StreamReader,
+    hdrs,
+    payload,
+)
 from aiohttp.client_reqrep import _merge_ssl_params
 from aiohttp.helpers import TimeoutHandle, get_env_proxy_for_url, strip_auth_from_url
 from multidict import CIMultiDict, istr
 from yarl import URL
 
 
-class Content:
-    __slots__ = ("_jsresp", "_exception")
+class FetchProtocol:
+    """Stands in for the connection protocol of the StreamReader of a response.
 
-    def __init__(self, _jsresp):
-        self._jsresp = _jsresp
-        self._exception = None
+    The StreamReader pauses reading when its buffer is full and resumes it once
+    the buffer has been drained, which pauses reading the body of the fetch.
+    """
 
-    async def read(self):
-        if self._exception:
-            raise self._exception
-        buf = await self._jsresp.arrayBuffer()
-        self._jsresp = None
-        return buf.to_bytes()
+    def __init__(self):
+        self._reading_paused = False
+        self._resumed = asyncio.Event()
+        self._resumed.set()
 
-    def exception(self):
-        return self._exception
+    def pause_reading(self) -> None:
+        self._reading_paused = True
+        self._resumed.clear()
 
-    def set_exception(self, exc: BaseException) -> None:
-        self._exception = exc
+    def resume_reading(self) -> None:
+        self._reading_paused = False
+        self._resumed.set()
+
+
+# The tasks that feed the bodies of the responses into their StreamReaders
+_feed_tasks: set[asyncio.Task[None]] = set()
+
+
+async def _feed_content(jsresp, content: StreamReader, protocol: FetchProtocol):
+    """Feed the chunks of the body of a fetch response into ``content``."""
+    if jsresp.body is None:
+        content.feed_eof()
+        return
+    reader = jsresp.body.getReader()
+    try:
+        while True:
+            await protocol._resumed.wait()
+            result = await reader.read()
+            if result.done:
+                break
+            content.feed_data(result.value.to_bytes())
+    except Exception as e:
+        content.set_exception(ClientPayloadError(f"Response payload error: {e}"))
+    else:
+        content.feed_eof()
+
+
+def _stream_content(jsresp, loop, limit: int, timer) -> StreamReader:
+    """Create a StreamReader that is fed from the body of ``jsresp`` as it
+    arrives."""
+    protocol = FetchProtocol()
+    content = StreamReader(protocol, limit, timer=timer, loop=loop)
+    task = loop.create_task(_feed_content(jsresp, content, protocol))
+    _feed_tasks.add(task)
+    task.add_done_callback(_feed_tasks.discard)
+    return content
+
+
+def _abort_fetch(resp: ClientResponse) -> None:
+    """Stop downloading the body of the response if it wasn't read to the end."""
+    if (controller := getattr(resp, "_fetch_abort_controller", None)) is not None:
+        resp._fetch_abort_controller = None
+        if not resp.content.at_eof():
+            controller.abort()
+
+
+_release = ClientResponse.release
+_close = ClientResponse.close
+
+
+def release(self):
+    _abort_fetch(self)
+    return _release(self)
+
+
+def close(self) -> None:
+    _abort_fetch(self)
+    _close(self)
 
 
 async def _request(
@@ -184,17 +250,19 @@ async def _request(
                 loop=req.loop,
                 session=req._session,
             )
-            from js import Headers, fetch
+            from js import AbortController, Headers, fetch
             from pyodide.ffi import to_js
 
             body = None
             if req.body:
                 body = to_js(req.body._value)
+            controller = AbortController.new()
             jsresp = await fetch(
                 str(req.url),
                 method=req.method,
                 headers=Headers.new(headers.items()),
                 body=body,
+                signal=controller.signal,
             )
             resp.version = version
             resp.status = jsresp.status
@@ -202,7 +270,8 @@ async def _request(
             # This is not quite correct in handling of repeated headers
             resp._headers = CIMultiDict(jsresp.headers)
             resp._raw_headers = tuple(tuple(e) for e in jsresp.headers)
-            resp.content = Content(jsresp)
+            resp.content = _stream_content(jsresp, self._loop, read_bufsize, timer)
+            resp._fetch_abort_controller = controller
 
         # check response status
         if raise_for_status is None:
@@ -245,3 +314,5 @@ async def _request(
 
 
 ClientSession._request = _request
+ClientResponse.release = release
+ClientResponse.close = close
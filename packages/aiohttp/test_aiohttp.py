@@ -27,3 +27,34 @@ def test_aiohttp(selenium):
     dist_dir = cast(str, pytest.pyodide_dist_dir)  # type:ignore[attr-defined]
     lock_data = (Path(dist_dir) / "pyodide-lock.json").read_text()
     aiohttp_test_helper(selenium, patch, selenium.base_url, lock_data)
+
+
+@run_in_pyodide(packages=["aiohttp"])
+async def aiohttp_streaming_test_helper(selenium, patch, base_url, lock_data):
+    exec(patch, {})
+    import aiohttp
+
+    url = base_url + "/pyodide-lock.json"
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            assert isinstance(response.content, aiohttp.StreamReader)
+            chunks = [chunk async for chunk in response.content.iter_chunked(1024)]
+            assert all(len(chunk) <= 1024 for chunk in chunks)
+            assert b"".join(chunks).decode() == lock_data
+
+        async with session.get(url) as response:
+            line = await response.content.readline()
+            assert line.decode() == lock_data.splitlines(keepends=True)[0]
+
+        # Leaving early cancels the rest of the download
+        async with session.get(url) as response:
+            await response.content.readexactly(10)
+            controller = response._fetch_abort_controller
+        assert controller.signal.aborted
+
+
+def test_aiohttp_streaming(selenium):
+    patch = (Path(__file__).parent / "aiohttp_patch.py").read_text()
+    dist_dir = cast(str, pytest.pyodide_dist_dir)  # type:ignore[attr-defined]
+    lock_data = (Path(dist_dir) / "pyodide-lock.json").read_text()
+    aiohttp_streaming_test_helper(selenium, patch, selenium.base_url, lock_data)
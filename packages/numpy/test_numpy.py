@@ -364,3 +364,45 @@ def test_np_unique(selenium):
     import numpy as np
 
     np.unique(np.array([1.1, 1.1]), axis=-1)
+
+
+@run_in_pyodide(packages=["numpy"])
+def test_jsbuffer_to_numpy(selenium):
+    import numpy as np
+    import pytest
+
+    from pyodide.code import run_js
+
+    a = run_js("new Float32Array([1, 2, 3, 4, 5, 6])")
+    x = a.to_numpy()
+    assert x.dtype == np.float32
+    assert x.tolist() == [1, 2, 3, 4, 5, 6]
+
+    y = a.to_numpy(shape=(2, 3))
+    assert y.shape == (2, 3)
+    assert y[1].tolist() == [4, 5, 6]
+
+    # A subarray only copies the viewed part of the underlying ArrayBuffer
+    b = run_js("new Int16Array([1, 2, 3, 4]).subarray(1, 3)")
+    assert b.to_numpy().tolist() == [2, 3]
+
+    # Untyped buffers default to uint8 and can be reinterpreted
+    buf = run_js("new Float64Array([1.5, 2.5]).buffer")
+    assert buf.to_numpy().dtype == np.uint8
+    assert buf.to_numpy("<f8").tolist() == [1.5, 2.5]
+
+    # Big endian data is kept as is and read with a byte order prefix
+    be = run_js(
+        """
+        const view = new DataView(new ArrayBuffer(8));
+        view.setInt32(0, 1);
+        view.setInt32(4, 258);
+        view
+        """
+    )
+    assert be.to_numpy(">i4").tolist() == [1, 258]
+
+    with pytest.raises(ValueError, match="not a multiple of the itemsize"):
+        run_js("new Uint8Array(5)").to_numpy("i4")
+    with pytest.raises(ValueError, match="cannot assign from TypedArray"):
+        a.to_numpy(shape=(2, 2))
@@ -3782,6 +3782,108 @@ static PyMethodDef JsBuffer_tostring_MethodDef = {
   METH_FASTCALL | METH_KEYWORDS,
 };
 
+/**
+ * Allocate a numpy array with the requested dtype and shape and copy the
+ * JavaScript buffer directly into its data. The data is copied once, compared
+ * to twice for `np.frombuffer(buf.to_bytes(), ...).copy()`.
+ *
+ * dtype -- Anything np.dtype accepts. Defaults to the format of the buffer
+ *          ("B" for an ArrayBuffer or DataView). The bytes are copied as they
+ *          are so a byte order prefix like ">f4" reinterprets big endian data.
+ * shape -- Anything np.empty accepts. Defaults to a 1d array covering the
+ *          whole buffer.
+ */
+static PyObject*
+JsBuffer_tonumpy(PyObject* self,
+                 PyObject* const* args,
+                 Py_ssize_t nargs,
+                 PyObject* kwnames)
+{
+  static const char* const _keywords[] = { "dtype", "shape", 0 };
+  static struct _PyArg_Parser _parser = {
+    .format = "|OO:to_numpy",
+    .keywords = _keywords,
+  };
+  PyObject* dtype_arg = Py_None;
+  PyObject* shape_arg = Py_None;
+  if (!_PyArg_ParseStackAndKeywords(
+        args, nargs, kwnames, &_parser, &dtype_arg, &shape_arg)) {
+    return NULL;
+  }
+
+  bool success = false;
+  PyObject* numpy = NULL;
+  PyObject* dtype = NULL;
+  PyObject* shape = NULL;
+  PyObject* result = NULL;
+  Py_buffer view = { 0 };
+
+  numpy = PyImport_ImportModule("numpy");
+  FAIL_IF_NULL(numpy);
+  _Py_IDENTIFIER(dtype);
+  if (Py_IsNone(dtype_arg)) {
+    char* format = JsBuffer_FORMAT(self);
+    dtype_arg = PyUnicode_FromString(format ? format : "B");
+    FAIL_IF_NULL(dtype_arg);
+    dtype = _PyObject_CallMethodIdOneArg(numpy, &PyId_dtype, dtype_arg);
+    Py_DECREF(dtype_arg);
+  } else {
+    dtype = _PyObject_CallMethodIdOneArg(numpy, &PyId_dtype, dtype_arg);
+  }
+  FAIL_IF_NULL(dtype);
+
+  Py_ssize_t byteLength = JsBuffer_BYTE_LENGTH(self);
+  if (Py_IsNone(shape_arg)) {
+    _Py_IDENTIFIER(itemsize);
+    PyObject* pyitemsize = _PyObject_GetAttrId(dtype, &PyId_itemsize);
+    FAIL_IF_NULL(pyitemsize);
+    Py_ssize_t itemsize = PyLong_AsSsize_t(pyitemsize);
+    Py_DECREF(pyitemsize);
+    FAIL_IF_MINUS_ONE(itemsize);
+    if (itemsize == 0 || byteLength % itemsize != 0) {
+      PyErr_Format(PyExc_ValueError,
+                   "buffer size %zd is not a multiple of the itemsize %zd",
+                   byteLength,
+                   itemsize);
+      FAIL();
+    }
+    shape = PyLong_FromSsize_t(byteLength / itemsize);
+  } else {
+    shape = Py_NewRef(shape_arg);
+  }
+  FAIL_IF_NULL(shape);
+
+  _Py_IDENTIFIER(empty);
+  result =
+    _PyObject_CallMethodIdObjArgs(numpy, &PyId_empty, shape, dtype, NULL);
+  FAIL_IF_NULL(result);
+  FAIL_IF_MINUS_ONE(
+    PyObject_GetBuffer(result, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE));
+  // Only compare the sizes, reinterpreting the data is the point of dtype.
+  bool safe = false;
+  bool dir = true;
+  FAIL_IF_MINUS_ONE(
+    check_buffer_compatibility((JsProxy*)self, view, safe, dir));
+  FAIL_IF_MINUS_ONE(JsvBuffer_assignToPtr(JsProxy_VAL(self), view.buf));
+
+  success = true;
+finally:
+  PyBuffer_Release(&view);
+  Py_CLEAR(numpy);
+  Py_CLEAR(dtype);
+  Py_CLEAR(shape);
+  if (!success) {
+    Py_CLEAR(result);
+  }
+  return result;
+}
+
+static PyMethodDef JsBuffer_tonumpy_MethodDef = {
+  "to_numpy",
+  (PyCFunction)JsBuffer_tonumpy,
+  METH_FASTCALL | METH_KEYWORDS,
+};
+
 // clang-format off
 EM_JS_UNCHECKED(void,
 JsBuffer_get_info, (JsVal jsobj,
@@ -4113,6 +4215,7 @@ skip_container_slots:
     methods[cur_method++] = JsBuffer_tomemoryview_MethodDef;
     methods[cur_method++] = JsBuffer_tobytes_MethodDef;
     methods[cur_method++] = JsBuffer_tostring_MethodDef;
+    methods[cur_method++] = JsBuffer_tonumpy_MethodDef;
     methods[cur_method++] = JsBuffer_write_to_file_MethodDef;
     methods[cur_method++] = JsBuffer_read_from_file_MethodDef;
     methods[cur_method++] = JsBuffer_into_file_MethodDef;
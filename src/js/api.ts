@@ -7,7 +7,8 @@ import { loadBinaryFile, nodeFSMod } from "./compat";
 import { version } from "./version";
 import { setStdin, setStdout, setStderr } from "./streams";
 import { scheduleCallback } from "./scheduler";
-import { TypedArray, PackageData, FSType } from "./types";
+import { WorkerPool } from "./worker-pool";
+import { TypedArray, PackageData, PackageInstallMode, FSType } from "./types";
 import { IN_NODE, detectEnvironment } from "./environments";
 // @ts-ignore
 import LiteralMap from "./common/literal-map";
@@ -65,6 +66,10 @@ API.restoreState = (state: any) => API.pyodide_py._state.restore_state(state);
 /** @private */
 API.scheduleCallback = scheduleCallback;
 
+// Used in pyodide.executor
+/** @private */
+API.WorkerPool = WorkerPool;
+
 /** @private */
 API.detectEnvironment = detectEnvironment;
 
@@ -203,6 +208,8 @@ export class PyodideAPI {
    *    (optional)
    * @param options.checkIntegrity If true, check the integrity of the downloaded
    *    packages (default: true)
+   * @param options.mode How to install wheels, either ``"extract"`` or
+   *    ``"zipimport"``. See :js:func:`pyodide.loadPackage`.
    */
   static async loadPackagesFromImports(
     code: string,
@@ -210,6 +217,7 @@ export class PyodideAPI {
       messageCallback?: (message: string) => void;
       errorCallback?: (message: string) => void;
       checkIntegrity?: boolean;
+      mode?: PackageInstallMode;
     } = {
       checkIntegrity: true,
     },
@@ -228,8 +236,11 @@ export class PyodideAPI {
     let packageNames = API._import_name_to_package_name;
     let packages: Set<string> = new Set();
     for (let name of imports) {
-      if (packageNames.has(name)) {
-        packages.add(packageNames.get(name)!);
+      const pkg = packageNames.get(name);
+      // Skip packages that are loaded already to avoid waiting for the package
+      // loading lock on every call.
+      if (pkg !== undefined && !(pkg in loadedPackages)) {
+        packages.add(pkg);
       }
     }
     if (packages.size) {
@@ -667,21 +678,30 @@ export class PyodideAPI {
   }
 
   /**
+   * Make a snapshot of the memory of this Pyodide instance.
+   *
+   * Pages of memory that are all zeros are left out. If ``base`` is a snapshot
+   * made by an instance loaded from the same build, only the pages that differ
+   * from it are stored and the base has to be passed as ``_snapshotBase`` to
+   * load the result. Snapshots can be compressed with
+   * ``CompressionStream("gzip")``, they are decompressed when they are loaded.
    *
    * @param param0
    * @returns
    */
   static makeMemorySnapshot({
     serializer,
+    base,
   }: {
     serializer?: (obj: any) => any;
+    base?: Uint8Array;
   } = {}): Uint8Array {
     if (!API.config._makeSnapshot) {
       throw new Error(
         "Can only use pyodide.makeMemorySnapshot if the _makeSnapshot option is passed to loadPyodide",
       );
     }
-    return API.makeSnapshot(serializer);
+    return API.makeSnapshot(serializer, base);
   }
 
   /**
@@ -692,6 +712,45 @@ export class PyodideAPI {
   static get lockfile() {
     return API.lockfile;
   }
+
+  /**
+   * Returns how many Python modules were imported from the bytecode cache
+   * (``hits``) and how many had to be compiled (``misses``) since Pyodide was
+   * loaded. Both are zero unless the ``bytecodeCacheDir`` option was passed to
+   * :js:func:`loadPyodide`.
+   * @experimental
+   */
+  static bytecodeCacheStats(): { hits: number; misses: number } {
+    const stats = API._pyodide._importhook.get_bytecode_cache_stats();
+    try {
+      return stats.toJs({ dict_converter: Object.fromEntries });
+    } finally {
+      stats.destroy();
+    }
+  }
+
+  /**
+   * Returns how many times :js:func:`runPython`, :js:func:`runPythonAsync`,
+   * :py:func:`~pyodide.code.eval_code` and
+   * :py:func:`~pyodide.code.eval_code_async` reused compiled code (``hits``)
+   * and had to compile the code (``misses``), as well as the number of cached
+   * code objects (``size``) and the maximum number (``maxsize``). Use
+   * :py:func:`~pyodide.code.set_code_cache_size` to change the maximum.
+   * @experimental
+   */
+  static codeCacheStats(): {
+    hits: number;
+    misses: number;
+    size: number;
+    maxsize: number;
+  } {
+    const stats = API._pyodide._base.get_code_cache_stats();
+    try {
+      return stats.toJs({ dict_converter: Object.fromEntries });
+    } finally {
+      stats.destroy();
+    }
+  }
 }
 
 /** @hidden */
@@ -801,6 +860,9 @@ API.finalizeBootstrap = function (
     importhook.register_js_module("js", jsglobals);
     importhook.register_js_module("pyodide_js", pyodide);
   }
+  if (API.config.bytecodeCacheDir) {
+    importhook.enable_bytecode_cache(API.config.bytecodeCacheDir);
+  }
 
   // import pyodide_py. We want to ensure that as much stuff as possible is
   // already set up before importing pyodide_py to simplify development of
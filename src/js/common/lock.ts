@@ -21,3 +21,42 @@ export function createLock() {
   }
   return acquireLock;
 }
+
+/**
+ * @param limit The maximum number of concurrent holders of the semaphore
+ * @returns A new asynchronous semaphore
+ * @private
+ */
+export function createSemaphore(limit: number) {
+  let active = 0;
+  const waiting: (() => void)[] = [];
+
+  /**
+   * Acquire a slot of the semaphore. Waiters are served in order.
+   * @returns A zero argument function that releases the slot.
+   * @private
+   */
+  async function acquireSemaphore() {
+    if (active < limit) {
+      active++;
+    } else {
+      // The releasing holder hands its slot over to us, so active stays the
+      // same.
+      await new Promise<void>((resolve) => waiting.push(resolve));
+    }
+    let released = false;
+    return () => {
+      if (released) {
+        return;
+      }
+      released = true;
+      const next = waiting.shift();
+      if (next) {
+        next();
+      } else {
+        active--;
+      }
+    };
+  }
+  return acquireSemaphore;
+}
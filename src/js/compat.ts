@@ -6,7 +6,7 @@ import {
   IN_BROWSER_WEB_WORKER,
   IN_NODE_COMMONJS,
 } from "./environments";
-import { Lockfile } from "./types";
+import { Lockfile, PackageManifest } from "./types";
 
 let nodeUrlMod: typeof import("node:url");
 let nodePath: typeof import("node:path");
@@ -15,6 +15,8 @@ let nodeVmMod: typeof import("node:vm");
 export let nodeFSMod: typeof import("node:fs");
 /** @private */
 export let nodeFsPromisesMod: typeof import("node:fs/promises");
+/** @private */
+export let nodeWorkerThreadsMod: typeof import("node:worker_threads");
 
 declare var globalThis: {
   importScripts: (url: string) => void;
@@ -35,6 +37,7 @@ export async function initNodeModules() {
   nodeUrlMod = (await import("node:url")).default;
   nodeFSMod = await import("node:fs");
   nodeFsPromisesMod = await import("node:fs/promises");
+  nodeWorkerThreadsMod = await import("node:worker_threads");
 
   // @ts-ignore
   nodeVmMod = (await import("node:vm")).default;
@@ -244,6 +247,32 @@ export async function loadLockFile(lockFileURL: string): Promise<Lockfile> {
   }
 }
 
+/**
+ * Load package-manifests.json. The file is optional, so if it can't be loaded
+ * we return an empty object and packages are installed without manifests.
+ * @private
+ */
+export async function loadPackageManifests(
+  manifestsURL: string,
+): Promise<Record<string, PackageManifest>> {
+  try {
+    if (IN_NODE) {
+      await initNodeModules();
+      const manifests = await nodeFsPromisesMod.readFile(manifestsURL, {
+        encoding: "utf8",
+      });
+      return JSON.parse(manifests);
+    }
+    const response = await fetch(manifestsURL);
+    if (!response.ok) {
+      return {};
+    }
+    return await response.json();
+  } catch {
+    return {};
+  }
+}
+
 /**
  * Calculate the directory name of the current module.
  * This is used to guess the indexURL when it is not provided.
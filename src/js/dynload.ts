@@ -3,7 +3,61 @@
 import { PackageManagerAPI, PackageManagerModule } from "./types";
 
 import { createLock } from "./common/lock";
-import { LoadDynlibFS, ReadFileType, InternalPackageData } from "./types";
+import {
+  LoadDynlibFS,
+  ReadFileType,
+  InternalPackageData,
+  DynlibLookupStats,
+  LoadedDynlib,
+} from "./types";
+
+/**
+ * The library name -> path cache shared by all DynlibLoaders of a Module, like
+ * ld.so.cache. It is filled with the shared libraries of each package that is
+ * loaded.
+ */
+const ldCaches = new WeakMap<object, Map<string, string>>();
+
+/**
+ * The shared libraries loaded by the DynlibLoaders of a Module, in load order.
+ * Used to load them again when a memory snapshot is restored.
+ */
+const loadedDynlibs = new WeakMap<object, LoadedDynlib[]>();
+
+// Identifies the local symbol scopes of the loaded libraries, 0 is the global
+// scope.
+const scopeIds = new WeakMap<object, number>();
+let nextScopeId = 1;
+
+/**
+ * The size of the ``struct dso`` that Emscripten's dynlink.c uses for dlopen
+ * handles on wasm32, without the name at the end, which Emscripten doesn't read
+ * from the handle:
+ *
+ *   next, prev                           2 x 4
+ *   flags                                4
+ *   mem_allocated, mem_addr, mem_size    4 (bool + padding) + 2 x 4
+ *   table_allocated, table_addr, table_size  4 (bool + padding) + 2 x 4
+ *   file_data, file_data_size            2 x 4
+ *
+ * Emscripten stores the memory and table base of a library in the struct when
+ * it loads the library with a handle, and reuses them when the library is
+ * loaded again with the same handle.
+ */
+const DSO_STRUCT_SIZE = 44;
+
+/**
+ * The size of the handles we pass to Module.loadDynamicLibrary, with room for
+ * the struct to grow. ``#checkDsoHandle`` fails if Emscripten writes past
+ * ``DSO_STRUCT_SIZE``, so that a larger struct is noticed before it outgrows
+ * the handle.
+ */
+const DSO_HANDLE_SIZE = 128;
+
+/** @private */
+export function newDynlibLookupStats(): DynlibLookupStats {
+  return { lookups: 0, indexHits: 0, ldCacheHits: 0, time: 0 };
+}
 
 /** @hidden */
 export class DynlibLoader {
@@ -15,11 +69,93 @@ export class DynlibLoader {
   // it.
   private _lock = createLock();
 
+  // Shared libraries that are being compiled, see compileDynlibs
+  #compiling = new Map<string, Promise<WebAssembly.Module | undefined>>();
+  // Compiled or read shared libraries that weren't instantiated yet
+  #compiled = new Map<string, WebAssembly.Module | Uint8Array>();
+
   constructor(api: PackageManagerAPI, pyodideModule: PackageManagerModule) {
     this.#api = api;
     this.#module = pyodideModule;
   }
 
+  /**
+   * The library name -> path cache shared with the other loaders of the same
+   * Module.
+   * @private
+   */
+  public get ldCache(): Map<string, string> {
+    let cache = ldCaches.get(this.#module);
+    if (!cache) {
+      cache = new Map();
+      ldCaches.set(this.#module, cache);
+    }
+    return cache;
+  }
+
+  /**
+   * The shared libraries loaded into the Module, in load order.
+   * @private
+   */
+  public get loadedDynlibs(): LoadedDynlib[] {
+    let dynlibs = loadedDynlibs.get(this.#module);
+    if (!dynlibs) {
+      dynlibs = [];
+      loadedDynlibs.set(this.#module, dynlibs);
+    }
+    return dynlibs;
+  }
+
+  /**
+   * Map the names of the files in the subdirectories of a directory to their
+   * paths. If several files have the same name, the first one found by
+   * ``getSubDirs`` wins.
+   *
+   * @param dir The absolute path to the directory
+   * @private
+   */
+  public indexSubDirs(dir: string): Map<string, string> {
+    const index = new Map<string, string>();
+    for (const subdir of this.getSubDirs(dir)) {
+      for (const name of this.#module.FS.readdir(subdir)) {
+        if (name !== "." && name !== ".." && !index.has(name)) {
+          index.set(name, this.#module.PATH.join2(subdir, name));
+        }
+      }
+    }
+    return index;
+  }
+
+  /**
+   * Start compiling shared libraries. Compiling doesn't depend on other
+   * libraries, so it can run in parallel for all of them while only
+   * instantiating them has to follow the dependency order. The compiled
+   * modules are used by the next ``loadDynlibsFromPackage`` call for their
+   * package.
+   *
+   * Libraries that fail to compile are read again when they are loaded, so
+   * that the error is reported there.
+   *
+   * @param paths The absolute paths to the libraries
+   * @private
+   */
+  public compileDynlibs(paths: string[]) {
+    for (const path of paths) {
+      if (this.#compiling.has(path)) {
+        continue;
+      }
+      let promise: Promise<WebAssembly.Module | undefined>;
+      try {
+        promise = WebAssembly.compile(this.#module.FS.readFile(path)).catch(
+          () => undefined,
+        );
+      } catch {
+        promise = Promise.resolve(undefined);
+      }
+      this.#compiling.set(path, promise);
+    }
+  }
+
   /**
    * Recursively get all subdirectories of a directory
    *
@@ -57,17 +193,32 @@ export class DynlibLoader {
    *
    * @param lib The path to the library to load
    * @param searchDirs The list of directories to search for the library
-   * @returns A filesystem-like object
+   * @param index The shared libraries of the package that ``lib`` belongs to,
+   * by file name. Without it, the subdirectories of the directory of ``lib``
+   * are searched.
+   * @param stats Counters to update with the lookups
+   * @returns A filesystem-like object, which can also resolve library names
+   * to paths
    * @private
    */
-  public createDynlibFS(lib: string, searchDirs?: string[]): LoadDynlibFS {
+  public createDynlibFS(
+    lib: string,
+    searchDirs?: string[],
+    index?: Map<string, string>,
+    stats: DynlibLookupStats = newDynlibLookupStats(),
+  ): LoadDynlibFS & { resolvePath: (path: string) => string } {
     const dirname = lib.substring(0, lib.lastIndexOf("/"));
 
     let _searchDirs = searchDirs || [];
     _searchDirs = _searchDirs.concat(this.#api.defaultLdLibraryPath, [dirname]);
 
+    const ldCache = this.ldCache;
+    const exists = (path: string) => this.#module.FS.findObject(path) !== null;
+    // Emscripten looks up each library twice, with findObject and readFile.
+    const resolved = new Map<string, string>();
+
     // TODO: add rpath to Emscripten dsos and remove this logic
-    const resolvePath = (path: string) => {
+    const lookup = (path: string) => {
       if (
         DEBUG &&
         this.#module.PATH.basename(path) !== this.#module.PATH.basename(lib)
@@ -84,27 +235,61 @@ export class DynlibLoader {
       for (const dir of _searchDirs) {
         const fullPath = this.#module.PATH.join2(dir, path);
 
-        if (this.#module.FS.findObject(fullPath) !== null) {
+        if (exists(fullPath)) {
           return fullPath;
         }
       }
 
-      // Step 2) try to find the library by searching child directories of the library directory
-      //         (This should not be necessary in most cases, but some libraries have dependencies in the child directories)
-      for (const childDir of this.getSubDirs(dirname)) {
-        const fullPath = this.#module.PATH.join2(childDir, path);
-        if (this.#module.FS.findObject(fullPath) !== null) {
+      // Step 2) Try to find the library among the libraries of the package.
+      //         (This should not be necessary in most cases, but some libraries
+      //         have dependencies in the child directories)
+      // Without an index, build one from the child directories of the library
+      // directory, once per library.
+      index ??= this.indexSubDirs(dirname);
+      let fullPath = index.get(path);
+      if (fullPath !== undefined && exists(fullPath)) {
+        stats.indexHits++;
+        return fullPath;
+      }
+
+      // Step 3) Try the libraries of the packages that were loaded before
+      fullPath = ldCache.get(path);
+      if (fullPath !== undefined) {
+        if (exists(fullPath)) {
+          stats.ldCacheHits++;
           return fullPath;
         }
+        ldCache.delete(path);
       }
 
       return path;
     };
 
-    const readFile: ReadFileType = (path: string) =>
-      this.#module.FS.readFile(resolvePath(path));
+    const resolvePath = (path: string) => {
+      const start = performance.now();
+      stats.lookups++;
+      let result = resolved.get(path);
+      if (result === undefined) {
+        result = lookup(path);
+        resolved.set(path, result);
+      }
+      stats.time += performance.now() - start;
+      return result;
+    };
 
-    const fs: LoadDynlibFS = {
+    const readFile: ReadFileType = (path: string) => {
+      const fullPath = resolvePath(path);
+      // Emscripten instantiates a compiled module like the binary, and the
+      // binary may have been read already for its dylink metadata.
+      const compiled = this.#compiled.get(fullPath);
+      if (compiled !== undefined) {
+        this.#compiled.delete(fullPath);
+        return compiled;
+      }
+      return this.#module.FS.readFile(fullPath);
+    };
+
+    const fs = {
       findObject: (path: string, dontResolveLastLink: boolean) => {
         let obj = this.#module.FS.findObject(
           resolvePath(path),
@@ -116,6 +301,7 @@ export class DynlibLoader {
         return obj;
       },
       readFile: readFile,
+      resolvePath,
     };
 
     return fs;
@@ -130,17 +316,92 @@ export class DynlibLoader {
    * @param lib The file system path to the library.
    * @param global Whether to make the symbols available globally.
    * @param searchDirs Directories to search for the library.
+   * @param index The shared libraries of the package, by file name.
+   * @param stats Counters to update with the library lookups.
    * @private
    */
-  public async loadDynlib(lib: string, global: boolean, searchDirs?: string[]) {
+  public async loadDynlib(
+    lib: string,
+    global: boolean,
+    searchDirs?: string[],
+    index?: Map<string, string>,
+    stats?: DynlibLookupStats,
+  ) {
     const releaseDynlibLock = await this._lock();
 
+    try {
+      const fs = this.createDynlibFS(lib, searchDirs, index, stats);
+      await this.#loadDynlib(lib, global, global ? null : {}, fs, new Set());
+    } catch (e: any) {
+      if (
+        e &&
+        e.message &&
+        e.message.includes("need to see wasm magic number")
+      ) {
+        console.warn(
+          `Failed to load dynlib ${lib}. We probably just tried to load a linux .so file or something.`,
+        );
+        return;
+      }
+      throw e;
+    } finally {
+      releaseDynlibLock();
+    }
+  }
+
+  /**
+   * Load a dynamic library after the libraries it needs that can be found with
+   * ``fs``. Emscripten would load those on its own, but then we wouldn't get to
+   * pass a handle for them.
+   */
+  async #loadDynlib(
+    lib: string,
+    global: boolean,
+    localScope: object | null,
+    fs: ReturnType<DynlibLoader["createDynlibFS"]>,
+    visited: Set<string>,
+  ) {
+    visited.add(lib);
+    if (this.isDynlibLoaded(lib)) {
+      // Emscripten makes the symbols of the library global if it was loaded
+      // locally before. The libraries it needs are loaded already.
+      await this.#module.loadDynamicLibrary(
+        lib,
+        { loadAsync: true, nodelete: true, allowUndefined: true, global, fs },
+        localScope,
+      );
+      const record = this.loadedDynlibs.find(({ path }) => path === lib);
+      if (record && global) {
+        record.global = true;
+      }
+      return;
+    }
+
+    const path = fs.resolvePath(lib);
+    let binary = this.#compiled.get(path);
+    if (binary === undefined) {
+      // Emscripten reads the library through fs.readFile again, let it reuse
+      // this copy instead.
+      binary = this.#module.FS.readFile(path);
+      this.#compiled.set(path, binary);
+    }
+    for (const needed of this.#module.getDylinkMetadata(binary).neededDynlibs) {
+      const neededPath = fs.resolvePath(needed);
+      if (
+        !this.#module.PATH.isAbs(neededPath) ||
+        visited.has(neededPath) ||
+        this.isDynlibLoaded(neededPath) ||
+        this.#module.FS.findObject(neededPath) === null
+      ) {
+        continue;
+      }
+      await this.#loadDynlib(neededPath, global, localScope, fs, visited);
+    }
+
     DEBUG &&
       console.debug(`Loading a dynamic library ${lib} (global: ${global})`);
 
-    const fs = this.createDynlibFS(lib, searchDirs);
-    const localScope = global ? null : {};
-
+    const handle = this.#module._calloc(DSO_HANDLE_SIZE, 1);
     try {
       await this.#module.loadDynamicLibrary(
         lib,
@@ -152,34 +413,148 @@ export class DynlibLoader {
           fs,
         },
         localScope,
+        handle,
       );
+    } catch (e) {
+      // Don't leave a reference to the freed handle behind
+      delete this.#module.LDSO.loadedLibsByHandle[handle];
+      this.#module._free(handle);
+      throw e;
+    } finally {
+      if (this.#compiled.get(path) === binary) {
+        this.#compiled.delete(path);
+      }
+    }
+    this.#checkDsoHandle(handle);
+    this.#addLoadedDynlib(lib, global, localScope, handle);
+  }
 
-      // Emscripten saves the list of loaded libraries in LDSO.loadedLibsByName.
-      // However, since emscripten dylink metadata only contains the name of the
-      // library not the full path, we need to update it manually in order to
-      // prevent loading same library twice.
-      if (this.#module.PATH.isAbs(lib)) {
-        const libName: string = this.#module.PATH.basename(lib);
-        const dso: any = this.#module.LDSO.loadedLibsByName[libName];
-        if (!dso) {
-          this.#module.LDSO.loadedLibsByName[libName] =
-            this.#module.LDSO.loadedLibsByName[lib];
-        }
+  /**
+   * Check that Emscripten didn't write past ``DSO_STRUCT_SIZE`` into a handle,
+   * see ``DSO_HANDLE_SIZE``.
+   */
+  #checkDsoHandle(handle: number) {
+    const rest = this.#module.HEAP8.subarray(
+      handle + DSO_STRUCT_SIZE,
+      handle + DSO_HANDLE_SIZE,
+    );
+    if (rest.some((byte) => byte !== 0)) {
+      throw new Error(
+        `Emscripten's struct dso is larger than ${DSO_STRUCT_SIZE} bytes, DSO_STRUCT_SIZE and DSO_HANDLE_SIZE in dynload.ts need to be updated`,
+      );
+    }
+  }
+
+  /**
+   * Whether a library with the path or the file name of ``lib`` is loaded.
+   * @private
+   */
+  public isDynlibLoaded(lib: string): boolean {
+    const loadedLibsByName = this.#module.LDSO.loadedLibsByName;
+    return (
+      lib in loadedLibsByName ||
+      (this.#module.PATH.isAbs(lib) &&
+        this.#module.PATH.basename(lib) in loadedLibsByName)
+    );
+  }
+
+  #addLoadedDynlib(
+    lib: string,
+    global: boolean,
+    localScope: object | null,
+    handle: number,
+  ) {
+    // Emscripten saves the list of loaded libraries in LDSO.loadedLibsByName.
+    // However, since emscripten dylink metadata only contains the name of the
+    // library not the full path, we need to update it manually in order to
+    // prevent loading same library twice.
+    if (this.#module.PATH.isAbs(lib)) {
+      const libName: string = this.#module.PATH.basename(lib);
+      const dso: any = this.#module.LDSO.loadedLibsByName[libName];
+      if (!dso) {
+        this.#module.LDSO.loadedLibsByName[libName] =
+          this.#module.LDSO.loadedLibsByName[lib];
       }
-    } catch (e: any) {
-      if (
-        e &&
-        e.message &&
-        e.message.includes("need to see wasm magic number")
-      ) {
-        console.warn(
-          `Failed to load dynlib ${lib}. We probably just tried to load a linux .so file or something.`,
+    }
+
+    let scope = 0;
+    if (localScope) {
+      scope = scopeIds.get(localScope) ?? nextScopeId++;
+      scopeIds.set(localScope, scope);
+    }
+    this.loadedDynlibs.push({ path: lib, global, scope, handle, handles: [] });
+  }
+
+  /**
+   * The loaded shared libraries with all handles that refer to them, for a
+   * memory snapshot.
+   *
+   * @throws If a shared library was loaded some other way, since we can't load
+   * it again at the same address.
+   * @private
+   */
+  public dynlibsForSnapshot(): LoadedDynlib[] {
+    const { loadedLibsByName, loadedLibsByHandle } = this.#module.LDSO;
+    const dynlibs = this.loadedDynlibs.map((dynlib) => ({
+      ...dynlib,
+      handles: [] as number[],
+    }));
+    const byDso = new Map(
+      dynlibs.map((dynlib) => [loadedLibsByName[dynlib.path], dynlib]),
+    );
+    for (const [name, dso] of Object.entries(loadedLibsByName)) {
+      if (name.endsWith(".so") && !byDso.has(dso)) {
+        throw new Error(
+          `Can't make a snapshot because the shared library ${name} was not loaded by loadPackage or loadDynlib`,
         );
-        return;
       }
-      throw e;
-    } finally {
-      releaseDynlibLock();
+    }
+    for (const [handle, dso] of Object.entries(loadedLibsByHandle)) {
+      const dynlib = byDso.get(dso);
+      if (dynlib && Number(handle) !== dynlib.handle) {
+        dynlib.handles.push(Number(handle));
+      }
+    }
+    return dynlibs;
+  }
+
+  /**
+   * Load the shared libraries of a memory snapshot again, in the same order and
+   * at the same memory and table base as when the snapshot was made. Loading
+   * them initializes their memory, so the memory of the snapshot has to be
+   * restored again afterwards.
+   *
+   * @param dynlibs The result of ``dynlibsForSnapshot`` when the snapshot was
+   * made.
+   * @private
+   */
+  public async reloadDynlibs(dynlibs: LoadedDynlib[]) {
+    const FS = this.#module.FS;
+    // The libraries are loaded in dependency order, so the ones a library needs
+    // are loaded already and we don't need to search for them.
+    const fs: LoadDynlibFS = {
+      findObject: (path: string, dontResolveLastLink: boolean) =>
+        FS.findObject(path, dontResolveLastLink),
+      readFile: (path: string) => FS.readFile(path),
+    };
+    const scopes = new Map<number, object>();
+    for (const { path, global, scope, handle, handles } of dynlibs) {
+      let localScope: object | null = null;
+      if (!global) {
+        localScope = scopes.get(scope) ?? {};
+        scopes.set(scope, localScope);
+      }
+      await this.#module.loadDynamicLibrary(
+        path,
+        { loadAsync: true, nodelete: true, allowUndefined: true, global, fs },
+        localScope,
+        handle,
+      );
+      this.#addLoadedDynlib(path, global, localScope, handle);
+      const dso = this.#module.LDSO.loadedLibsByName[path];
+      for (const other of handles) {
+        this.#module.LDSO.loadedLibsByHandle[other] = dso;
+      }
     }
   }
 
@@ -195,12 +570,15 @@ export class DynlibLoader {
    *
    * @param pkg The package metadata
    * @param dynlibPaths The list of dynamic libraries inside a package
+   * @param searchDirs Extra directories to search for needed libraries
+   * @returns Counters of the library lookups
    * @private
    */
   public async loadDynlibsFromPackage(
     // TODO: Simplify the type of pkg after removing usage of this function in micropip.
     pkg: { file_name: string },
     dynlibPaths: string[],
+    searchDirs: string[] = [],
   ) {
     // assume that shared libraries of a package are located in <package-name>.libs directory,
     // following the convention of auditwheel.
@@ -208,9 +586,50 @@ export class DynlibLoader {
       pkg.file_name.split("-")[0]
     }.libs`;
 
+    // Index the libraries of the package once instead of searching the file
+    // system for each needed library.
+    const index = new Map<string, string>();
+    const ldCache = this.ldCache;
     for (const path of dynlibPaths) {
-      await this.loadDynlib(path, false, [auditWheelLibDir]);
+      const name = this.#module.PATH.basename(path);
+      if (!index.has(name)) {
+        index.set(name, path);
+      }
+      if (!ldCache.has(name)) {
+        ldCache.set(name, path);
+      }
+    }
+
+    // Compile all libraries of the package at once, unless that was already
+    // started when the package was unpacked.
+    this.compileDynlibs(dynlibPaths);
+    const modules = await Promise.all(
+      dynlibPaths.map((path) => this.#compiling.get(path)),
+    );
+    for (const [i, path] of dynlibPaths.entries()) {
+      this.#compiling.delete(path);
+      if (modules[i] !== undefined) {
+        this.#compiled.set(path, modules[i]);
+      }
+    }
+
+    const stats = newDynlibLookupStats();
+    try {
+      for (const path of dynlibPaths) {
+        await this.loadDynlib(
+          path,
+          false,
+          [auditWheelLibDir, ...searchDirs],
+          index,
+          stats,
+        );
+      }
+    } finally {
+      for (const path of dynlibPaths) {
+        this.#compiled.delete(path);
+      }
     }
+    return stats;
   }
 }
 
@@ -221,4 +640,10 @@ if (typeof API !== "undefined" && typeof Module !== "undefined") {
   API.loadDynlib = singletonDynlibLoader.loadDynlib.bind(singletonDynlibLoader);
   API.loadDynlibsFromPackage =
     singletonDynlibLoader.loadDynlibsFromPackage.bind(singletonDynlibLoader);
+  API.dynlibsForSnapshot = singletonDynlibLoader.dynlibsForSnapshot.bind(
+    singletonDynlibLoader,
+  );
+  API.reloadDynlibs = singletonDynlibLoader.reloadDynlibs.bind(
+    singletonDynlibLoader,
+  );
 }
@@ -2,7 +2,8 @@
 
 import { ConfigType } from "./pyodide";
 import { initializeNativeFS } from "./nativefs";
-import { loadBinaryFile, getBinaryResponse } from "./compat";
+import { loadBinaryFile, getBinaryResponse, nodeFSMod } from "./compat";
+import { IN_NODE } from "./environments";
 import { API, PreRunFunc, type Module } from "./types";
 
 /**
@@ -112,6 +113,35 @@ function mountLocalDirectories(mounts: string[]): PreRunFunc {
   };
 }
 
+/**
+ * Mount a persistent file system at ``config.bytecodeCacheDir``. In Node this
+ * is the host directory with the same path, in browsers it is backed by
+ * IndexedDB.
+ * @param path The path to mount, or undefined if the cache is disabled.
+ */
+function mountBytecodeCache(path: string | undefined): PreRunFunc {
+  return (Module) => {
+    if (!path) {
+      return;
+    }
+    Module.FS.mkdirTree(path);
+    if (IN_NODE) {
+      nodeFSMod.mkdirSync(path, { recursive: true });
+      Module.FS.mount(Module.FS.filesystems.NODEFS, { root: path }, path);
+      return;
+    }
+    Module.FS.mount(Module.FS.filesystems.IDBFS, {}, path);
+    Module.addRunDependency("bytecode-cache");
+    Module.FS.syncfs(true, (err: any) => {
+      if (err) {
+        console.error("Error occurred while loading the bytecode cache:");
+        console.error(err);
+      }
+      Module.removeRunDependency("bytecode-cache");
+    });
+  };
+}
+
 function computeVersionTuple(Module: Module): [number, number, number] {
   const versionInt = Module.HEAPU32[Module._Py_Version >>> 2];
   const major = (versionInt >>> 24) & 0xff;
@@ -144,7 +174,9 @@ function installStdlib(stdlibURL: string): PreRunFunc {
 
     stdlibPromise
       .then((stdlib: Uint8Array) => {
+        const start = performance.now();
         Module.FS.writeFile(`/lib/python${pymajor}${pyminor}.zip`, stdlib);
+        Module.API.startupTimings.stdlibMount = performance.now() - start;
       })
       .catch((e) => {
         console.error("Error occurred while installing the standard library:");
@@ -173,6 +205,7 @@ function getFileSystemInitializationFuncs(config: ConfigType): PreRunFunc[] {
     createHomeDirectory(config.env.HOME),
     setEnvironment(config.env),
     mountLocalDirectories(config._node_mounts),
+    mountBytecodeCache(config.bytecodeCacheDir),
     initializeNativeFS,
   ];
 }
@@ -1,6 +1,19 @@
 import { DynlibLoader } from "./dynload";
 import { uriToPackageData } from "./packaging-utils";
-import { PackageManagerAPI, PackageManagerModule } from "./types";
+import {
+  PackageManagerAPI,
+  PackageManagerModule,
+  PackageManifest,
+  DynlibLookupStats,
+} from "./types";
+import { nodeFSMod } from "./compat";
+
+/**
+ * The location in the Emscripten file system where
+ * ``config.extractedPackageCacheDir`` is mounted.
+ * @private
+ */
+export const EXTRACTED_PACKAGE_CACHE_MOUNT = "/pyodide-extracted-packages";
 
 /**
  * The Installer class is responsible for installing packages into the Pyodide filesystem.
@@ -13,10 +26,13 @@ import { PackageManagerAPI, PackageManagerModule } from "./types";
  */
 export class Installer {
   #api: PackageManagerAPI;
+  #module: PackageManagerModule;
   #dynlibLoader: DynlibLoader;
+  #extractedPackageCacheMounted: boolean = false;
 
   constructor(api: PackageManagerAPI, pyodideModule: PackageManagerModule) {
     this.#api = api;
+    this.#module = pyodideModule;
     this.#dynlibLoader = new DynlibLoader(api, pyodideModule);
   }
 
@@ -26,24 +42,148 @@ export class Installer {
     installDir: string,
     metadata?: ReadonlyMap<string, string>,
   ) {
-    const dynlibs: string[] = this.#api.package_loader.unpack_buffer.callKwargs(
-      {
-        buffer,
-        filename,
+    const dynlibs = this.unpack(buffer, filename, installDir, metadata);
+    await this.loadDynlibs(filename, dynlibs);
+  }
+
+  /**
+   * Extract a package into the file system without loading its shared
+   * libraries. This doesn't depend on any other package so it can run as soon
+   * as the package is downloaded.
+   *
+   * @returns The paths to the shared libraries inside the package
+   * @private
+   */
+  unpack(
+    buffer: Uint8Array,
+    filename: string,
+    installDir: string,
+    metadata?: ReadonlyMap<string, string>,
+    manifest?: PackageManifest,
+    zipimport: boolean = false,
+  ): string[] {
+    return this.#api.package_loader.unpack_buffer.callKwargs({
+      buffer,
+      filename,
+      extract_dir: installDir,
+      metadata,
+      calculate_dynlibs: true,
+      manifest: manifest && new Map(Object.entries(manifest)),
+      zipimport,
+    });
+  }
+
+  /**
+   * Extract a package through the extracted package cache. Only used in Node
+   * when ``config.extractedPackageCacheDir`` is set.
+   *
+   * If the cache has no entry for ``cacheKey``, ``buffer`` is unpacked into the
+   * cache first. The cached files are then copied into ``installDir`` so a
+   * warm install doesn't decompress anything.
+   *
+   * @param cacheKey The cache key, the sha256 of the wheel
+   * @param buffer The wheel, only needed if the package is not cached yet
+   * @param filename The file name of the wheel
+   * @param installDir The directory to install the package into
+   * @param metadata Metadata to store in the dist-info directory
+   * @returns The paths to the shared libraries inside the package
+   * @private
+   */
+  unpackFromCache(
+    cacheKey: string,
+    buffer: Uint8Array | undefined,
+    filename: string,
+    installDir: string,
+    metadata?: ReadonlyMap<string, string>,
+  ): string[] {
+    this.mountExtractedPackageCache();
+    const cache_dir = EXTRACTED_PACKAGE_CACHE_MOUNT;
+    const package_loader = this.#api.package_loader;
+
+    let dynlibs: string[] | undefined =
+      package_loader.install_cached_package.callKwargs({
+        cache_dir,
+        key: cacheKey,
         extract_dir: installDir,
-        metadata,
-        calculate_dynlibs: true,
-      },
+      });
+    if (dynlibs) {
+      return dynlibs;
+    }
+    if (!buffer) {
+      throw new Error(
+        `Internal error: ${filename} is missing from the extracted package cache`,
+      );
+    }
+    package_loader.cache_package.callKwargs({
+      buffer,
+      filename,
+      cache_dir,
+      key: cacheKey,
+      metadata,
+    });
+    return package_loader.install_cached_package.callKwargs({
+      cache_dir,
+      key: cacheKey,
+      extract_dir: installDir,
+    });
+  }
+
+  /**
+   * Mount ``config.extractedPackageCacheDir`` into the Emscripten file system
+   * the first time it is needed.
+   * @private
+   */
+  private mountExtractedPackageCache() {
+    if (this.#extractedPackageCacheMounted) {
+      return;
+    }
+    const hostDir = this.#api.config.extractedPackageCacheDir!;
+    nodeFSMod.mkdirSync(hostDir, { recursive: true });
+    const FS = this.#module.FS;
+    FS.mkdirTree(EXTRACTED_PACKAGE_CACHE_MOUNT);
+    FS.mount(
+      FS.filesystems.NODEFS,
+      { root: hostDir },
+      EXTRACTED_PACKAGE_CACHE_MOUNT,
     );
+    this.#extractedPackageCacheMounted = true;
+  }
 
+  /**
+   * Start compiling the shared libraries of a package. They can be compiled
+   * before the shared libraries of the dependencies are loaded.
+   *
+   * @param dynlibs The paths returned by ``unpack`` or ``unpackFromCache``
+   * @private
+   */
+  compileDynlibs(dynlibs: string[]) {
+    this.#dynlibLoader.compileDynlibs(dynlibs);
+  }
+
+  /**
+   * Load the shared libraries of a package. The shared libraries of the
+   * dependencies of the package need to be loaded first.
+   *
+   * @param filename The file name of the package
+   * @param dynlibs The paths returned by ``unpack`` or ``unpackFromCache``
+   * @param searchDirs Extra directories to search for needed libraries
+   * @returns Counters of the library lookups
+   * @private
+   */
+  async loadDynlibs(
+    filename: string,
+    dynlibs: string[],
+    searchDirs: string[] = [],
+  ): Promise<DynlibLookupStats> {
     DEBUG &&
       console.debug(
         `Found ${dynlibs.length} dynamic libraries inside ${filename}`,
       );
 
-    await this.#dynlibLoader.loadDynlibsFromPackage(
+    return await this.#dynlibLoader.loadDynlibsFromPackage(
       { file_name: filename },
       dynlibs,
+      searchDirs,
     );
   }
 }
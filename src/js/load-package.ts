@@ -2,16 +2,17 @@ import "./constants";
 import {
   Lockfile,
   PackageData,
-  InternalPackageData,
   PackageLoadMetadata,
   PackageManagerAPI,
   PackageManagerModule,
   LoadedPackages,
+  PackageLoadTimings,
+  PackageManifest,
+  PackageInstallMode,
 } from "./types";
 import { IN_NODE } from "./environments";
 import type { PyProxy } from "generated/pyproxy";
-import { createResolvable } from "./common/resolveable";
-import { createLock } from "./common/lock";
+import { createLock, createSemaphore } from "./common/lock";
 import {
   canonicalizePackageName,
   uriToPackageData,
@@ -98,6 +99,10 @@ export async function initializePackageIndex(
 
 const DEFAULT_CHANNEL = "default channel";
 const INSTALLER = "pyodide.loadPackage";
+// The maximum number of packages that are downloaded at the same time. Browsers
+// limit the number of connections per host anyway, and with more requests in
+// flight the first packages take longer to arrive so installing starts later.
+const MAX_CONCURRENT_DOWNLOADS = 6;
 
 /**
  * @hidden
@@ -172,6 +177,11 @@ export class PackageManager {
    *    (optional)
    * @param options.checkIntegrity If true, check the integrity of the downloaded
    *    packages (default: true)
+   * @param options.mode How to install wheels. ``"extract"`` extracts all of
+   *    their files. With ``"zipimport"`` the Python modules are imported
+   *    straight from the wheel and only the other files are extracted, which
+   *    saves memory and time for large packages of which only a few modules are
+   *    used. (default: ``"extract"``)
    * @returns The loaded package data.
    */
   public async loadPackage(
@@ -180,6 +190,7 @@ export class PackageManager {
       messageCallback?: (message: string) => void;
       errorCallback?: (message: string) => void;
       checkIntegrity?: boolean;
+      mode?: PackageInstallMode;
     } = {
       checkIntegrity: true,
     },
@@ -198,11 +209,12 @@ export class PackageManager {
       messageCallback?: (message: string) => void;
       errorCallback?: (message: string) => void;
       checkIntegrity?: boolean;
+      mode?: PackageInstallMode;
     } = {
       checkIntegrity: true,
     },
   ): Promise<Array<PackageData>> {
-    const loadedPackageData = new Set<InternalPackageData>();
+    const loadedPackageData = new Set<PackageLoadMetadata>();
     const pkgNames = toStringArray(names);
 
     const toLoad = this.recursiveDependencies(pkgNames);
@@ -235,6 +247,7 @@ export class PackageManager {
       .join(", ");
     const failed = new Map<string, Error>();
     const releaseLock = await this._lock();
+    const acquireDownloadSlot = createSemaphore(MAX_CONCURRENT_DOWNLOADS);
     try {
       this.logStdout(`Loading ${packageNames}`);
       for (const [_, pkg] of toLoad) {
@@ -245,18 +258,35 @@ export class PackageManager {
           continue;
         }
 
-        pkg.installPromise = this.downloadAndInstall(
+        pkg.unpackPromise = this.downloadAndUnpack(
           pkg,
-          toLoad,
-          loadedPackageData,
           failed,
+          acquireDownloadSlot,
           options.checkIntegrity,
+          options.mode,
         );
       }
 
-      await Promise.all(
-        Array.from(toLoad.values()).map(({ installPromise }) => installPromise),
-      );
+      // Packages are downloaded and unpacked as fast as possible. Shared
+      // libraries have to be loaded after the ones of their dependencies
+      // though, so we load them wave by wave.
+      for (const wave of installWaves(toLoad)) {
+        const dynlibs = await Promise.all(
+          wave.map(({ unpackPromise }) => unpackPromise),
+        );
+        for (const [i, pkg] of wave.entries()) {
+          if (dynlibs[i] === undefined) {
+            // Failed to download or unpack the package.
+            continue;
+          }
+          await this.loadPackageDynlibs(
+            pkg,
+            dynlibs[i],
+            loadedPackageData,
+            failed,
+          );
+        }
+      }
 
       // Warning: this sounds like it might not do anything important, but it
       // fills in the GOT. There can be segfaults if we leave it out.
@@ -313,8 +343,8 @@ export class PackageManager {
       normalizedName,
       channel: this.defaultChannel,
       depends: pkgInfo.depends,
-      installPromise: undefined,
-      done: createResolvable(),
+      unpackPromise: undefined,
+      timings: newPackageLoadTimings(),
       packageData: pkgInfo,
     });
 
@@ -363,8 +393,8 @@ export class PackageManager {
         normalizedName: pkgname,
         channel: channel, // name is url in this case
         depends: [],
-        installPromise: undefined,
-        done: createResolvable(),
+        unpackPromise: undefined,
+        timings: newPackageLoadTimings(),
         packageData: {
           name: pkgname,
           version: version,
@@ -440,15 +470,22 @@ export class PackageManager {
   }
 
   /**
-   * Install the package into the file system.
+   * Unpack the package into the file system.
    * @param metadata The package metadata
    * @param buffer The binary data returned by downloadPackage
+   * @param cacheKey The key in the extracted package cache, if it is used
+   * @param manifest The entry of the package in package-manifests.json
+   * @param mode How to install the package, see loadPackage
+   * @returns The paths to the shared libraries in the package
    * @private
    */
-  private async installPackage(
+  private unpackPackage(
     metadata: PackageLoadMetadata,
-    buffer: Uint8Array,
-  ) {
+    buffer: Uint8Array | undefined,
+    cacheKey?: string,
+    manifest?: PackageManifest,
+    mode: PackageInstallMode = "extract",
+  ): string[] {
     let pkg = this.#api.lockfile_packages[metadata.normalizedName];
     if (!pkg) {
       pkg = metadata.packageData;
@@ -460,68 +497,225 @@ export class PackageManager {
     const installDir: string = this.#api.package_loader.get_install_dir(
       pkg.install_dir,
     );
+    const installMetadata = new Map([
+      ["INSTALLER", INSTALLER],
+      [
+        "PYODIDE_SOURCE",
+        metadata.channel === this.defaultChannel ? "pyodide" : metadata.channel,
+      ],
+    ]);
+
+    if (cacheKey !== undefined) {
+      return this.#installer.unpackFromCache(
+        cacheKey,
+        buffer,
+        filename,
+        installDir,
+        installMetadata,
+      );
+    }
 
-    await this.#installer.install(
-      buffer,
+    return this.#installer.unpack(
+      buffer!,
       filename,
       installDir,
-      new Map([
-        ["INSTALLER", INSTALLER],
-        [
-          "PYODIDE_SOURCE",
-          metadata.channel === this.defaultChannel
-            ? "pyodide"
-            : metadata.channel,
-        ],
-      ]),
+      installMetadata,
+      manifest,
+      mode === "zipimport",
+    );
+  }
+
+  /**
+   * Get the entry of a package in package-manifests.json. Only packages from
+   * the default channel have one, and only if it was generated from the same
+   * wheel as the one in the lock file.
+   * @param pkg The package to load
+   * @returns The manifest or undefined if there is none.
+   * @private
+   */
+  private async packageManifest(
+    pkg: PackageLoadMetadata,
+  ): Promise<PackageManifest | undefined> {
+    if (pkg.channel !== this.defaultChannel) {
+      return undefined;
+    }
+    const manifests = await this.#api.packageManifestsPromise;
+    const manifest = manifests[pkg.normalizedName];
+    const sha256 = this.#api.lockfile_packages[pkg.normalizedName]?.sha256;
+    if (!manifest || !sha256 || manifest.sha256 !== sha256) {
+      return undefined;
+    }
+    return manifest;
+  }
+
+  /**
+   * The directories inside a package that contain shared libraries needed by
+   * other shared libraries of the package, according to its manifest.
+   * @private
+   */
+  private manifestSearchDirs(
+    pkg: PackageLoadMetadata,
+    manifest: PackageManifest | undefined,
+  ): string[] {
+    if (!manifest) {
+      return [];
+    }
+    const dynlibs = new Set(manifest.dynlibs);
+    const dirs = new Set<string>();
+    for (const libs of Object.values(manifest.needed)) {
+      for (const lib of libs) {
+        const sep = lib.lastIndexOf("/");
+        if (sep !== -1 && dynlibs.has(lib)) {
+          dirs.add(lib.slice(0, sep));
+        }
+      }
+    }
+    if (dirs.size === 0) {
+      return [];
+    }
+    const installDir: string = this.#api.package_loader.get_install_dir(
+      pkg.packageData.install_dir,
     );
+    return Array.from(dirs, (dir) => `${installDir}/${dir}`);
   }
 
   /**
-   * Download and install the package.
-   * Downloads can be done in parallel, but installs must be done for dependencies first.
+   * Get the key of a package in the extracted package cache. Only packages from
+   * the default channel are cached, since only those have a sha256 in the lock
+   * file.
+   * @param pkg The package to load
+   * @returns The cache key or undefined if the package shouldn't be cached.
+   * @private
+   */
+  private extractedPackageCacheKey(
+    pkg: PackageLoadMetadata,
+  ): string | undefined {
+    if (!IN_NODE || !this.#api.config.extractedPackageCacheDir) {
+      return undefined;
+    }
+    if (pkg.channel !== this.defaultChannel) {
+      return undefined;
+    }
+    return this.#api.lockfile_packages[pkg.normalizedName]?.sha256 || undefined;
+  }
+
+  /**
+   * Check whether the extracted package cache has a complete entry for
+   * ``cacheKey``. If so, we don't need to download the package at all.
+   * @private
+   */
+  private async isExtractedPackageCached(cacheKey: string): Promise<boolean> {
+    const manifest = resolvePath(
+      `${cacheKey}.json`,
+      this.#api.config.extractedPackageCacheDir,
+    );
+    try {
+      await nodeFsPromisesMod.stat(manifest);
+      return true;
+    } catch {
+      return false;
+    }
+  }
+
+  /**
+   * Download and unpack the package.
+   * This doesn't depend on other packages, so it runs in parallel for all
+   * packages. Loading shared libraries is done afterwards by
+   * loadPackageDynlibs.
    * @param pkg The package to load
-   * @param toLoad The map of package names to PackageLoadMetadata
-   * @param loaded The set of loaded package metadata, this will be updated by this function.
    * @param failed The map of <failed package name, error message>, this will be updated by this function.
+   * @param acquireDownloadSlot The semaphore limiting concurrent downloads.
    * @param checkIntegrity Whether to check the integrity of the downloaded
    * package.
+   * @param mode How to install the package, see loadPackage
+   * @returns The paths to the shared libraries in the package or undefined if
+   * it failed.
    * @private
    */
-  private async downloadAndInstall(
+  private async downloadAndUnpack(
     pkg: PackageLoadMetadata,
-    toLoad: Map<string, PackageLoadMetadata>,
-    loaded: Set<InternalPackageData>,
     failed: Map<string, Error>,
+    acquireDownloadSlot: () => Promise<() => void>,
     checkIntegrity: boolean = true,
-  ) {
-    if (loadedPackages[pkg.name] !== undefined) {
-      return;
+    mode: PackageInstallMode = "extract",
+  ): Promise<string[] | undefined> {
+    if (this.getLoadedPackageChannel(pkg.name)) {
+      return undefined;
     }
 
     try {
-      const buffer = await this.downloadPackage(pkg, checkIntegrity);
-      const installPromiseDependencies = pkg.depends.map((dependency) => {
-        return toLoad.has(dependency)
-          ? toLoad.get(dependency)!.done
-          : Promise.resolve();
-      });
-      // Can't install until bootstrap is finalized.
+      // The extracted package cache has all files of the package, so it is
+      // only used when extracting.
+      const cacheKey =
+        mode === "extract" ? this.extractedPackageCacheKey(pkg) : undefined;
+      const cached =
+        cacheKey !== undefined &&
+        (await this.isExtractedPackageCached(cacheKey));
+      let buffer: Uint8Array | undefined;
+      if (!cached) {
+        const releaseDownloadSlot = await acquireDownloadSlot();
+        const start = performance.now();
+        try {
+          buffer = await this.downloadPackage(pkg, checkIntegrity);
+        } finally {
+          releaseDownloadSlot();
+          pkg.timings.download = performance.now() - start;
+        }
+      }
+      const manifest = await this.packageManifest(pkg);
+      // Can't unpack until bootstrap is finalized.
       await this.#api.bootstrapFinalizedPromise;
 
-      // wait until all dependencies are installed
-      await Promise.all(installPromiseDependencies);
+      const start = performance.now();
+      let dynlibs: string[];
+      try {
+        dynlibs = this.unpackPackage(pkg, buffer, cacheKey, manifest, mode);
+      } finally {
+        pkg.timings.extract = performance.now() - start;
+      }
+      // Compiling the shared libraries doesn't depend on other packages either,
+      // so start it right away. They are instantiated by loadPackageDynlibs.
+      this.#installer.compileDynlibs(dynlibs);
+      return dynlibs;
+    } catch (err: any) {
+      failed.set(pkg.name, err);
+      // We don't throw error when loading a package fails, but just report it.
+      return undefined;
+    }
+  }
 
-      await this.installPackage(pkg, buffer);
+  /**
+   * Load the shared libraries of an unpacked package. This must only be
+   * called after the shared libraries of the dependencies of the package have
+   * been loaded.
+   * @param pkg The package to load
+   * @param dynlibs The paths to the shared libraries returned by downloadAndUnpack
+   * @param loaded The set of loaded packages, this will be updated by this function.
+   * @param failed The map of <failed package name, error message>, this will be updated by this function.
+   * @private
+   */
+  private async loadPackageDynlibs(
+    pkg: PackageLoadMetadata,
+    dynlibs: string[],
+    loaded: Set<PackageLoadMetadata>,
+    failed: Map<string, Error>,
+  ) {
+    const start = performance.now();
+    try {
+      const manifest = await this.packageManifest(pkg);
+      const lookupStats = await this.#installer.loadDynlibs(
+        pkg.packageData.file_name,
+        dynlibs,
+        this.manifestSearchDirs(pkg, manifest),
+      );
+      pkg.timings.dynlibLookup = lookupStats.time;
 
-      loaded.add(pkg.packageData);
-      loadedPackages[pkg.name] = pkg.channel;
+      loaded.add(pkg);
+      this.loadedPackages[pkg.name] = pkg.channel;
     } catch (err: any) {
       failed.set(pkg.name, err);
-      // We don't throw error when loading a package fails, but just report it.
-      // pkg.done.reject(err);
     } finally {
-      pkg.done.resolve();
+      pkg.timings.dynlibLoad = performance.now() - start;
     }
   }
 
@@ -572,12 +766,63 @@ export class PackageManager {
 }
 
 function filterPackageData({
-  name,
-  version,
-  file_name,
-  package_type,
-}: InternalPackageData): PackageData {
-  return { name, version, fileName: file_name, packageType: package_type };
+  packageData: { name, version, file_name, package_type },
+  timings,
+}: PackageLoadMetadata): PackageData {
+  return {
+    name,
+    version,
+    fileName: file_name,
+    packageType: package_type,
+    timings,
+  };
+}
+
+function newPackageLoadTimings(): PackageLoadTimings {
+  return { download: 0, extract: 0, dynlibLoad: 0, dynlibLookup: 0 };
+}
+
+/**
+ * Split the packages to load into waves, such that the dependencies of each
+ * package are in earlier waves. The shared libraries of the packages in a
+ * wave can be loaded once the previous waves are done.
+ * @param toLoad The map of package names to PackageLoadMetadata
+ * @returns The list of waves
+ * @private
+ */
+export function installWaves(
+  toLoad: Map<string, PackageLoadMetadata>,
+): PackageLoadMetadata[][] {
+  const depths = new Map<string, number>();
+  const depth = (pkg: PackageLoadMetadata): number => {
+    const known = depths.get(pkg.normalizedName);
+    if (known !== undefined) {
+      return known;
+    }
+    // Guard against dependency cycles.
+    depths.set(pkg.normalizedName, 0);
+    let result = 0;
+    for (const dependency of pkg.depends) {
+      const dep = toLoad.get(canonicalizePackageName(dependency));
+      if (dep) {
+        result = Math.max(result, depth(dep) + 1);
+      }
+    }
+    depths.set(pkg.normalizedName, result);
+    return result;
+  };
+
+  const waves = new Map<number, PackageLoadMetadata[]>();
+  for (const pkg of toLoad.values()) {
+    const d = depth(pkg);
+    if (!waves.has(d)) {
+      waves.set(d, []);
+    }
+    waves.get(d)!.push(pkg);
+  }
+  return Array.from(waves.keys())
+    .sort((a, b) => a - b)
+    .map((d) => waves.get(d)!);
 }
 
 /**
@@ -7,18 +7,26 @@ import {
   initNodeModules,
   resolvePath,
   loadLockFile,
+  loadPackageManifests,
 } from "./compat";
 
 import { createSettings } from "./emscripten-settings";
 import { version } from "./version";
 
 import type { PyodideInterface } from "./api.js";
-import type { TypedArray, Module, PackageData, FSType } from "./types";
+import type {
+  TypedArray,
+  Module,
+  PackageData,
+  PackageInstallMode,
+  FSType,
+  StartupTimings,
+} from "./types";
 import type { EmscriptenSettings } from "./emscripten-settings";
 import type { SnapshotConfig } from "./snapshot";
 export type { PyodideInterface, TypedArray };
 
-export { version, type PackageData };
+export { version, type PackageData, type PackageInstallMode };
 
 declare function _createPyodideModule(
   settings: EmscriptenSettings,
@@ -32,6 +40,24 @@ declare function _createPyodideModule(
 // different build will fail badly. See logic in snapshot.ts.
 declare const BUILD_ID: string;
 
+/**
+ * Get the bytes of a snapshot, decompressing it if it was compressed with
+ * gzip.
+ */
+async function readSnapshot(
+  snp: Uint8Array | ArrayBuffer | PromiseLike<Uint8Array | ArrayBuffer>,
+): Promise<Uint8Array> {
+  const data = await snp;
+  const bytes = ArrayBuffer.isView(data) ? data : new Uint8Array(data);
+  if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+    return bytes;
+  }
+  const stream = new Blob([bytes])
+    .stream()
+    .pipeThrough(new DecompressionStream("gzip"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
 /**
  * See documentation for loadPyodide.
  * @hidden
@@ -39,6 +65,8 @@ declare const BUILD_ID: string;
 export type ConfigType = {
   indexURL: string;
   packageCacheDir: string;
+  extractedPackageCacheDir?: string;
+  bytecodeCacheDir?: string;
   lockFileURL: string;
   fullStdLib?: boolean;
   stdLibURL?: string;
@@ -93,6 +121,34 @@ export async function loadPyodide(
      */
     packageCacheDir?: string;
 
+    /**
+     * The file path where extracted packages will be cached in node. If set,
+     * packages from the default channel are unpacked into this directory the
+     * first time they are loaded (keyed by the sha256 from the lock file) and
+     * later loads copy the extracted files from the cache into site-packages
+     * instead of downloading and decompressing the wheel again. Such loads
+     * skip the integrity check: the cache is trusted because its entries are
+     * keyed by the sha256 of the wheel, so only point this at a directory
+     * that untrusted code can't write to. The directory can be shared between
+     * processes. Only applies when running in node; ignored in browsers.
+     *
+     * Default: ``undefined`` (no extracted package cache)
+     */
+    extractedPackageCacheDir?: string;
+
+    /**
+     * A directory in which the bytecode of imported Python modules is stored,
+     * so that later sessions can import them without compiling them again. In
+     * node the host directory with this path is mounted, in browsers the
+     * directory is backed by IndexedDB; call ``pyodide.FS.syncfs(false,
+     * callback)`` to persist newly compiled modules. See
+     * :js:func:`pyodide.bytecodeCacheStats` for how well the cache works.
+     *
+     * Default: ``undefined`` (no bytecode is written)
+     * @experimental
+     */
+    bytecodeCacheDir?: string;
+
     /**
      * The URL from which Pyodide will load the Pyodide ``pyodide-lock.json`` lock
      * file. You can produce custom lock files with :py:func:`micropip.freeze`.
@@ -203,9 +259,15 @@ export async function loadPyodide(
       | ArrayBuffer
       | PromiseLike<Uint8Array | ArrayBuffer>;
     /** @ignore */
+    _snapshotBase?:
+      | Uint8Array
+      | ArrayBuffer
+      | PromiseLike<Uint8Array | ArrayBuffer>;
+    /** @ignore */
     _snapshotDeserializer?: (obj: any) => any;
   } = {},
 ): Promise<PyodideInterface> {
+  const startTime = performance.now();
   await initNodeModules();
   let indexURL = options.indexURL || (await calculateDirname());
   indexURL = resolvePath(indexURL); // A relative indexURL causes havoc.
@@ -241,32 +303,52 @@ export async function loadPyodide(
   config.env.PYTHONINSPECT ??= "1";
   const emscriptenSettings = createSettings(config);
   const API = emscriptenSettings.API;
+  // Durations of the phases of loadPyodide in milliseconds. Used by the cold
+  // start benchmarks.
+  const timings: StartupTimings = {};
+  API.startupTimings = timings;
   API.lockFilePromise = loadLockFile(config.lockFileURL);
+  API.packageManifestsPromise = loadPackageManifests(
+    config.indexURL + "package-manifests.json",
+  );
 
   // If the pyodide.asm.js script has been imported, we can skip the dynamic import
   // Users can then do a static import of the script in environments where
   // dynamic importing is not allowed or not desirable, like module-type service workers
   if (typeof _createPyodideModule !== "function") {
     const scriptSrc = `${config.indexURL}pyodide.asm.js`;
+    const loadScriptStart = performance.now();
     await loadScript(scriptSrc);
+    timings.loadScript = performance.now() - loadScriptStart;
   }
 
   let snapshot: Uint8Array | undefined = undefined;
+  let snapshotBase: Uint8Array | undefined = undefined;
   if (options._loadSnapshot) {
-    const snp = await options._loadSnapshot;
-    if (ArrayBuffer.isView(snp)) {
-      snapshot = snp;
-    } else {
-      snapshot = new Uint8Array(snp);
-    }
+    [snapshot, snapshotBase] = await Promise.all([
+      readSnapshot(options._loadSnapshot),
+      options._snapshotBase && readSnapshot(options._snapshotBase),
+    ]);
     emscriptenSettings.noInitialRun = true;
-    // @ts-ignore
-    emscriptenSettings.INITIAL_MEMORY = snapshot.length;
+    // The fourth word of the header is the size of the memory in Wasm pages.
+    // It is zero in invalid snapshots, which are rejected once the module is
+    // instantiated.
+    const memoryPages = new Uint32Array(
+      snapshot.buffer,
+      snapshot.byteOffset,
+      4,
+    )[3];
+    if (memoryPages) {
+      // @ts-ignore
+      emscriptenSettings.INITIAL_MEMORY = memoryPages * 65536;
+    }
   }
 
   // _createPyodideModule is specified in the Makefile by the linker flag:
   // `-s EXPORT_NAME="'_createPyodideModule'"`
+  const instantiateStart = performance.now();
   const Module = await _createPyodideModule(emscriptenSettings);
+  timings.instantiate = performance.now() - instantiateStart;
   // Handle early exit
   if (emscriptenSettings.exitCode !== undefined) {
     throw new Module.ExitStatus(emscriptenSettings.exitCode);
@@ -288,13 +370,18 @@ If you updated the Pyodide version, make sure you also updated the 'indexURL' pa
 
   let snapshotConfig: SnapshotConfig | undefined = undefined;
   if (snapshot) {
-    snapshotConfig = API.restoreSnapshot(snapshot);
+    const restoreStart = performance.now();
+    snapshotConfig = API.restoreSnapshot(snapshot, snapshotBase);
+    await API.reloadSnapshotDynlibs(snapshot, snapshotConfig, snapshotBase);
+    timings.snapshotRestore = performance.now() - restoreStart;
   }
   // runPython works starting after the call to finalizeBootstrap.
+  const bootstrapStart = performance.now();
   const pyodide = API.finalizeBootstrap(
     snapshotConfig,
     options._snapshotDeserializer,
   );
+  timings.bootstrap = performance.now() - bootstrapStart;
   API.sys.path.insert(0, API.config.env.HOME);
 
   if (!pyodide.version.includes("dev")) {
@@ -303,9 +390,12 @@ If you updated the Pyodide version, make sure you also updated the 'indexURL' pa
     API.setCdnUrl(`https://cdn.jsdelivr.net/pyodide/v${pyodide.version}/full/`);
   }
   API._pyodide.set_excepthook();
+  const packageIndexStart = performance.now();
   await API.packageIndexReady;
+  timings.packageIndex = performance.now() - packageIndexStart;
   // I think we want this initializeStreams call to happen after
   // packageIndexReady? I don't remember why.
   API.initializeStreams(config.stdin, config.stdout, config.stderr);
+  timings.total = performance.now() - startTime;
   return pyodide;
 }
@@ -1,4 +1,6 @@
 import { scheduleCallback } from "./scheduler";
+import { loadedPackages } from "./load-package";
+import { LoadedDynlib } from "./types";
 
 declare var Module: any;
 
@@ -57,22 +59,293 @@ export function makeGlobalsProxy(
 
 type SerializedHiwireValue = { path: string[] } | { serialized: any } | null;
 
+/**
+ * A file or directory of an installed package. The contents of a file are at
+ * ``offset`` from the start of the files section of the snapshot.
+ */
+type SnapshotFile = {
+  path: string;
+  mode: number;
+  offset?: number;
+  size?: number;
+  link?: string;
+};
+
+/**
+ * The state of the packages loaded with loadPackage, which is not in the Wasm
+ * memory.
+ */
+type SnapshotPackages = {
+  loadedPackages: { [name: string]: string };
+  dynlibs: LoadedDynlib[];
+  files: SnapshotFile[];
+};
+
 /**
  * @hidden
  */
 export type SnapshotConfig = {
   hiwireKeys: SerializedHiwireValue[];
   immortalKeys: string[];
+  packages?: SnapshotPackages;
+  /** A random id of the snapshot */
+  id?: string;
+  /** The id of the snapshot that this one is a delta against */
+  base?: string;
 };
 
+// A snapshot consists of the header, the JSON encoded SnapshotConfig, the
+// contents of the files of the installed packages and the Wasm memory. The
+// files and the memory start at a multiple of 16 bytes.
+//
+// The memory is stored in pages of PAGE_SIZE bytes. It starts with one byte
+// per page that says whether the page is all zeros, stored in the snapshot or
+// the same as in the base snapshot. The stored pages follow, in order.
 const SNAPSHOT_MAGIC = 0x706e7300; // "\x00snp"
 const HEADER_SIZE_IN_BYTES =
   4 /* magic */ +
   4 /* offset to binary */ +
   4 /* json length */ +
-  4 /* padding */ +
+  4 /* memory size in Wasm pages */ +
   32; /* build id */
 
+const WASM_PAGE_SIZE = 65536;
+const PAGE_SIZE = 4096;
+const ZERO_PAGE = 0;
+const STORED_PAGE = 1;
+const BASE_PAGE = 2;
+
+const align16 = (offset: number) => Math.ceil(offset / 16) * 16;
+
+/**
+ * The parts of a snapshot. ``getPage`` returns the contents of a page of the
+ * memory or undefined if it is all zeros.
+ */
+type ParsedSnapshot = {
+  config: SnapshotConfig;
+  files: Uint8Array;
+  numPages: number;
+  kinds: Uint8Array;
+  getPage: (page: number) => Uint8Array | undefined;
+};
+
+function parseSnapshot(
+  snapshot: Uint8Array,
+  base?: ParsedSnapshot,
+): ParsedSnapshot {
+  const uint32View = new Uint32Array(
+    snapshot.buffer,
+    snapshot.byteOffset,
+    HEADER_SIZE_IN_BYTES / 4,
+  );
+  if (uint32View[0] !== SNAPSHOT_MAGIC) {
+    throw new Error("Snapshot has invalid magic number");
+  }
+  const snapshotOffset = uint32View[1];
+  const jsonLength = uint32View[2];
+  const numPages = (uint32View[3] * WASM_PAGE_SIZE) / PAGE_SIZE;
+  const buildId = decodeBuildId(uint32View.subarray(4, 4 + 8));
+  if (buildId !== API.config.BUILD_ID) {
+    throw new Error(
+      "Snapshot build id mismatch\n" +
+        `expected: ${API.config.BUILD_ID}\n` +
+        `got     : ${buildId}\n`,
+    );
+  }
+  const jsonBuf = snapshot.subarray(
+    HEADER_SIZE_IN_BYTES,
+    HEADER_SIZE_IN_BYTES + jsonLength,
+  );
+  const config: SnapshotConfig = JSON.parse(new TextDecoder().decode(jsonBuf));
+  if (config.base !== undefined && config.base !== base?.config.id) {
+    throw new Error(
+      base
+        ? "The snapshot is a delta against a different base snapshot"
+        : "The snapshot is a delta, pass its base snapshot as _snapshotBase",
+    );
+  }
+  const files = snapshot.subarray(
+    align16(HEADER_SIZE_IN_BYTES + jsonLength),
+    snapshotOffset,
+  );
+  const kinds = snapshot.subarray(snapshotOffset, snapshotOffset + numPages);
+  const data = snapshot.subarray(snapshotOffset + align16(numPages));
+  // The index of each stored page among the stored pages
+  const storedIndex = new Int32Array(numPages);
+  let stored = 0;
+  for (let page = 0; page < numPages; page++) {
+    storedIndex[page] = stored;
+    if (kinds[page] === STORED_PAGE) {
+      stored++;
+    }
+  }
+  const getPage = (page: number): Uint8Array | undefined => {
+    switch (kinds[page]) {
+      case STORED_PAGE: {
+        const start = storedIndex[page] * PAGE_SIZE;
+        return data.subarray(start, start + PAGE_SIZE);
+      }
+      case BASE_PAGE:
+        return base!.getPage(page);
+      default:
+        return undefined;
+    }
+  };
+  return { config, files, numPages, kinds, getPage };
+}
+
+/**
+ * Whether a page is all zeros, or equal to ``other`` if it is given.
+ */
+function pageEquals(page: Uint8Array, other?: Uint8Array): boolean {
+  // Compare 32 bits at a time when we can.
+  const aligned =
+    page.byteOffset % 4 === 0 && (!other || other.byteOffset % 4 === 0);
+  const a = aligned
+    ? new Uint32Array(page.buffer, page.byteOffset, PAGE_SIZE / 4)
+    : page;
+  const b =
+    other &&
+    (aligned
+      ? new Uint32Array(other.buffer, other.byteOffset, PAGE_SIZE / 4)
+      : other);
+  for (let i = 0; i < a.length; i++) {
+    if (a[i] !== (b ? b[i] : 0)) {
+      return false;
+    }
+  }
+  return true;
+}
+
+/**
+ * Encode the Wasm memory, leaving out the pages that are all zeros or the same
+ * as in ``base``.
+ */
+function encodeMemory(
+  heap: Uint8Array,
+  base?: ParsedSnapshot,
+): [Uint8Array, number[]] {
+  const numPages = heap.length / PAGE_SIZE;
+  const kinds = new Uint8Array(numPages);
+  const stored: number[] = [];
+  for (let page = 0; page < numPages; page++) {
+    const contents = heap.subarray(page * PAGE_SIZE, (page + 1) * PAGE_SIZE);
+    if (pageEquals(contents)) {
+      kinds[page] = ZERO_PAGE;
+      continue;
+    }
+    const basePage = base && page < base.numPages && base.getPage(page);
+    if (basePage && pageEquals(contents, basePage)) {
+      kinds[page] = BASE_PAGE;
+      continue;
+    }
+    kinds[page] = STORED_PAGE;
+    stored.push(page);
+  }
+  return [kinds, stored];
+}
+
+/**
+ * Copy the memory of a snapshot into the Wasm memory. Runs of zero pages and of
+ * stored pages are copied at once.
+ */
+function restoreMemory(snapshot: ParsedSnapshot): void {
+  const heap: Uint8Array = Module.HEAPU8;
+  const { numPages, kinds, getPage } = snapshot;
+  let page = 0;
+  while (page < numPages) {
+    const kind = kinds[page];
+    let end = page + 1;
+    while (end < numPages && kinds[end] === kind && kind !== BASE_PAGE) {
+      end++;
+    }
+    if (kind === ZERO_PAGE) {
+      heap.fill(0, page * PAGE_SIZE, end * PAGE_SIZE);
+    } else if (kind === STORED_PAGE) {
+      // Stored pages are contiguous in the snapshot.
+      const first = getPage(page)!;
+      const run = new Uint8Array(
+        first.buffer,
+        first.byteOffset,
+        (end - page) * PAGE_SIZE,
+      );
+      heap.set(run, page * PAGE_SIZE);
+    } else {
+      const contents = getPage(page);
+      if (contents) {
+        heap.set(contents, page * PAGE_SIZE);
+      } else {
+        heap.fill(0, page * PAGE_SIZE, end * PAGE_SIZE);
+      }
+    }
+    page = end;
+  }
+}
+
+function randomId(): string {
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+/**
+ * Collect the files in the directories that packages are installed into. The
+ * file system isn't part of the Wasm memory, so they are stored next to it in
+ * the snapshot.
+ */
+function collectPackageFiles(): [SnapshotFile[], Uint8Array[]] {
+  const FS = Module.FS;
+  const files: SnapshotFile[] = [];
+  const contents: Uint8Array[] = [];
+  let offset = 0;
+  const visit = (path: string) => {
+    const node = FS.lookupPath(path, { follow: false }).node;
+    const mode = node.mode;
+    if (FS.isLink(mode)) {
+      files.push({ path, mode, link: FS.readlink(path) });
+    } else if (FS.isDir(mode)) {
+      files.push({ path, mode });
+      for (const name of FS.readdir(path)) {
+        if (name !== "." && name !== "..") {
+          visit(Module.PATH.join2(path, name));
+        }
+      }
+    } else if (FS.isFile(mode)) {
+      const data = FS.readFile(path);
+      files.push({ path, mode, offset, size: data.length });
+      contents.push(data);
+      offset = align16(offset + data.length);
+    }
+  };
+  for (const dir of new Set([API.sitepackages, API.dsodir])) {
+    if (FS.analyzePath(dir).exists) {
+      visit(dir);
+    }
+  }
+  return [files, contents];
+}
+
+/**
+ * Write the files of the installed packages back. Files that exist already
+ * are the same as in the snapshot, since they are part of the Pyodide
+ * distribution.
+ */
+function restorePackageFiles(files: SnapshotFile[], data: Uint8Array): void {
+  const FS = Module.FS;
+  for (const { path, mode, offset, size, link } of files) {
+    if (FS.analyzePath(path).exists) {
+      continue;
+    }
+    if (link !== undefined) {
+      FS.symlink(link, path);
+    } else if (FS.isDir(mode)) {
+      FS.mkdirTree(path, mode);
+    } else {
+      FS.writeFile(path, data.subarray(offset!, offset! + size!));
+      FS.chmod(path, mode);
+    }
+  }
+}
+
 function encodeBuildId(buildId: string, buffer: Uint32Array): void {
   if (buffer.length !== 8) {
     throw new Error("Expected 256 bit buffer");
@@ -197,64 +470,94 @@ API.serializeHiwireState = function (
   };
 };
 
-API.makeSnapshot = function (serializer?: (obj: any) => any): Uint8Array {
+API.makeSnapshot = function (
+  serializer?: (obj: any) => any,
+  base?: Uint8Array,
+): Uint8Array {
   if (!API.config._makeSnapshot) {
     throw new Error(
       "makeSnapshot only works if you passed the makeSnapshot option to loadPyodide",
     );
   }
+  const parsedBase = base && parseSnapshot(base);
+  if (parsedBase?.config.base !== undefined) {
+    throw new Error("The base snapshot can't be a delta itself");
+  }
   const snapshotConfig = API.serializeHiwireState(serializer);
-  const snapshotConfigString = JSON.stringify(snapshotConfig);
-  let snapshotOffset = HEADER_SIZE_IN_BYTES + 2 * snapshotConfigString.length;
-  // align to 16 bytes
-  snapshotOffset = Math.ceil(snapshotOffset / 16) * 16;
-  const snapshot = new Uint8Array(snapshotOffset + Module.HEAP8.length);
-  const encoder = new TextEncoder();
-  const { written: jsonLength } = encoder.encodeInto(
-    snapshotConfigString,
-    snapshot.subarray(HEADER_SIZE_IN_BYTES),
+  const [files, contents] = collectPackageFiles();
+  snapshotConfig.packages = {
+    loadedPackages: { ...loadedPackages },
+    dynlibs: API.dynlibsForSnapshot(),
+    files,
+  };
+  snapshotConfig.id = randomId();
+  snapshotConfig.base = parsedBase?.config.id;
+  const json = new TextEncoder().encode(JSON.stringify(snapshotConfig));
+  const filesOffset = align16(HEADER_SIZE_IN_BYTES + json.length);
+  const filesSize = files.reduce(
+    (end, { offset, size }) => Math.max(end, align16(offset! + size!)),
+    0,
   );
+  const snapshotOffset = align16(filesOffset + filesSize);
+  const heap: Uint8Array = Module.HEAPU8;
+  const [kinds, stored] = encodeMemory(heap, parsedBase);
+  const dataOffset = snapshotOffset + align16(kinds.length);
+  const snapshot = new Uint8Array(dataOffset + stored.length * PAGE_SIZE);
+  snapshot.set(json, HEADER_SIZE_IN_BYTES);
+  const regularFiles = files.filter(({ offset }) => offset !== undefined);
+  for (const [i, { offset }] of regularFiles.entries()) {
+    snapshot.set(contents[i], filesOffset + offset!);
+  }
   const uint32View = new Uint32Array(snapshot.buffer);
   uint32View[0] = SNAPSHOT_MAGIC;
   uint32View[1] = snapshotOffset;
-  uint32View[2] = jsonLength!;
-  uint32View[3] = 0; // padding
+  uint32View[2] = json.length;
+  uint32View[3] = heap.length / WASM_PAGE_SIZE;
   encodeBuildId(API.config.BUILD_ID, uint32View.subarray(4, 4 + 8));
-  snapshot.subarray(snapshotOffset).set(Module.HEAP8);
+  snapshot.set(kinds, snapshotOffset);
+  for (const [i, page] of stored.entries()) {
+    snapshot.set(
+      heap.subarray(page * PAGE_SIZE, (page + 1) * PAGE_SIZE),
+      dataOffset + i * PAGE_SIZE,
+    );
+  }
   return snapshot;
 };
 
-API.restoreSnapshot = function (snapshot: Uint8Array): SnapshotConfig {
-  const uint32View = new Uint32Array(
-    snapshot.buffer,
-    snapshot.byteOffset,
-    snapshot.byteLength / 4,
-  );
-  if (uint32View[0] !== SNAPSHOT_MAGIC) {
-    throw new Error("Snapshot has invalid magic number");
-  }
-  const snapshotOffset = uint32View[1];
-  const jsonLength = uint32View[2];
-  const buildId = decodeBuildId(uint32View.subarray(4, 4 + 8));
-  if (buildId !== API.config.BUILD_ID) {
-    throw new Error(
-      "Snapshot build id mismatch\n" +
-        `expected: ${API.config.BUILD_ID}\n` +
-        `got     : ${buildId}\n`,
-    );
+API.restoreSnapshot = function (
+  snapshot: Uint8Array,
+  base?: Uint8Array,
+): SnapshotConfig {
+  const parsed = parseSnapshot(snapshot, base && parseSnapshot(base));
+  restoreMemory(parsed);
+  const snapshotConfig = parsed.config;
+  if (snapshotConfig.packages) {
+    restorePackageFiles(snapshotConfig.packages.files, parsed.files);
+    Object.assign(loadedPackages, snapshotConfig.packages.loadedPackages);
   }
-  const jsonBuf = snapshot.subarray(
-    HEADER_SIZE_IN_BYTES,
-    HEADER_SIZE_IN_BYTES + jsonLength,
-  );
-  snapshot = snapshot.subarray(snapshotOffset);
-  const jsonStr = new TextDecoder().decode(jsonBuf);
-  const snapshotConfig: SnapshotConfig = JSON.parse(jsonStr);
-  // @ts-ignore
-  Module.HEAP8.set(snapshot);
   return snapshotConfig;
 };
 
+/**
+ * Load the shared libraries of the packages in the snapshot again. This has to
+ * happen after restoreSnapshot, since the memory and table base of each library
+ * are stored in the Wasm memory. Loading a library initializes its memory, so
+ * we restore the memory of the snapshot again afterwards.
+ * @private
+ */
+API.reloadSnapshotDynlibs = async function (
+  snapshot: Uint8Array,
+  snapshotConfig: SnapshotConfig,
+  base?: Uint8Array,
+): Promise<void> {
+  const dynlibs = snapshotConfig.packages?.dynlibs ?? [];
+  if (dynlibs.length === 0) {
+    return;
+  }
+  await API.reloadDynlibs(dynlibs);
+  restoreMemory(parseSnapshot(snapshot, base && parseSnapshot(base)));
+};
+
 /**
  * Set up some of the JavaScript state that is normally set up by C
  * initialization code. TODO: adjust C code to simplify.
@@ -1,5 +1,5 @@
 import * as chai from "chai";
-import { createLock } from "../../../common/lock";
+import { createLock, createSemaphore } from "../../../common/lock";
 
 describe("createLock", () => {
   it("should create a lock", () => {
@@ -37,3 +37,38 @@ describe("createLock", () => {
     release2();
   });
 });
+
+describe("createSemaphore", () => {
+  it("should allow up to limit holders", async () => {
+    const semaphore = createSemaphore(2);
+    const release1 = await semaphore();
+    const release2 = await semaphore();
+    let acquired = false;
+    const third = semaphore().then((release) => {
+      acquired = true;
+      return release;
+    });
+
+    await new Promise((resolve) => setTimeout(resolve, 10));
+    chai.assert.isFalse(acquired);
+    release1();
+    const release3 = await third;
+    chai.assert.isTrue(acquired);
+
+    release2();
+    release3();
+  });
+
+  it("should ignore releasing twice", async () => {
+    const semaphore = createSemaphore(1);
+    const release = await semaphore();
+    release();
+    release();
+    const release2 = await semaphore();
+    let acquired = false;
+    semaphore().then(() => (acquired = true));
+    await new Promise((resolve) => setTimeout(resolve, 10));
+    chai.assert.isFalse(acquired);
+    release2();
+  });
+});
@@ -0,0 +1,220 @@
+import * as chai from "chai";
+import { genMockAPI, genMockModule } from "./test-helper.ts";
+import { DynlibLoader, newDynlibLookupStats } from "../../dynload.ts";
+
+// A module whose file system contains exactly ``files``
+const genMockModuleWithFiles = (files: string[]) => {
+  const mockMod = genMockModule();
+  const fileSet = new Set(files);
+  mockMod.PATH = {
+    join2: (a: string, b: string) => `${a}/${b}`,
+    basename: (path: string) => path.slice(path.lastIndexOf("/") + 1),
+    isAbs: (path: string) => path.startsWith("/"),
+  };
+  mockMod.FS.findObject = (path: string) => (fileSet.has(path) ? {} : null);
+  mockMod.FS.readdir = () => {
+    throw new Error("The file system should not be walked");
+  };
+  return mockMod;
+};
+
+describe("DynlibLoader.createDynlibFS", () => {
+  // @ts-ignore
+  globalThis.DEBUG = false;
+
+  it("should find needed libraries in the package index", () => {
+    const mockMod = genMockModuleWithFiles([
+      "/lib/site-packages/pkg/_ext.so",
+      "/lib/site-packages/pkg/deep/nested/libdep.so",
+    ]);
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    const index = new Map([
+      ["libdep.so", "/lib/site-packages/pkg/deep/nested/libdep.so"],
+    ]);
+    const stats = newDynlibLookupStats();
+    const fs = loader.createDynlibFS(
+      "/lib/site-packages/pkg/_ext.so",
+      [],
+      index,
+      stats,
+    );
+
+    chai.assert.isNotNull(fs.findObject("libdep.so", false));
+    fs.readFile("libdep.so");
+    chai.assert.equal(stats.lookups, 2);
+    // The second lookup is answered by the per-library memo
+    chai.assert.equal(stats.indexHits, 1);
+  });
+
+  it("should share the ld cache within a module", async () => {
+    const mockMod = genMockModuleWithFiles([
+      "/lib/site-packages/a.libs/liba.so",
+      "/lib/site-packages/b/_ext.so",
+    ]);
+    const first = new DynlibLoader(genMockAPI(), mockMod);
+    await first.loadDynlibsFromPackage(
+      { file_name: "a-1.0-py3-none-any.whl" },
+      ["/lib/site-packages/a.libs/liba.so"],
+    );
+
+    const second = new DynlibLoader(genMockAPI(), mockMod);
+    const stats = newDynlibLookupStats();
+    const fs = second.createDynlibFS(
+      "/lib/site-packages/b/_ext.so",
+      [],
+      new Map(),
+      stats,
+    );
+    chai.assert.isNotNull(fs.findObject("liba.so", false));
+    chai.assert.equal(stats.ldCacheHits, 1);
+
+    const otherModule = genMockModuleWithFiles([]);
+    const third = new DynlibLoader(genMockAPI(), otherModule);
+    chai.assert.equal(third.ldCache.size, 0);
+  });
+});
+
+describe("DynlibLoader.loadDynlibsFromPackage", () => {
+  // @ts-ignore
+  globalThis.DEBUG = false;
+
+  // The smallest valid wasm module: the magic number and the version
+  const emptyWasm = new Uint8Array([0, 0x61, 0x73, 0x6d, 1, 0, 0, 0]);
+
+  it("should pass compiled modules to Emscripten", async () => {
+    const libs = [
+      "/lib/site-packages/pkg/_a.so",
+      "/lib/site-packages/pkg/_b.so",
+    ];
+    const mockMod = genMockModuleWithFiles(libs);
+    mockMod.FS.readFile = () => emptyWasm;
+    const loaded: any[] = [];
+    mockMod.loadDynamicLibrary = async (lib: string, flags: any) => {
+      flags.fs.findObject(lib, false);
+      loaded.push(flags.fs.readFile(lib));
+    };
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    loader.compileDynlibs(libs.slice(0, 1));
+    await loader.loadDynlibsFromPackage(
+      { file_name: "pkg-1.0-py3-none-any.whl" },
+      libs,
+    );
+
+    chai.assert.equal(loaded.length, 2);
+    for (const module of loaded) {
+      chai.assert.instanceOf(module, WebAssembly.Module);
+    }
+  });
+
+  it("should read libraries that failed to compile again", async () => {
+    const lib = "/lib/site-packages/pkg/_linux.so";
+    const mockMod = genMockModuleWithFiles([lib]);
+    const notWasm = new Uint8Array([0x7f, 0x45, 0x4c, 0x46]);
+    mockMod.FS.readFile = () => notWasm;
+    let data: any;
+    mockMod.loadDynamicLibrary = async (lib: string, flags: any) => {
+      data = flags.fs.readFile(lib);
+    };
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    await loader.loadDynlibsFromPackage(
+      { file_name: "pkg-1.0-py3-none-any.whl" },
+      [lib],
+    );
+
+    chai.assert.strictEqual(data, notWasm);
+  });
+});
+
+describe("DynlibLoader.loadDynlib", () => {
+  // @ts-ignore
+  globalThis.DEBUG = false;
+
+  it("should load needed libraries first, each with a handle", async () => {
+    const ext = "/lib/site-packages/pkg/_ext.so";
+    const dep = "/lib/site-packages/pkg.libs/libdep.so";
+    const mockMod = genMockModuleWithFiles([ext, dep]);
+    mockMod.getDylinkMetadata = (binary: any) => ({
+      neededDynlibs: binary.path === ext ? ["libdep.so"] : [],
+    });
+    mockMod.FS.readFile = (path: string) => ({ path }) as any;
+    let nextHandle = 16;
+    mockMod._calloc = () => (nextHandle += 128);
+    const loaded: [string, number][] = [];
+    mockMod.loadDynamicLibrary = async (lib: string, flags, scope, handle) => {
+      loaded.push([lib, handle!]);
+      mockMod.LDSO.loadedLibsByName[lib] = { name: lib };
+      mockMod.LDSO.loadedLibsByHandle[handle!] = { name: lib };
+    };
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    await loader.loadDynlib(ext, false, [], new Map([["libdep.so", dep]]));
+
+    chai.assert.deepEqual(loaded, [
+      [dep, 144],
+      [ext, 272],
+    ]);
+    const dynlibs = loader.loadedDynlibs;
+    chai.assert.deepEqual(
+      dynlibs.map(({ path, handle }) => [path, handle]),
+      loaded,
+    );
+    // They share the local scope of the library
+    chai.assert.equal(dynlibs[0].scope, dynlibs[1].scope);
+    chai.assert.notEqual(dynlibs[0].scope, 0);
+  });
+
+  it("should read each library once and skip loaded ones", async () => {
+    const ext = "/lib/site-packages/pkg/_ext.so";
+    const mockMod = genMockModuleWithFiles([ext]);
+    const reads: string[] = [];
+    mockMod.FS.readFile = (path: string) => {
+      reads.push(path);
+      return { path } as any;
+    };
+    mockMod.loadDynamicLibrary = async (lib: string, flags) => {
+      if (!(lib in mockMod.LDSO.loadedLibsByName)) {
+        flags!.fs.readFile(lib);
+        mockMod.LDSO.loadedLibsByName[lib] = { name: lib };
+      }
+    };
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    await loader.loadDynlib(ext, false, []);
+    chai.assert.deepEqual(reads, [ext]);
+
+    await loader.loadDynlib(ext, true, []);
+    chai.assert.deepEqual(reads, [ext]);
+    chai.assert.isTrue(loader.loadedDynlibs[0].global);
+  });
+
+  it("should free the handle of a library that failed to load", async () => {
+    const ext = "/lib/site-packages/pkg/_ext.so";
+    const mockMod = genMockModuleWithFiles([ext]);
+    mockMod._calloc = () => 144;
+    const freed: number[] = [];
+    mockMod._free = (ptr: number) => {
+      freed.push(ptr);
+    };
+    mockMod.loadDynamicLibrary = async () => {
+      throw new Error("failed");
+    };
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    let error: any;
+    try {
+      await loader.loadDynlib(ext, false, []);
+    } catch (e) {
+      error = e;
+    }
+    chai.assert.equal(error?.message, "failed");
+    chai.assert.deepEqual(freed, [144]);
+    chai.assert.deepEqual(loader.loadedDynlibs, []);
+  });
+
+  it("should refuse snapshots with libraries loaded otherwise", () => {
+    const mockMod = genMockModuleWithFiles([]);
+    mockMod.LDSO.loadedLibsByName["libother.so"] = {};
+    const loader = new DynlibLoader(genMockAPI(), mockMod);
+    chai.assert.throws(
+      () => loader.dynlibsForSnapshot(),
+      /libother.so was not loaded by loadPackage/,
+    );
+  });
+});
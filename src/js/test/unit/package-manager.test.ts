@@ -1,6 +1,10 @@
 import * as chai from "chai";
 import sinon from "sinon";
-import { PackageManager, toStringArray } from "../../load-package.ts";
+import {
+  PackageManager,
+  toStringArray,
+  installWaves,
+} from "../../load-package.ts";
 import { genMockAPI, genMockModule } from "./test-helper.ts";
 
 describe("PackageManager", () => {
@@ -96,3 +100,53 @@ describe("getLoadedPackageChannel", () => {
     chai.assert.equal(notLoadedPackage, null);
   });
 });
+
+describe("installWaves", () => {
+  const makeToLoad = (deps: Record<string, string[]>) =>
+    new Map(
+      Object.entries(deps).map(([name, depends]) => [
+        name,
+        {
+          name,
+          normalizedName: name,
+          channel: "default channel",
+          depends,
+          timings: {
+            download: 0,
+            extract: 0,
+            dynlibLoad: 0,
+            dynlibLookup: 0,
+          },
+          packageData: {} as any,
+        },
+      ]),
+    );
+  const waveNames = (toLoad: ReturnType<typeof makeToLoad>) =>
+    installWaves(toLoad).map((wave) => wave.map(({ name }) => name).sort());
+
+  it("Should put packages after their dependencies", () => {
+    const toLoad = makeToLoad({
+      xarray: ["numpy", "pandas"],
+      pandas: ["numpy", "python-dateutil"],
+      "python-dateutil": ["six"],
+      numpy: [],
+      six: [],
+    });
+    chai.assert.deepEqual(waveNames(toLoad), [
+      ["numpy", "six"],
+      ["python-dateutil"],
+      ["pandas"],
+      ["xarray"],
+    ]);
+  });
+
+  it("Should ignore dependencies that are not being loaded", () => {
+    const toLoad = makeToLoad({ a: ["already-loaded"], b: ["a"] });
+    chai.assert.deepEqual(waveNames(toLoad), [["a"], ["b"]]);
+  });
+
+  it("Should not loop forever on dependency cycles", () => {
+    const toLoad = makeToLoad({ a: ["b"], b: ["a"] });
+    chai.assert.deepEqual(waveNames(toLoad).flat().sort(), ["a", "b"]);
+  });
+});
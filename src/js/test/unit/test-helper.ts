@@ -17,6 +17,7 @@ export const genMockAPI = (): PackageManagerAPI => {
       packageCacheDir: "",
     },
     lockfile_packages: {},
+    packageManifestsPromise: Promise.resolve({}),
     bootstrapFinalizedPromise: Promise.resolve(),
     sitepackages: "",
     defaultLdLibraryPath: [],
@@ -27,8 +28,13 @@ export const genMockModule = (): PackageManagerModule => {
   return {
     reportUndefinedSymbols: () => {},
     loadDynamicLibrary: () => {},
+    getDylinkMetadata: () => ({ neededDynlibs: [] }),
+    _calloc: () => 0,
+    _free: () => {},
+    HEAP8: new Uint8Array(),
     LDSO: {
       loadedLibsByName: {},
+      loadedLibsByHandle: {},
     },
     PATH: {},
     FS: {
@@ -36,6 +42,9 @@ export const genMockModule = (): PackageManagerModule => {
       isDir: (mode: number) => true,
       findObject: (path: string, dontResolveLastLink?: boolean) => {},
       readFile: (path: string) => new Uint8Array(),
+      mkdirTree: (path: string, mode?: number) => {},
+      mount: (type: any, opts: any, mountpoint: string) => {},
+      filesystems: {},
       lookupPath: (
         path: string,
         options?: {
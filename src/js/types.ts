@@ -4,7 +4,7 @@ import { type PyodideInterface } from "./api";
 import { type ConfigType } from "./pyodide";
 import { type InFuncType } from "./streams";
 import { SnapshotConfig } from "./snapshot";
-import { ResolvablePromise } from "./common/resolveable";
+import { type WorkerPool } from "./worker-pool";
 
 export type TypedArray =
   | Int8Array
@@ -267,7 +267,9 @@ export interface FSType {
 export type PreRunFunc = (Module: Module) => void;
 
 /** @hidden */
-export type ReadFileType = (path: string) => Uint8Array;
+export type ReadFileType = (
+  path: string,
+) => Uint8Array | WebAssembly.Module;
 
 // File System-like type which can be passed to
 // Module.loadDynamicLibrary or Module.loadWebAssemblyModule
@@ -284,6 +286,9 @@ export interface LDSO {
   loadedLibsByName: {
     [key: string]: DSO;
   };
+  loadedLibsByHandle: {
+    [handle: number]: DSO;
+  };
 }
 
 /**
@@ -319,6 +324,8 @@ export interface Module {
   getDylinkMetadata(binary: Uint8Array | WebAssembly.Module): {
     neededDynlibs: string[];
   };
+  _calloc(nmemb: number, size: number): number;
+  _free(ptr: number): void;
 
   ERRNO_CODES: { [k: string]: number };
   stringToNewUTF8(x: string): number;
@@ -364,6 +371,55 @@ export type Lockfile = {
   packages: Record<string, InternalPackageData>;
 };
 
+/**
+ * Durations of the phases of ``loadPyodide`` in milliseconds. A phase is
+ * missing if it was skipped.
+ * @hidden
+ */
+export type StartupTimings = {
+  /** Loading pyodide.asm.js */
+  loadScript?: number;
+  /**
+   * Compiling and instantiating the WebAssembly module, setting up the file
+   * system and, unless a snapshot is restored, initializing Python.
+   */
+  instantiate?: number;
+  /** Writing the standard library into the file system, part of instantiate */
+  stdlibMount?: number;
+  /** Restoring the memory snapshot */
+  snapshotRestore?: number;
+  /** Importing the Python parts of Pyodide */
+  bootstrap?: number;
+  /** Loading the lock file and the packages from the packages option */
+  packageIndex?: number;
+  total?: number;
+};
+
+/**
+ * An entry of package-manifests.json, written at build time by
+ * tools/write_package_manifests.py. Lets us install a package without
+ * searching its files.
+ * @hidden
+ */
+export type PackageManifest = {
+  /** The sha256 of the wheel this manifest was generated from */
+  sha256: string;
+  dist_info_dir: string | null;
+  data_dir: string | null;
+  /** The shared libraries in the order they should be loaded */
+  dynlibs: string[];
+  /**
+   * The libraries each shared library needs. Libraries inside the wheel are
+   * given by their path in the wheel, the others only by their name.
+   */
+  needed: Record<string, string[]>;
+};
+
+/**
+ * How :js:func:`pyodide.loadPackage` installs wheels.
+ */
+export type PackageInstallMode = "extract" | "zipimport";
+
 /** @hidden */
 export type PackageType =
   | "package"
@@ -379,8 +435,63 @@ export interface PackageData {
   fileName: string;
   /** @experimental */
   packageType: PackageType;
+  /** @experimental */
+  timings?: PackageLoadTimings;
 }
 
+/**
+ * The time in milliseconds spent in each stage of loading a package.
+ * @experimental
+ */
+export interface PackageLoadTimings {
+  /**
+   * Downloading the package. In browsers this includes the integrity check
+   * which is done by ``fetch``. Zero if the package was not downloaded.
+   */
+  download: number;
+  /** Unpacking the package into the file system. */
+  extract: number;
+  /** Compiling and linking the shared libraries of the package. */
+  dynlibLoad: number;
+  /**
+   * The part of ``dynlibLoad`` spent finding the files of the libraries that
+   * the shared libraries of the package need.
+   */
+  dynlibLookup: number;
+}
+
+/**
+ * Counters for finding the needed libraries of shared libraries.
+ * @hidden
+ */
+export type DynlibLookupStats = {
+  /** The number of paths looked up */
+  lookups: number;
+  /** Lookups answered by the index of the package's shared libraries */
+  indexHits: number;
+  /** Lookups answered by the cache of libraries from other packages */
+  ldCacheHits: number;
+  /** Time spent on lookups in milliseconds */
+  time: number;
+};
+
+/**
+ * A shared library loaded by a DynlibLoader.
+ * @hidden
+ */
+export type LoadedDynlib = {
+  /** The path the library was loaded from */
+  path: string;
+  /** Whether its symbols are global */
+  global: boolean;
+  /** Libraries with the same scope share their local symbols */
+  scope: number;
+  /** The handle the library was loaded with */
+  handle: number;
+  /** Other handles that refer to the library, from dlopen */
+  handles: number[];
+};
+
 /** @hidden */
 export type LoadedPackages = Record<string, string>;
 
@@ -406,8 +517,8 @@ export type PackageLoadMetadata = {
   normalizedName: string;
   channel: string;
   depends: string[];
-  done: ResolvablePromise;
-  installPromise?: Promise<void>;
+  unpackPromise?: Promise<string[] | undefined>;
+  timings: PackageLoadTimings;
   packageData: InternalPackageData;
 };
 
@@ -454,12 +565,14 @@ export interface API {
   saveState: () => any;
   restoreState: (state: any) => void;
   scheduleCallback: (callback: () => void, timeout: number) => void;
+  WorkerPool: typeof WorkerPool;
   detectEnvironment: () => Record<string, boolean>;
 
   package_loader: any;
   importlib: any;
   _import_name_to_package_name: Map<string, string>;
   lockFilePromise: Promise<Lockfile>;
+  packageManifestsPromise: Promise<Record<string, PackageManifest>>;
   lockfile_unvendored_stdlibs: string[];
   lockfile_unvendored_stdlibs_and_test: string[];
   lockfile: Lockfile;
@@ -496,9 +609,17 @@ export interface API {
   sys: PyProxy;
   os: PyProxy;
 
-  restoreSnapshot(snapshot: Uint8Array): SnapshotConfig;
+  dynlibsForSnapshot: () => LoadedDynlib[];
+  reloadDynlibs: (dynlibs: LoadedDynlib[]) => Promise<void>;
+
+  restoreSnapshot(snapshot: Uint8Array, base?: Uint8Array): SnapshotConfig;
+  reloadSnapshotDynlibs(
+    snapshot: Uint8Array,
+    snapshotConfig: SnapshotConfig,
+    base?: Uint8Array,
+  ): Promise<void>;
   serializeHiwireState(serializer?: (obj: any) => any): SnapshotConfig;
-  makeSnapshot(serializer?: (obj: any) => any): Uint8Array;
+  makeSnapshot(serializer?: (obj: any) => any, base?: Uint8Array): Uint8Array;
   saveSnapshot(): Uint8Array;
   getExpectedKeys(): any[];
   finalizeBootstrap: (
@@ -509,6 +630,7 @@ export interface API {
   abortSignalAny: (signals: AbortSignal[]) => AbortSignal;
   version: string;
   pyVersionTuple: [number, number, number];
+  startupTimings: StartupTimings;
   LiteralMap: any;
 }
 
@@ -521,21 +643,39 @@ export type PackageManagerAPI = Pick<
   | "importlib"
   | "package_loader"
   | "lockfile_packages"
+  | "packageManifestsPromise"
   | "bootstrapFinalizedPromise"
   | "sitepackages"
   | "defaultLdLibraryPath"
 > & {
-  config: Pick<ConfigType, "indexURL" | "packageCacheDir">;
+  config: Pick<
+    ConfigType,
+    "indexURL" | "packageCacheDir" | "extractedPackageCacheDir"
+  >;
 };
 /**
  * @hidden
  */
 export type PackageManagerModule = Pick<
   Module,
-  "reportUndefinedSymbols" | "PATH" | "loadDynamicLibrary" | "LDSO"
+  | "reportUndefinedSymbols"
+  | "PATH"
+  | "loadDynamicLibrary"
+  | "LDSO"
+  | "getDylinkMetadata"
+  | "_calloc"
+  | "_free"
+  | "HEAP8"
 > & {
   FS: Pick<
     FSType,
-    "readdir" | "lookupPath" | "isDir" | "findObject" | "readFile"
+    | "readdir"
+    | "lookupPath"
+    | "isDir"
+    | "findObject"
+    | "readFile"
+    | "mkdirTree"
+    | "mount"
+    | "filesystems"
   >;
 };
@@ -0,0 +1,292 @@
+import { IN_NODE } from "./environments";
+import { nodeWorkerThreadsMod } from "./compat";
+
+/**
+ * The code that runs in each worker. It loads Pyodide from the same index URL
+ * and lock file as the main instance and passes each task to
+ * ``pyodide.executor._run_task``. Messages are:
+ *
+ * - ``{ type: "init", indexURL, lockFileURL, packages, initializer }`` once,
+ *   first. ``initializer`` is an optional pickled function to run before the
+ *   first task.
+ * - ``{ type: "task", id, payload, buffers }`` for each task
+ *
+ * and the worker answers each task with ``{ id, payload, buffers }`` or
+ * ``{ id, error }`` if the task could not be run at all.
+ */
+const workerSource = `
+const inNode = typeof process === "object" && !!process.versions?.node;
+let port;
+if (inNode) {
+  port = require("node:worker_threads").parentPort;
+} else {
+  port = self;
+}
+
+function onMessage(handler) {
+  if (inNode) {
+    port.on("message", handler);
+  } else {
+    port.onmessage = (event) => handler(event.data);
+  }
+}
+
+function transferables(pyodide, buffers) {
+  const heap = pyodide._module.HEAPU8.buffer;
+  const result = new Set();
+  for (const buf of buffers) {
+    const ab = ArrayBuffer.isView(buf) ? buf.buffer : buf;
+    if (ab instanceof ArrayBuffer && ab !== heap) {
+      result.add(ab);
+    }
+  }
+  return Array.from(result);
+}
+
+let runTask;
+onMessage(async (msg) => {
+  if (msg.type === "init") {
+    runTask = (async () => {
+      let loadPyodide;
+      if (inNode) {
+        let indexPath = msg.indexURL;
+        if (indexPath.startsWith("file://")) {
+          indexPath = require("node:url").fileURLToPath(indexPath);
+        } else if (indexPath.includes("://")) {
+          throw new Error(
+            "Worker threads can only load Pyodide from the file system, but " +
+              "indexURL is " + msg.indexURL,
+          );
+        }
+        loadPyodide = require(
+          require("node:path").join(indexPath, "pyodide.js"),
+        ).loadPyodide;
+      } else {
+        importScripts(msg.indexURL + "pyodide.js");
+        loadPyodide = self.loadPyodide;
+      }
+      const pyodide = await loadPyodide({
+        indexURL: msg.indexURL,
+        lockFileURL: msg.lockFileURL,
+        packages: msg.packages,
+      });
+      const executor = pyodide.pyimport("pyodide.executor");
+      if (msg.initializer) {
+        await executor._initialize_worker(msg.initializer);
+      }
+      const run = executor._run_task;
+      return async (payload, buffers) => {
+        const [resultPayload, resultBuffers] = await run(payload, buffers);
+        const transfer = transferables(pyodide, resultBuffers);
+        return [resultPayload, resultBuffers, transfer];
+      };
+    })();
+    return;
+  }
+  try {
+    const run = await runTask;
+    const [payload, buffers, transfer] = await run(msg.payload, msg.buffers);
+    transfer.push(payload.buffer);
+    port.postMessage({ id: msg.id, payload, buffers }, transfer);
+  } catch (e) {
+    port.postMessage({ id: msg.id, error: String(e?.stack ?? e) });
+  }
+});
+`;
+
+type WorkerTask = {
+  id: number;
+  payload: Uint8Array;
+  buffers: any[];
+  resolve: (result: [Uint8Array, any[]]) => void;
+  reject: (error: any) => void;
+};
+
+type PoolWorker = {
+  postMessage: (msg: any, transfer?: any[]) => void;
+  terminate: () => void;
+  // Only in Node. A busy worker keeps the process alive, an idle one doesn't.
+  ref?: () => void;
+  unref?: () => void;
+  task?: WorkerTask;
+};
+
+function transferables(buffers: any[]): ArrayBuffer[] {
+  const result = new Set<ArrayBuffer>();
+  for (const buf of buffers) {
+    const ab = ArrayBuffer.isView(buf) ? buf.buffer : buf;
+    if (ab instanceof ArrayBuffer) {
+      result.add(ab);
+    }
+  }
+  return Array.from(result);
+}
+
+/**
+ * A pool of workers that each run their own Pyodide instance. Used by
+ * ``pyodide.executor.WorkerPoolExecutor``. Tasks are pickled in Python, the
+ * pool only moves bytes and buffers between the threads.
+ *
+ * Workers are started lazily when tasks are submitted, up to ``size`` of them.
+ * Each worker runs one task at a time, the other tasks wait in a queue.
+ * @private
+ */
+export class WorkerPool {
+  size: number;
+  packages: string[];
+  initializer?: Uint8Array;
+  workers: PoolWorker[] = [];
+  idle: PoolWorker[] = [];
+  queue: WorkerTask[] = [];
+  nextId: number = 0;
+  closed: boolean = false;
+
+  constructor(
+    size?: number,
+    packages: string[] = [],
+    initializer?: Uint8Array,
+  ) {
+    this.size = size ?? globalThis.navigator?.hardwareConcurrency ?? 4;
+    this.packages = packages;
+    this.initializer = initializer;
+  }
+
+  /**
+   * Run a pickled task in a worker.
+   *
+   * @param payload The pickled function and arguments.
+   * @param buffers ArrayBuffers or ArrayBuffer views that are transferred to
+   * the worker along with the payload. They are detached afterwards.
+   * @returns The pickled result and the buffers returned from the worker.
+   */
+  submit(
+    payload: Uint8Array,
+    buffers: any[] = [],
+  ): Promise<[Uint8Array, any[]]> {
+    if (this.closed) {
+      return Promise.reject(new Error("The worker pool was shut down"));
+    }
+    // Transferring a view of the Wasm memory would detach the memory of this
+    // Pyodide instance, so copy those.
+    const heap = Module.HEAPU8.buffer;
+    if (payload.buffer === heap) {
+      payload = payload.slice();
+    }
+    buffers = buffers.map((buf) =>
+      ArrayBuffer.isView(buf) && buf.buffer === heap
+        ? (buf as Uint8Array).slice()
+        : buf,
+    );
+    return new Promise((resolve, reject) => {
+      const id = this.nextId++;
+      this.queue.push({ id, payload, buffers, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.queue.length > 0) {
+      let worker = this.idle.pop();
+      if (!worker) {
+        if (this.workers.length >= this.size) {
+          return;
+        }
+        worker = this.spawn();
+      }
+      const task = this.queue.shift()!;
+      worker.task = task;
+      worker.ref?.();
+      worker.postMessage(
+        {
+          type: "task",
+          id: task.id,
+          payload: task.payload,
+          buffers: task.buffers,
+        },
+        [task.payload.buffer, ...transferables(task.buffers)],
+      );
+    }
+  }
+
+  spawn(): PoolWorker {
+    let worker: PoolWorker;
+    const onMessage = (msg: any) => this.onMessage(worker, msg);
+    const onError = (e: any) => this.onError(worker, e);
+    if (IN_NODE) {
+      const nodeWorker = new nodeWorkerThreadsMod.Worker(workerSource, {
+        eval: true,
+      });
+      nodeWorker.on("message", onMessage);
+      nodeWorker.on("error", onError);
+      worker = nodeWorker as unknown as PoolWorker;
+    } else {
+      const url = URL.createObjectURL(
+        new Blob([workerSource], { type: "text/javascript" }),
+      );
+      const webWorker = new Worker(url);
+      URL.revokeObjectURL(url);
+      webWorker.onmessage = (event) => onMessage(event.data);
+      webWorker.onerror = onError;
+      worker = webWorker;
+    }
+    worker.postMessage({
+      type: "init",
+      indexURL: API.config.indexURL,
+      lockFileURL: API.config.lockFileURL,
+      packages: this.packages,
+      initializer: this.initializer,
+    });
+    this.workers.push(worker);
+    return worker;
+  }
+
+  onMessage(worker: PoolWorker, msg: any) {
+    const task = worker.task!;
+    worker.task = undefined;
+    if (msg.error !== undefined) {
+      task.reject(new Error(msg.error));
+    } else {
+      task.resolve([msg.payload, msg.buffers]);
+    }
+    if (this.closed && this.queue.length === 0) {
+      this.remove(worker);
+    } else {
+      worker.unref?.();
+      this.idle.push(worker);
+      this.dispatch();
+    }
+  }
+
+  onError(worker: PoolWorker, e: any) {
+    // The worker is unusable, fail its task and start a new one if needed.
+    worker.task?.reject(e instanceof Error ? e : new Error(e?.message ?? e));
+    worker.task = undefined;
+    this.remove(worker);
+    this.dispatch();
+  }
+
+  remove(worker: PoolWorker) {
+    worker.terminate();
+    this.workers = this.workers.filter((w) => w !== worker);
+    this.idle = this.idle.filter((w) => w !== worker);
+  }
+
+  /**
+   * Stop accepting tasks. Idle workers are terminated right away and busy
+   * workers once the queue is empty.
+   *
+   * @param cancelPending If true, fail the tasks that have not started yet.
+   */
+  shutdown(cancelPending: boolean = false) {
+    this.closed = true;
+    if (cancelPending) {
+      for (const task of this.queue) {
+        task.reject(new Error("cancelled"));
+      }
+      this.queue = [];
+    }
+    for (const worker of this.idle) {
+      this.remove(worker);
+    }
+  }
+}
@@ -284,6 +284,16 @@ class CodeRunner:
         )
         self.ast = next(self._gen)
 
+    @classmethod
+    def _from_code(cls, source: str, code: CodeType) -> "CodeRunner":
+        """A compiled CodeRunner for a code object compiled from ``source``
+        before. It has no AST."""
+        self = cls.__new__(cls)
+        self._compiled = True
+        self._source = source
+        self.code = code
+        return self
+
     def compile(self) -> "CodeRunner":
         """Compile the current value of ``self.ast`` and store the result in ``self.code``.
 
@@ -415,6 +425,73 @@ class CodeRunner:
             return e.value
 
 
+class CodeCache:
+    """The code objects compiled by :py:func:`eval_code` and
+    :py:func:`eval_code_async` by source and compile options, least recently
+    used first."""
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self.entries: dict[tuple[Any, ...], CodeType] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def trim(self) -> None:
+        while len(self.entries) > self.maxsize:
+            del self.entries[next(iter(self.entries))]
+
+
+code_cache = CodeCache()
+
+
+def _compile_cached(source: str, **kwargs: Any) -> CodeRunner:
+    """A compiled :py:class:`CodeRunner` for ``source``, reusing the code object
+    of an earlier call with the same arguments if possible.
+
+    Only for callers that don't modify the AST, since the code object is shared.
+    """
+    key = (source, *sorted(kwargs.items()))
+    code = code_cache.entries.pop(key, None)
+    if code is None:
+        code_cache.misses += 1
+        runner = CodeRunner(source, **kwargs).compile()
+        assert runner.code
+        code = runner.code
+    else:
+        code_cache.hits += 1
+        runner = CodeRunner._from_code(source, code)
+    code_cache.entries[key] = code
+    code_cache.trim()
+    return runner
+
+
+def set_code_cache_size(maxsize: int) -> None:
+    """Set how many compiled code objects :py:func:`eval_code` and
+    :py:func:`eval_code_async` keep.
+
+    Running the same source again with the same arguments reuses the compiled
+    code object instead of parsing and compiling the source again. The least
+    recently used code objects are dropped first. The default size is 128, ``0``
+    disables the cache.
+    """
+    if maxsize < 0:
+        raise ValueError("maxsize must be at least 0")
+    code_cache.maxsize = maxsize
+    code_cache.trim()
+
+
+def get_code_cache_stats() -> dict[str, int]:
+    """The number of calls to :py:func:`eval_code` and :py:func:`eval_code_async`
+    that reused a compiled code object and that had to compile the source, and
+    the number of cached code objects."""
+    return {
+        "hits": code_cache.hits,
+        "misses": code_cache.misses,
+        "size": len(code_cache.entries),
+        "maxsize": code_cache.maxsize,
+    }
+
+
 def eval_code(
     source: str,
     globals: dict[str, Any] | None = None,
@@ -509,19 +586,15 @@ def eval_code(
                   ^^^^^^^
     NameError: name 'pyodide' is not defined
     """
-    return (
-        CodeRunner(
-            source,
-            return_mode=return_mode,
-            quiet_trailing_semicolon=quiet_trailing_semicolon,
-            filename=filename,
-            flags=flags,
-            dont_inherit=dont_inherit,
-            optimize=optimize,
-        )
-        .compile()
-        .run(globals, locals)
-    )
+    return _compile_cached(
+        source,
+        return_mode=return_mode,
+        quiet_trailing_semicolon=quiet_trailing_semicolon,
+        filename=filename,
+        flags=flags,
+        dont_inherit=dont_inherit,
+        optimize=optimize,
+    ).run(globals, locals)
 
 
 async def eval_code_async(
@@ -593,19 +666,15 @@ async def eval_code_async(
         parameters to modify this default behavior.
     """
     flags = flags or ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
-    return (
-        await CodeRunner(
-            source,
-            return_mode=return_mode,
-            quiet_trailing_semicolon=quiet_trailing_semicolon,
-            filename=filename,
-            flags=flags,
-            dont_inherit=dont_inherit,
-            optimize=optimize,
-        )
-        .compile()
-        .run_async(globals, locals)
-    )
+    return await _compile_cached(
+        source,
+        return_mode=return_mode,
+        quiet_trailing_semicolon=quiet_trailing_semicolon,
+        filename=filename,
+        flags=flags,
+        dont_inherit=dont_inherit,
+        optimize=optimize,
+    ).run_async(globals, locals)
 
 
 def _add_prefixes(s: set[str], mod: str) -> None:
@@ -616,6 +685,38 @@ def _add_prefixes(s: set[str], mod: str) -> None:
         s.add(current)
 
 
+# The results of find_imports by source, most recently used last
+_imports_cache: dict[str, tuple[str, ...]] = {}
+_IMPORTS_CACHE_SIZE = 64
+
+
+def _imports_from_ast(mod: ast.AST) -> tuple[str, ...]:
+    imports: set[str] = set()
+    for node in ast.walk(mod):
+        if isinstance(node, ast.Import):
+            for name in node.names:
+                node_name = name.name
+                _add_prefixes(imports, node_name)
+        elif isinstance(node, ast.ImportFrom):
+            module_name = node.module
+            if module_name is None:
+                continue
+            _add_prefixes(imports, module_name)
+    return tuple(sorted(imports))
+
+
+def _cache_imports(source: str, imports: tuple[str, ...]) -> None:
+    """Remember the imports of ``source`` for :py:func:`find_imports`.
+
+    Callers that already parsed ``source`` can use this to spare
+    :py:func:`find_imports` a second parse.
+    """
+    _imports_cache.pop(source, None)
+    _imports_cache[source] = imports
+    if len(_imports_cache) > _IMPORTS_CACHE_SIZE:
+        del _imports_cache[next(iter(_imports_cache))]
+
+
 def find_imports(source: str) -> list[str]:
     """
     Finds the imports in a Python source code string
@@ -640,25 +741,25 @@ def find_imports(source: str) -> list[str]:
     >>> find_imports(source)
     ['numpy', 'scipy', 'scipy.stats']
     """
-    # handle mis-indented input from multi-line strings
-    source = dedent(source)
+    imports = _imports_cache.get(source)
+    if imports is not None:
+        _cache_imports(source, imports)
+        return list(imports)
+
+    # Every import statement contains the keyword, so most code doesn't need to
+    # be parsed at all.
+    if "import" not in source:
+        return []
 
     try:
-        mod = ast.parse(source)
+        # handle mis-indented input from multi-line strings
+        mod = ast.parse(dedent(source))
     except SyntaxError:
-        return []
-    imports: set[str] = set()
-    for node in ast.walk(mod):
-        if isinstance(node, ast.Import):
-            for name in node.names:
-                node_name = name.name
-                _add_prefixes(imports, node_name)
-        elif isinstance(node, ast.ImportFrom):
-            module_name = node.module
-            if module_name is None:
-                continue
-            _add_prefixes(imports, module_name)
-    return sorted(imports)
+        imports = ()
+    else:
+        imports = _imports_from_ast(mod)
+    _cache_imports(source, imports)
+    return list(imports)
 
 
 def pyimport_impl(path: str) -> Any:
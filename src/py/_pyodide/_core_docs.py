@@ -630,6 +630,37 @@ class JsBuffer(JsProxy):
         """
         raise NotImplementedError
 
+    def to_numpy(self, dtype: Any = None, shape: Any = None) -> Any:
+        """Convert a buffer to a NumPy array.
+
+        Allocates the array once and copies the data directly into it. This
+        copies the data once whereas ``np.frombuffer(x.to_bytes())`` followed
+        by a copy copies it twice. Requires NumPy to be loaded.
+
+        Parameters
+        ----------
+        dtype :
+            The data type of the result. Defaults to the data type of the typed
+            array, or ``uint8`` for an :js:class:`ArrayBuffer` or
+            :js:class:`DataView`. The bytes are copied unchanged so any dtype
+            whose item size divides the size of the buffer may be used, and a
+            byte order prefix like ``">f4"`` reads big endian data.
+
+        shape :
+            The shape of the result. Defaults to a one dimensional array
+            covering the whole buffer. The size of the result must match the
+            size of the buffer.
+
+        Example
+        -------
+        >>> from js import Float32Array # doctest: +SKIP
+        >>> x = Float32Array.new(range(6))
+        >>> x.to_numpy(shape=(2, 3))
+        array([[0., 1., 2.],
+               [3., 4., 5.]], dtype=float32)
+        """
+        raise NotImplementedError
+
 
 class JsIterator(JsProxy, Generic[T_co]):
     """A JsProxy of a JavaScript iterator.
@@ -793,6 +824,7 @@ class JsFetchResponse(JsProxy):
     type: str
     url: str
     headers: Any
+    body: Any
 
     def clone(self) -> "JsFetchResponse":
         raise NotImplementedError
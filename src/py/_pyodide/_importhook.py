@@ -1,8 +1,17 @@
 import sys
 from collections.abc import Callable, Sequence
 from importlib.abc import Loader, MetaPathFinder
-from importlib.machinery import ModuleSpec
-from importlib.util import spec_from_loader
+from importlib.machinery import (
+    BYTECODE_SUFFIXES,
+    EXTENSION_SUFFIXES,
+    SOURCE_SUFFIXES,
+    ExtensionFileLoader,
+    FileFinder,
+    ModuleSpec,
+    SourceFileLoader,
+    SourcelessFileLoader,
+)
+from importlib.util import MAGIC_NUMBER, source_hash, spec_from_loader
 from types import ModuleType
 from typing import Any
 
@@ -139,6 +148,77 @@ def register_js_finder() -> None:
     sys.meta_path.append(jsfinder)
 
 
+class BytecodeCacheStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+bytecode_cache_stats = BytecodeCacheStats()
+
+# The flags of a hash-based pyc that is checked against its source, see PEP 552
+CHECKED_HASH_PYC_FLAGS = (0b11).to_bytes(4, "little")
+
+
+class CachingSourceFileLoader(SourceFileLoader):
+    """A SourceFileLoader that writes checked hash-based pycs.
+
+    Extracting a package sets the modification time of its files to the time of
+    extraction, so the default timestamp-based pycs would never be valid in a
+    later session. Hash-based pycs only depend on the contents of the source.
+    """
+
+    def get_code(self, fullname: str) -> Any:
+        misses = bytecode_cache_stats.misses
+        code = super().get_code(fullname)
+        if bytecode_cache_stats.misses == misses:
+            bytecode_cache_stats.hits += 1
+        return code
+
+    def source_to_code(  # type: ignore[override]
+        self, data: Any, path: Any = "<string>", **kwargs: Any
+    ) -> Any:
+        bytecode_cache_stats.misses += 1
+        self._source_hash = source_hash(data)
+        return super().source_to_code(data, path, **kwargs)
+
+    def _cache_bytecode(self, source_path: Any, bytecode_path: Any, data: Any) -> Any:
+        # data is a timestamp-based pyc of the code that was just compiled,
+        # replace its header to make it hash-based.
+        data = MAGIC_NUMBER + CHECKED_HASH_PYC_FLAGS + self._source_hash + data[16:]
+        return super()._cache_bytecode(source_path, bytecode_path, data)  # type: ignore[misc]
+
+
+def enable_bytecode_cache(cache_dir: str) -> None:
+    """Write the bytecode of imported modules into ``cache_dir`` and reuse it.
+
+    This is called in ``loadPyodide`` when the ``bytecodeCacheDir`` option is
+    set. ``cache_dir`` is expected to be backed by a persistent file system so
+    that later sessions don't need to compile the modules again.
+    """
+    sys.pycache_prefix = cache_dir
+    sys.dont_write_bytecode = False
+    for idx, hook in enumerate(sys.path_hooks):
+        if getattr(hook, "__name__", "") != "path_hook_for_FileFinder":
+            continue
+        sys.path_hooks[idx] = FileFinder.path_hook(
+            (ExtensionFileLoader, EXTENSION_SUFFIXES),
+            (CachingSourceFileLoader, SOURCE_SUFFIXES),
+            (SourcelessFileLoader, BYTECODE_SUFFIXES),
+        )
+        sys.path_importer_cache.clear()
+        break
+
+
+def get_bytecode_cache_stats() -> dict[str, int]:
+    """The number of modules that were imported with and without compiling them
+    since the bytecode cache was enabled."""
+    return {
+        "hits": bytecode_cache_stats.hits,
+        "misses": bytecode_cache_stats.misses,
+    }
+
+
 STDLIBS = sys.stdlib_module_names | {"test"}
 UNVENDORED_STDLIBS_AND_TEST: set[str] = set()
 
@@ -53,6 +53,10 @@ class Object(_JsObject):
     @staticmethod
     def fromEntries(it: Iterable[JsArray[Any]]) -> JsProxy: ...
 
+class Response(_JsObject):
+    @staticmethod
+    def new(body: Any = None, init: JsProxy | None = None) -> JsFetchResponse: ...
+
 class Array(_JsObject):
     @staticmethod
     def new() -> JsArray[Any]: ...
@@ -12,7 +12,7 @@
 # importing from these.
 __version__ = "0.28.0.dev0"
 
-__all__ = ["__version__", "console", "code", "ffi", "http", "webloop"]
+__all__ = ["__version__", "console", "code", "executor", "ffi", "http", "webloop"]
 
 from . import _state  # noqa: F401
 from .webloop import _initialize_event_loop
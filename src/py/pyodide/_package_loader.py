@@ -1,11 +1,23 @@
+import json
+import os
 import re
 import shutil
 import sys
-from collections.abc import Iterable
-from importlib.machinery import EXTENSION_SUFFIXES
+import time
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from importlib.abc import MetaPathFinder
+from importlib.machinery import (
+    EXTENSION_SUFFIXES,
+    ModuleSpec,
+    PathFinder,
+    SourceFileLoader,
+    SourcelessFileLoader,
+)
+from importlib.util import spec_from_file_location
 from pathlib import Path
 from site import getsitepackages
 from tempfile import NamedTemporaryFile
+from types import ModuleType
 from typing import IO, Any, Literal
 from zipfile import ZipFile
 
@@ -60,6 +72,11 @@ DATA_FILES_SCHEME = "data"
 
 PYODIDE_SOURCE_METADATA_FILE = "PYODIDE_SOURCE"
 
+# Where wheels installed with zipimport=True are kept, relative to the
+# directory they are installed into.
+ZIPIMPORT_WHEELS_DIR = ".pyodide-wheels"
+ZIPIMPORT_SUFFIXES = (".py", ".pyc")
+
 
 def parse_wheel_name(filename: str) -> tuple[str, str, str, str, str]:
     tokens = filename.split("-")
@@ -85,14 +102,15 @@ class UnsupportedWheel(Exception):
     """Unsupported wheel."""
 
 
-def find_wheel_metadata_dir(source: ZipFile, suffix: str) -> str | None:
+def find_wheel_metadata_dir(source: ZipFile | Iterable[str], suffix: str) -> str | None:
     """
     Returns the name of the contained metadata directory inside the wheel file.
 
     Parameters
     ----------
     source
-        A ZipFile object representing the wheel file.
+        A ZipFile object representing the wheel file, or the names of the
+        members of the wheel (as returned by ``ZipFile.namelist()``).
 
     suffix
         The suffix of the metadata directory. Usually ".dist-info" or ".data"
@@ -102,8 +120,9 @@ def find_wheel_metadata_dir(source: ZipFile, suffix: str) -> str | None:
         The name of the metadata directory. If not found, returns None.
     """
 
+    names = source.namelist() if isinstance(source, ZipFile) else source
     # Zip file path separators must be /
-    subdirs = {p.split("/", 1)[0] for p in source.namelist()}
+    subdirs = {p.split("/", 1)[0] for p in names}
 
     info_dirs = [s for s in subdirs if s.endswith(suffix)]
 
@@ -115,7 +134,7 @@ def find_wheel_metadata_dir(source: ZipFile, suffix: str) -> str | None:
     return info_dir
 
 
-def wheel_dist_info_dir(source: ZipFile, name: str) -> str:
+def wheel_dist_info_dir(source: ZipFile | Iterable[str], name: str) -> str:
     """
     Returns the name of the contained .dist-info directory.
     """
@@ -135,7 +154,7 @@ def wheel_dist_info_dir(source: ZipFile, name: str) -> str:
     return dist_info_dir
 
 
-def wheel_data_file_dir(source: ZipFile, name: str) -> str | None:
+def wheel_data_file_dir(source: ZipFile | Iterable[str], name: str) -> str | None:
     data_file_dir = find_wheel_metadata_dir(source, suffix=DATA_FILES_DIR_SUFFIX)
 
     # data files are optional, so we return None if not found
@@ -195,6 +214,8 @@ def unpack_buffer(
     extract_dir: str | None = None,
     calculate_dynlibs: bool = False,
     metadata: dict[str, str] | None = None,
+    manifest: dict[str, Any] | None = None,
+    zipimport: bool = False,
 ) -> JsArray[str] | None:
     """Used to install a package either into sitepackages or into the standard
     library.
@@ -237,6 +258,18 @@ def unpack_buffer(
         The keys are the names of the metadata files and the values are the contents
         of the files.
 
+    manifest
+        The entry of the package in ``package-manifests.json`` if there is one.
+        It contains the names of the ``.dist-info`` and ``.data`` directories
+        (``dist_info_dir`` and ``data_dir``) and the list of dynamic libraries
+        (``dynlibs``) in the order they should be loaded, so that we don't need
+        to search the list of files for them.
+
+    zipimport
+        If true and the archive is a wheel, only extract the files that are not
+        Python modules. The modules are imported straight from the wheel by
+        :py:class:`WheelFinder`. Ignored for other archives.
+
     Returns
     -------
         If calculate_dynlibs is True, a Javascript Array of dynamic libraries.
@@ -252,25 +285,410 @@ def unpack_buffer(
     filename = filename.rpartition("/")[-1]
 
     extract_path.mkdir(parents=True, exist_ok=True)
-    with NamedTemporaryFile(suffix=filename) as f:
+    if zipimport and Path(filename).suffix == ".whl":
+        names = mount_wheel(buffer, filename, extract_path)
+    else:
+        with NamedTemporaryFile(suffix=filename) as f:
+            # _into_file hands the buffer over to MEMFS without copying it. From
+            # here on we only read the archive once: the extraction below
+            # returns the member names, which is all we need for the rest of
+            # the install.
+            buffer._into_file(f)
+            names = extract_archive(f.name, extract_path, format)
+
+    top_level: Iterable[str]
+    if Path(filename).suffix == ".whl":
+        if manifest is not None:
+            top_level = [
+                dir
+                for dir in [manifest.get("dist_info_dir"), manifest.get("data_dir")]
+                if dir
+            ]
+        else:
+            top_level = {name.split("/", 1)[0] for name in names}
+        if metadata:
+            set_wheel_metadata(filename, top_level, extract_path, metadata)
+
+        install_datafiles(filename, top_level, extract_path)
+
+    if calculate_dynlibs:
+        if manifest is not None:
+            return to_js(
+                [str((extract_path / path).resolve()) for path in manifest["dynlibs"]]
+            )
+        return to_js(dynlib_paths(names, extract_path))
+
+    return None
+
+
+class WheelSourceLoader(SourceFileLoader):
+    """Loads a module from its source in a wheel.
+
+    ``path`` is the location the module would have if the wheel was extracted,
+    so ``__file__`` relative paths and the bytecode cache work as usual.
+    """
+
+    def __init__(self, fullname: str, path: str, wheel: ZipFile, member: str):
+        super().__init__(fullname, path)
+        self.wheel = wheel
+        self.member = member
+
+    def get_data(self, path: str) -> bytes:
+        if path == self.path:
+            return self.wheel.read(self.member)
+        return super().get_data(path)
+
+    def path_stats(self, path: str) -> Mapping[str, Any]:
+        if path == self.path:
+            info = self.wheel.getinfo(self.member)
+            return {
+                "mtime": time.mktime(info.date_time + (0, 0, -1)),
+                "size": info.file_size,
+            }
+        return super().path_stats(path)
+
+
+class WheelSourcelessLoader(SourcelessFileLoader):
+    """Loads a module from its bytecode in a wheel."""
+
+    def __init__(self, fullname: str, path: str, wheel: ZipFile, member: str):
+        super().__init__(fullname, path)
+        self.wheel = wheel
+        self.member = member
+
+    def get_data(self, path: str) -> bytes:
+        if path == self.path:
+            return self.wheel.read(self.member)
+        return super().get_data(path)
+
+
+class WheelFinder(MetaPathFinder):
+    """Finds the modules of the wheels installed with ``zipimport=True``.
+
+    It sits in front of :py:class:`~importlib.machinery.PathFinder` so that
+    packages which have been partly extracted (their extension modules and data
+    files) are still imported from the wheel.
+    """
+
+    def __init__(self) -> None:
+        # module name -> (wheel, member, directory the wheel is installed into)
+        self.modules: dict[str, tuple[ZipFile, str, Path]] = {}
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None = None,
+        target: ModuleType | None = None,
+    ) -> ModuleSpec | None:
+        try:
+            wheel, member, extract_dir = self.modules[fullname]
+        except KeyError:
+            return None
+        origin = str(extract_dir / member)
+        loader_cls = (
+            WheelSourceLoader if member.endswith(".py") else WheelSourcelessLoader
+        )
+        loader = loader_cls(fullname, origin, wheel, member)
+        return spec_from_file_location(fullname, origin, loader=loader)
+
+    def add_wheel(
+        self, wheel: ZipFile, members: Iterable[str], extract_dir: Path
+    ) -> None:
+        modules: dict[str, str] = {}
+        for member in members:
+            stem, suffix = os.path.splitext(member)
+            parts = stem.split("/")
+            if parts[-1] == "__init__":
+                parts.pop()
+            fullname = ".".join(parts)
+            # Like FileFinder, prefer the source over the bytecode.
+            if suffix == ".py" or fullname not in modules:
+                modules[fullname] = member
+        for fullname, member in modules.items():
+            self.modules[fullname] = (wheel, member, extract_dir)
+
+
+wheel_finder = WheelFinder()
+
+
+def register_wheel_finder() -> None:
+    if wheel_finder in sys.meta_path:
+        return
+    try:
+        index = sys.meta_path.index(PathFinder)
+    except ValueError:
+        index = len(sys.meta_path)
+    sys.meta_path.insert(index, wheel_finder)
+
+
+def mount_wheel(buffer: JsBuffer, filename: str, extract_dir: Path) -> list[str]:
+    """Install a wheel without extracting its Python modules.
+
+    The wheel is kept in ``extract_dir`` and its modules are registered with
+    :py:data:`wheel_finder`. Everything else, i.e. shared libraries, data files
+    and the metadata directories, is extracted as usual since those are opened
+    directly from the file system.
+
+    Returns
+    -------
+        The names of the members of the wheel.
+    """
+    wheel_path = extract_dir / ZIPIMPORT_WHEELS_DIR / filename
+    wheel_path.parent.mkdir(exist_ok=True)
+    with wheel_path.open("wb") as f:
         buffer._into_file(f)
-        shutil.unpack_archive(f.name, extract_path, format)
 
-        suffix = Path(f.name).suffix
-        if suffix == ".whl":
-            z = ZipFile(f)
-            if metadata:
-                set_wheel_metadata(filename, z, extract_path, metadata)
+    wheel = ZipFile(wheel_path)
+    names = wheel.namelist()
+    metadata_dirs = tuple(
+        name.split("/", 1)[0] + "/"
+        for name in names
+        if name.split("/", 1)[0].endswith((DIST_INFO_DIR_SUFFIX, DATA_FILES_DIR_SUFFIX))
+    )
+    modules = []
+    to_extract = []
+    for name in names:
+        if (
+            name.endswith(ZIPIMPORT_SUFFIXES)
+            and not name.startswith(metadata_dirs)
+            and "__pycache__/" not in name
+        ):
+            modules.append(name)
+        else:
+            to_extract.append(name)
 
-            install_datafiles(filename, z, extract_path)
+    wheel.extractall(extract_dir, to_extract)
+    # Create the package directories so that submodules which were extracted
+    # and namespace packages are found by PathFinder.
+    for dir in {(extract_dir / name).parent for name in modules}:
+        dir.mkdir(parents=True, exist_ok=True)
 
-        if calculate_dynlibs:
-            return to_js(get_dynlibs(f, suffix, extract_path))
+    wheel_finder.add_wheel(wheel, modules, extract_dir)
+    register_wheel_finder()
+    return names
 
-    return None
 
+def extract_archive(
+    archive_path: str, extract_dir: Path, format: str | None = None
+) -> list[str]:
+    """Unpack an archive and return the names of its members.
+
+    This does the same thing as :py:func:`shutil.unpack_archive`, but for zip and
+    tar archives it reads the member list only once and hands it back to the
+    caller so that the archive doesn't need to be reopened afterwards to look
+    for metadata directories or dynamic libraries.
+
+    Parameters
+    ----------
+    archive_path
+        The path to the archive.
+
+    extract_dir
+        The directory to unpack the archive into.
+
+    format
+        The name of a registered unpack format. If not present, it is determined
+        from the extension of ``archive_path``.
+
+    Returns
+    -------
+        The names of the members of the archive, relative to ``extract_dir``.
+    """
+    if format is None:
+        format = shutil._find_unpack_format(archive_path)  # type: ignore[attr-defined]
+        if format is None:
+            raise shutil.ReadError(f"Unknown archive format '{archive_path}'")
+
+    unpacker = shutil._UNPACK_FORMATS[format][1]  # type: ignore[attr-defined]
+    if unpacker is shutil._unpack_zipfile:  # type: ignore[attr-defined]
+        return _extract_zipfile(archive_path, extract_dir)
+    if unpacker is shutil._unpack_tarfile:  # type: ignore[attr-defined]
+        return _extract_tarfile(archive_path, extract_dir)
+
+    # Some other format that was registered with shutil. Fall back to reading
+    # the archive a second time to list its members.
+    shutil.unpack_archive(archive_path, extract_dir, format)
+    with open(archive_path, "rb") as f:
+        return list(get_archive_names(f, Path(archive_path).suffix))
+
+
+def _extract_zipfile(archive_path: str, extract_dir: Path) -> list[str]:
+    """Same as ``shutil._unpack_zipfile`` but returns the member names."""
+    names = []
+    created_dirs = set()
+    with ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            names.append(name)
+
+            # don't extract absolute paths or ones with .. in them
+            if name.startswith("/") or ".." in name:
+                continue
+
+            target_path = extract_dir.joinpath(*name.split("/"))
+            target_dir = target_path if name.endswith("/") else target_path.parent
+            if target_dir not in created_dirs:
+                target_dir.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(target_dir)
+
+            if name.endswith("/"):
+                continue
+
+            with archive.open(info) as source, target_path.open("wb") as target:
+                shutil.copyfileobj(source, target)
+
+    return names
+
+
+def _extract_tarfile(archive_path: str, extract_dir: Path) -> list[str]:
+    """Same as ``shutil._unpack_tarfile`` but returns the member names."""
+    import tarfile
 
-def should_load_dynlib(path: str | Path) -> bool:
+    try:
+        archive = tarfile.open(archive_path)
+    except tarfile.TarError as e:
+        raise shutil.ReadError(
+            f"{archive_path} is not a compressed or uncompressed tar file"
+        ) from e
+
+    with archive:
+        members = archive.getmembers()
+        archive.extractall(extract_dir, members)
+
+    return [member.name for member in members]
+
+
+def cache_package(
+    buffer: JsBuffer,
+    *,
+    filename: str,
+    cache_dir: str,
+    key: str,
+    metadata: dict[str, str] | None = None,
+) -> None:
+    """Unpack a wheel into the extracted package cache.
+
+    This is a helper method called from ``loadPackage`` in Node when
+    ``extractedPackageCacheDir`` is set. The wheel is unpacked into
+    ``cache_dir/key`` and a manifest ``cache_dir/key.json`` listing the dynamic
+    libraries and the data file directory is written next to it. Afterwards
+    :py:func:`install_cached_package` can install it.
+
+    Several processes may share the cache, so the wheel is unpacked into a
+    temporary directory which is renamed into place. The manifest is written
+    last and marks the entry as complete.
+
+    Parameters
+    ----------
+    buffer
+        A Javascript ``Uint8Array`` with the binary data for the wheel.
+
+    filename
+        The file name of the wheel.
+
+    cache_dir
+        The root directory of the cache.
+
+    key
+        The cache key. We use the sha256 of the wheel from the lock file.
+
+    metadata
+        A dictionary of metadata to be stored in the package's dist-info
+        directory. See :py:func:`unpack_buffer`.
+    """
+    cache_path = Path(cache_dir)
+    entry_path = cache_path / key
+    manifest_path = cache_path / f"{key}.json"
+    tmp_suffix = f".tmp-{os.getpid()}-{os.urandom(4).hex()}"
+    tmp_path = cache_path / f"{key}{tmp_suffix}"
+
+    tmp_path.mkdir(parents=True)
+    try:
+        with NamedTemporaryFile(suffix=filename) as f:
+            buffer._into_file(f)
+            names = extract_archive(f.name, tmp_path, "zip")
+
+        top_level = {name.split("/", 1)[0] for name in names}
+        if metadata:
+            set_wheel_metadata(filename, top_level, tmp_path, metadata)
+
+        wheel_name = parse_wheel_name(filename)[0]
+        manifest = {
+            "dynlibs": [name for name in names if should_load_dynlib(name)],
+            "data_dir": wheel_data_file_dir(top_level, wheel_name),
+        }
+        try:
+            tmp_path.rename(entry_path)
+        except OSError:
+            # Another process populated the entry first. Its contents are the
+            # same as ours, so just drop our copy.
+            shutil.rmtree(tmp_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    tmp_manifest_path = cache_path / f"{key}.json{tmp_suffix}"
+    tmp_manifest_path.write_text(json.dumps(manifest))
+    tmp_manifest_path.replace(manifest_path)
+
+
+def install_cached_package(
+    *, cache_dir: str, key: str, extract_dir: str
+) -> JsArray[str] | None:
+    """Install a package from the extracted package cache.
+
+    The already extracted files are copied into ``extract_dir``, which skips
+    decompressing the wheel. They are never symlinked: a later install or any
+    other write into ``extract_dir`` would otherwise modify the shared cache
+    entry. Stale symlinks left in ``extract_dir`` are replaced. Data files are
+    copied into ``sys.prefix``.
+
+    Parameters
+    ----------
+    cache_dir
+        The root directory of the cache.
+
+    key
+        The cache key passed to :py:func:`cache_package`.
+
+    extract_dir
+        The directory to install the package into.
+
+    Returns
+    -------
+        ``None`` if the package is not in the cache. Otherwise, a Javascript
+        Array of paths to the dynamic libraries in the package.
+    """
+    cache_path = Path(cache_dir)
+    entry_path = cache_path / key
+    manifest_path = cache_path / f"{key}.json"
+    if not manifest_path.exists():
+        return None
+
+    manifest = json.loads(manifest_path.read_text())
+    extract_path = Path(extract_dir)
+    extract_path.mkdir(parents=True, exist_ok=True)
+    for entry in entry_path.iterdir():
+        target = extract_path / entry.name
+        if target.is_symlink():
+            target.unlink()
+        if entry.is_dir():
+            install_files(entry, target)
+        else:
+            shutil.copy2(entry, target)
+
+    data_dir = manifest["data_dir"]
+    if data_dir:
+        data_file_dir = entry_path / data_dir / DATA_FILES_SCHEME
+        if data_file_dir.exists():
+            install_files(data_file_dir, sys.prefix)
+
+    return to_js([str(extract_path / name) for name in manifest["dynlibs"]])
+
+
+def should_load_dynlib(
+    path: str | Path, extension_tags: Collection[str] = EXTENSION_TAGS
+) -> bool:
     path = Path(path)
 
     if not SHAREDLIB_REGEX.search(path.name):
@@ -283,7 +701,7 @@ def should_load_dynlib(path: str | Path) -> bool:
     except ValueError:  # This should not happen, but just in case
         return False
 
-    if tag in EXTENSION_TAGS:
+    if tag in extension_tags:
         return True
     # Okay probably it's not compatible now. But it might be an unrelated .so
     # file with a name with an extra dot: `some.name.so` vs
@@ -294,7 +712,7 @@ def should_load_dynlib(path: str | Path) -> bool:
 
 def set_wheel_metadata(
     filename: str,
-    archive: ZipFile,
+    archive: ZipFile | Iterable[str],
     target_dir: Path,
     metadata: dict[str, str],
 ) -> None:
@@ -314,7 +732,8 @@ def set_wheel_metadata(
         The file name of the wheel.
 
     archive
-        A ZipFile object representing the wheel file.
+        A ZipFile object representing the wheel file, or the names of its
+        members.
 
     target_dir
         The directory the wheel is being installed into. Probably site-packages.
@@ -335,7 +754,7 @@ def set_wheel_metadata(
 
 def install_datafiles(
     filename: str,
-    archive: ZipFile,
+    archive: ZipFile | Iterable[str],
     target_dir: Path,
 ) -> None:
     """
@@ -354,6 +773,26 @@ def install_datafiles(
     install_files(data_file_dir, sys.prefix)
 
 
+def get_archive_names(archive: IO[bytes], suffix: str) -> Iterable[str]:
+    """List out the names of the members of a zip or tar archive."""
+    import tarfile
+
+    if suffix in ZIP_TYPES:
+        return ZipFile(archive).namelist()
+    elif suffix in TAR_TYPES:
+        return (tinfo.name for tinfo in tarfile.open(archive.name))
+    else:
+        raise ValueError(f"Unexpected suffix {suffix}")
+
+
+def dynlib_paths(names: Iterable[str], target_dir: Path) -> list[str]:
+    """Select the dynamic libraries out of a list of archive member names and
+    adjust their paths to point to their unpacked locations."""
+    return [
+        str((target_dir / path).resolve()) for path in names if should_load_dynlib(path)
+    ]
+
+
 def get_dynlibs(archive: IO[bytes], suffix: str, target_dir: Path) -> list[str]:
     """List out the paths to .so files in a zip or tar archive.
 
@@ -372,21 +811,7 @@ def get_dynlibs(archive: IO[bytes], suffix: str, target_dir: Path) -> list[str]:
         The list of paths to dynamic libraries ('.so' files) that were in the archive,
         but adjusted to point to their unpacked locations.
     """
-    import tarfile
-
-    dynlib_paths_iter: Iterable[str]
-    if suffix in ZIP_TYPES:
-        dynlib_paths_iter = ZipFile(archive).namelist()
-    elif suffix in TAR_TYPES:
-        dynlib_paths_iter = (tinfo.name for tinfo in tarfile.open(archive.name))
-    else:
-        raise ValueError(f"Unexpected suffix {suffix}")
-
-    return [
-        str((target_dir / path).resolve())
-        for path in dynlib_paths_iter
-        if should_load_dynlib(path)
-    ]
+    return dynlib_paths(get_archive_names(archive, suffix), target_dir)
 
 
 def get_dist_source(dist_path: Path) -> tuple[str, str]:
@@ -8,6 +8,7 @@ from _pyodide._base import (
     eval_code,
     eval_code_async,
     find_imports,
+    set_code_cache_size,
     should_quiet,
 )
 
@@ -110,6 +111,7 @@ __all__ = [
     "eval_code",
     "eval_code_async",
     "find_imports",
+    "set_code_cache_size",
     "should_quiet",
     "run_js",
     "relaxed_wrap",
@@ -25,7 +25,13 @@ from tokenize import TokenError
 from types import TracebackType
 from typing import Any, Literal
 
-from _pyodide._base import CodeRunner, ReturnMode, should_quiet
+from _pyodide._base import (
+    CodeRunner,
+    ReturnMode,
+    _cache_imports,
+    _imports_from_ast,
+    should_quiet,
+)
 
 __all__ = ["Console", "PyodideConsole", "BANNER", "repr_shorten", "ConsoleFuture"]
 
@@ -591,6 +597,9 @@ class PyodideConsole(Console):
         """
         from pyodide_js import loadPackagesFromImports
 
+        # The source was parsed already, so spare loadPackagesFromImports
+        # from parsing it again.
+        _cache_imports(source, _imports_from_ast(code.ast))
         await loadPackagesFromImports(source)
         return await super().runcode(source, code)
 
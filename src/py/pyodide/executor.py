@@ -0,0 +1,335 @@
+import asyncio
+import inspect
+import pickle
+import traceback
+import warnings
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, Future
+from typing import Any, ParamSpec, TypeVar
+from urllib.parse import urlsplit
+
+from .ffi import IN_BROWSER, JsArray, JsBuffer, can_run_sync, run_sync, to_js
+
+if IN_BROWSER:
+    from pyodide_js._api import WorkerPool
+
+__all__ = ["WorkerPoolExecutor", "ProcessPoolExecutor", "patch_concurrent_futures"]
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class _TransferredBuffer:
+    """Stands in for a buffer argument or result in the pickled payload. The
+    buffer itself is transferred next to the payload."""
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+class _RemoteTraceback(Exception):
+    """Carries the formatted traceback of an exception raised in a worker, like
+    in :py:mod:`concurrent.futures.process`."""
+
+    def __init__(self, tb: str):
+        self.tb = tb
+
+    def __str__(self) -> str:
+        return self.tb
+
+
+def _take_buffer(value: Any, buffers: list[JsBuffer]) -> Any:
+    if isinstance(value, JsBuffer):
+        buffers.append(value)
+        return _TransferredBuffer(len(buffers) - 1)
+    return value
+
+
+def _put_buffer(value: Any, buffers: list[JsBuffer]) -> Any:
+    if isinstance(value, _TransferredBuffer):
+        return buffers[value.index]
+    return value
+
+
+def _dumps(obj: Any) -> bytes:
+    try:
+        import cloudpickle
+    except ImportError:
+        return pickle.dumps(obj)
+    return cloudpickle.dumps(obj)
+
+
+def _set_future_result(future: Future[Any], result: JsArray[Any]) -> None:
+    payload, buffers = result
+    try:
+        ok, value, tb = pickle.loads(payload.to_bytes())
+    except BaseException as e:
+        future.set_exception(e)
+        return
+    if ok:
+        future.set_result(_put_buffer(value, list(buffers)))
+        return
+    if tb:
+        value.__cause__ = _RemoteTraceback(f'\n"""\n{tb}"""')
+    future.set_exception(value)
+
+
+async def _wait_for_promises(promises: Iterable[Any], timeout: float | None) -> None:
+    """Wait until the promises settle or ``timeout`` seconds have passed."""
+    tasks = [asyncio.ensure_future(promise) for promise in promises]
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+
+
+class _WorkerFuture(Future[T]):
+    """A future for the result of a task in a worker.
+
+    Waiting for the result synchronously only works if :py:func:`run_sync`
+    does.
+    """
+
+    _promise: Any = None
+
+    def _wait(self, timeout: float | None) -> None:
+        if self.done():
+            return
+        if not can_run_sync():
+            raise RuntimeError(
+                "Cannot block waiting for the result of a worker here. Await it "
+                "with asyncio.wrap_future() or loop.run_in_executor() instead."
+            )
+        run_sync(_wait_for_promises([self._promise], timeout))
+        if not self.done():
+            raise TimeoutError()
+
+    def result(self, timeout: float | None = None) -> T:
+        self._wait(timeout)
+        return super().result(0)
+
+    def exception(self, timeout: float | None = None) -> BaseException | None:
+        self._wait(timeout)
+        return super().exception(0)
+
+
+async def _initialize_worker(payload: JsBuffer) -> None:
+    """Run the initializer of a :py:class:`WorkerPoolExecutor`. This is called
+    in the worker before the first task."""
+    initializer, initargs = pickle.loads(payload.to_bytes())
+    result = initializer(*initargs)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _run_task(payload: JsBuffer, buffers: JsArray[Any]) -> Any:
+    """Run a task submitted by :py:class:`WorkerPoolExecutor`. This is called
+    in the worker.
+
+    Returns a JavaScript array of the pickled ``(ok, result or exception,
+    traceback)`` triple and the buffers to transfer back.
+    """
+    import cloudpickle
+
+    buffer_list = list(buffers)
+    fn, args, kwargs = pickle.loads(payload.to_bytes())
+    args = [_put_buffer(arg, buffer_list) for arg in args]
+    kwargs = {key: _put_buffer(value, buffer_list) for key, value in kwargs.items()}
+    result_buffers: list[JsBuffer] = []
+    try:
+        result = fn(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        result = _take_buffer(result, result_buffers)
+        data = cloudpickle.dumps((True, result, None))
+    except BaseException as e:
+        result_buffers.clear()
+        tb = "".join(traceback.format_exception(e))
+        try:
+            data = cloudpickle.dumps((False, e, tb))
+        except Exception:
+            data = cloudpickle.dumps((False, RuntimeError(repr(e)), tb))
+    return to_js([data, result_buffers])
+
+
+class WorkerPoolExecutor(Executor):
+    """An :py:class:`~concurrent.futures.Executor` that runs functions in a pool
+    of web workers, or worker threads in Node, each with its own Pyodide
+    instance.
+
+    The function and its arguments are pickled with ``cloudpickle`` if it is
+    loaded and :py:mod:`pickle` otherwise, so they can't refer to JavaScript
+    objects. The exception are :py:class:`~pyodide.ffi.JsBuffer` arguments and
+    return values: they are transferred between the workers without copying.
+    A transferred buffer is detached and can't be used anymore by the sender.
+
+    Workers are started when tasks are submitted. Each worker loads Pyodide
+    with the same lock file as this instance, then ``cloudpickle`` and
+    ``packages``. In Node, the ``indexURL`` of this instance has to be a path
+    or a ``file://`` URL. Functions can also be coroutine functions, they are awaited
+    in the worker.
+
+    Waiting synchronously for the futures returned by :py:meth:`submit` only
+    works when :py:func:`~pyodide.ffi.run_sync` does. Otherwise use
+    :py:func:`asyncio.wrap_future` or :py:meth:`~asyncio.loop.run_in_executor`
+    to await them:
+
+    .. code-block:: python
+
+        import asyncio
+        from pyodide.executor import WorkerPoolExecutor
+
+        executor = WorkerPoolExecutor(max_workers=4, packages=["numpy"])
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(executor, heavy_function, data)
+
+    Parameters
+    ----------
+    max_workers :
+        The maximum number of workers. Defaults to
+        :js:data:`navigator.hardwareConcurrency`.
+
+    packages :
+        Packages to load in each worker before running tasks.
+
+    initializer :
+        A function to call in each worker before its first task.
+
+    initargs :
+        The arguments to pass to ``initializer``.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        *,
+        packages: Iterable[str] = (),
+        initializer: Callable[..., Any] | None = None,
+        initargs: tuple[Any, ...] = (),
+    ):
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        init = None
+        if initializer is not None:
+            init = to_js(_dumps((initializer, initargs)))
+        self._pool = WorkerPool.new(
+            max_workers, to_js(["cloudpickle", *packages]), init
+        )
+        self._shutdown = False
+        self._pending: set[_WorkerFuture[Any]] = set()
+
+    def submit(
+        self, fn: Callable[P, T], /, *args: P.args, **kwargs: P.kwargs
+    ) -> Future[T]:
+        """Submit ``fn(*args, **kwargs)`` to run in a worker.
+
+        Returns a :py:class:`~concurrent.futures.Future` for the result.
+        """
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        buffers: list[JsBuffer] = []
+        args_ = [_take_buffer(arg, buffers) for arg in args]
+        kwargs_ = {key: _take_buffer(value, buffers) for key, value in kwargs.items()}
+        payload = _dumps((fn, args_, kwargs_))
+        future: _WorkerFuture[T] = _WorkerFuture()
+        future.set_running_or_notify_cancel()
+        future._promise = self._pool.submit(to_js(payload), to_js(buffers)).then(
+            lambda result: _set_future_result(future, result),
+            future.set_exception,
+        )
+        self._pending.add(future)
+        future.add_done_callback(lambda _: self._pending.discard(future))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop accepting new tasks and stop the workers once they are done.
+
+        If ``cancel_futures`` is true, tasks that have not started yet fail. If
+        ``wait`` is true, this blocks until the other tasks are done, which
+        needs :py:func:`~pyodide.ffi.run_sync` to work. Where it doesn't, this
+        returns right away and the tasks still finish in the background.
+        """
+        self._shutdown = True
+        self._pool.shutdown(cancel_futures)
+        if wait and self._pending and can_run_sync():
+            run_sync(
+                _wait_for_promises([f._promise for f in list(self._pending)], None)
+            )
+
+
+def _loaded_packages() -> list[str]:
+    """The packages loaded in this instance, as names for the ones from the lock
+    file and as wheel URLs otherwise.
+
+    This includes the packages installed with micropip, which records the URL
+    of the wheel. Packages that the workers can't load again, e.g., ones that
+    were installed with an unknown index or from a local file that only exists
+    in this instance's file system, are left out with a warning.
+    """
+    from pyodide_js import loadedPackages
+
+    packages = []
+    missing = []
+    for name, channel in loadedPackages.to_py().items():
+        if channel == "default channel":
+            packages.append(name)
+            continue
+        # The fragment (e.g., the hash of a wheel from PyPI) isn't part of the
+        # file name that loadPackage looks for.
+        parts = urlsplit(channel)._replace(fragment="")
+        if parts.scheme in ("http", "https") and parts.path.endswith(".whl"):
+            packages.append(parts.geturl())
+        else:
+            missing.append(name)
+    if missing:
+        warnings.warn(
+            "The workers won't load these packages because they weren't "
+            "installed from the lock file or an http(s) URL: "
+            f"{', '.join(sorted(missing))}. Pass their wheel URLs in packages "
+            "to a WorkerPoolExecutor instead.",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+    return packages
+
+
+class ProcessPoolExecutor(WorkerPoolExecutor):
+    """A replacement for :py:class:`concurrent.futures.ProcessPoolExecutor`
+    that runs tasks in a :py:class:`WorkerPoolExecutor`.
+
+    Each worker loads the packages that are loaded in this instance, including
+    the ones installed with micropip, so tasks can use the same libraries.
+    ``mp_context`` and ``max_tasks_per_child`` are accepted for compatibility
+    and ignored.
+
+    Libraries usually wait for the results synchronously, which needs
+    :py:func:`~pyodide.ffi.run_sync` to work. Use
+    :py:func:`patch_concurrent_futures` to make libraries that use
+    :py:class:`concurrent.futures.ProcessPoolExecutor` use this class.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        mp_context: Any = None,
+        initializer: Callable[..., Any] | None = None,
+        initargs: tuple[Any, ...] = (),
+        *,
+        max_tasks_per_child: int | None = None,
+    ):
+        super().__init__(
+            max_workers,
+            packages=_loaded_packages(),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+
+def patch_concurrent_futures() -> None:
+    """Replace :py:class:`concurrent.futures.ProcessPoolExecutor` with
+    :py:class:`ProcessPoolExecutor`.
+
+    Processes can't be started in Pyodide, so this lets code that uses a
+    process pool run its tasks in workers instead without changes.
+    """
+    import concurrent.futures
+
+    concurrent.futures.ProcessPoolExecutor = ProcessPoolExecutor  # type: ignore[misc, assignment]
@@ -1,16 +1,42 @@
+import builtins
+import hashlib
 import json
-from asyncio import CancelledError
-from collections.abc import Awaitable, Callable
+import shutil
+import time
+from asyncio import (
+    CancelledError,
+    Future,
+    Semaphore,
+    as_completed,
+    ensure_future,
+    gather,
+    get_event_loop,
+    sleep,
+)
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from io import StringIO
+from io import SEEK_CUR, SEEK_END, SEEK_SET, BufferedReader, RawIOBase, StringIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile
 from typing import IO, Any, ParamSpec, TypeVar
-
-from ._package_loader import unpack_buffer
-from .ffi import IN_BROWSER, JsBuffer, JsException, JsFetchResponse, to_js
+from urllib.parse import urlsplit
+
+from ._package_loader import extract_archive, get_format, install_datafiles
+from .ffi import (
+    IN_BROWSER,
+    JsBuffer,
+    JsException,
+    JsFetchResponse,
+    can_run_sync,
+    run_sync,
+    to_js,
+)
 
 if IN_BROWSER:
     try:
-        from js import AbortController, AbortSignal, Object
+        from js import AbortController, AbortSignal, Object, Response
         from js import fetch as _jsfetch
         from pyodide_js._api import abortSignalAny
     except ImportError:
@@ -34,6 +60,10 @@ __all__ = [
     "open_url",
     "pyfetch",
     "FetchResponse",
+    "RemoteFile",
+    "ResponseCache",
+    "FetchPool",
+    "gather_fetch",
     "HttpStatusError",
     "BodyUsedError",
     "AbortError",
@@ -157,6 +187,35 @@ def _construct_abort_reason(reason: Any) -> JsException | None:
     return JsException("AbortError", reason)
 
 
+# The tarfile stream modes for the tar formats registered with shutil
+_TAR_STREAM_MODES = {"tar": "r|", "gztar": "r|gz", "bztar": "r|bz2", "xztar": "r|xz"}
+
+
+class _BodyReader(RawIOBase):
+    """A file that reads the body of a response synchronously with
+    :py:func:`~pyodide.ffi.run_sync`, one chunk at a time."""
+
+    def __init__(self, reader: Any):
+        self._reader = reader
+        self._chunk = memoryview(b"")
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while not self._chunk and not self._done:
+            result = run_sync(self._reader.read())
+            if result.done:
+                self._done = True
+            else:
+                self._chunk = result.value.to_memoryview()
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+
 class FetchResponse:
     """A wrapper for a Javascript fetch :js:data:`Response`.
 
@@ -244,9 +303,10 @@ class FetchResponse:
         """The url of the response.
 
         The value may be different than the url passed to fetch.
-        See :js:attr:`Response.url`.
+        See :js:attr:`Response.url`. Responses that were not fetched, like the
+        ones from a :py:class:`ResponseCache`, have the url that was requested.
         """
-        return self.js_response.url
+        return self.js_response.url or self._url
 
     def _raise_if_failed(self) -> None:
         if (signal := self.abort_signal) and signal.aborted:
@@ -318,6 +378,58 @@ class FetchResponse:
         self._raise_if_failed()
         return (await self.buffer()).to_memoryview()
 
+    async def iter_chunks(self) -> AsyncIterator[builtins.memoryview]:
+        """Iterate over the response body in the chunks in which it arrives.
+
+        The body is read from the :js:class:`ReadableStream` of the response
+        only as fast as the chunks are consumed, so at most a few chunks are
+        held in memory at a time. Stopping the iteration early cancels the rest
+        of the download.
+
+        .. code-block:: python
+
+            async for chunk in resp.iter_chunks():
+                digest.update(chunk)
+        """
+        self._raise_if_failed()
+        body = self.js_response.body
+        if body is None:
+            return
+        reader = body.getReader()
+        try:
+            while not (result := await reader.read()).done:
+                yield result.value.to_memoryview()
+        except JsException as e:
+            raise AbortError(s.reason if (s := self.abort_signal) else e) from None
+        except CancelledError as e:
+            if self.abort_controller:
+                self.abort_controller.abort(
+                    _construct_abort_reason(
+                        "\n".join(map(str, e.args)) if e.args else None
+                    )
+                )
+            raise
+        except GeneratorExit:
+            # The iteration was stopped early
+            reader.cancel()
+            reader.releaseLock()
+            raise
+
+    async def stream_to_file(self, path: str) -> None:
+        """Write the response body into a file as it arrives.
+
+        Unlike :py:meth:`bytes` or :py:meth:`buffer` this never holds the whole
+        body in memory, see :py:meth:`iter_chunks`.
+
+        Parameters
+        ----------
+        path :
+            The path of the file to write. An existing file is overwritten.
+        """
+        with open(path, "wb") as f:
+            async for chunk in self.iter_chunks():
+                f.write(chunk)
+
     @_abort_on_cancel
     async def _into_file(self, f: IO[bytes] | IO[str]) -> None:
         """Write the data into an empty file with no copy.
@@ -367,6 +479,14 @@ class FetchResponse:
         an unpacker for. The arguments ``extract_dir`` and ``format`` are passed
         directly on to :py:func:`shutil.unpack_archive`.
 
+        If the file is a wheel, the data files in its ``.data`` directory are
+        also installed into :py:data:`sys.prefix`, like ``loadPackage`` does.
+
+        The body is never held in memory as a whole. If
+        :py:func:`~pyodide.ffi.run_sync` works, tar archives are decompressed
+        and unpacked while they are downloaded. Other archives are first
+        streamed into a temporary file.
+
         Parameters
         ----------
         extract_dir :
@@ -381,9 +501,43 @@ class FetchResponse:
             see if an unpacker was registered for that extension. In case none
             is found, a :py:exc:`ValueError` is raised.
         """
-        buf = await self.buffer()
         filename = self._url.rsplit("/", -1)[-1]
-        unpack_buffer(buf, filename=filename, format=format, extract_dir=extract_dir)
+        if format:
+            format = get_format(format)
+        elif not (format := shutil._find_unpack_format(filename)):  # type: ignore[attr-defined]
+            raise shutil.ReadError(f"Unknown archive format '{filename}'")
+        extract_path = Path(extract_dir or ".")
+        extract_path.mkdir(parents=True, exist_ok=True)
+
+        unpacker = shutil._UNPACK_FORMATS[format][1]  # type: ignore[attr-defined]
+        mode = _TAR_STREAM_MODES.get(format)
+        if mode and unpacker is shutil._unpack_tarfile and can_run_sync():  # type: ignore[attr-defined]
+            await self._unpack_tar_stream(mode, extract_path)
+            return
+        with NamedTemporaryFile(suffix=filename) as f:
+            async for chunk in self.iter_chunks():
+                f.write(chunk)
+            f.flush()
+            names = extract_archive(f.name, extract_path, format)
+        if Path(filename).suffix == ".whl":
+            top_level = {name.split("/", 1)[0] for name in names}
+            install_datafiles(filename, top_level, extract_path)
+
+    async def _unpack_tar_stream(self, mode: str, extract_path: Path) -> None:
+        """Unpack a tar archive while it is downloaded."""
+        import tarfile
+
+        self._raise_if_failed()
+        reader = self.js_response.body.getReader()
+        try:
+            fileobj = BufferedReader(_BodyReader(reader))
+            with tarfile.open(fileobj=fileobj, mode=mode) as archive:
+                archive.extractall(extract_path)
+        except JsException as e:
+            raise AbortError(s.reason if (s := self.abort_signal) else e) from None
+        except tarfile.TarError as e:
+            reader.cancel()
+            raise shutil.ReadError(f"{self._url} is not a valid tar archive") from e
 
     def abort(self, reason: Any = None) -> None:
         """Abort the fetch request.
@@ -447,3 +601,677 @@ async def pyfetch(url: str, **kwargs: Any) -> FetchResponse:
         raise
     except JsException as e:
         raise AbortError(e) from None
+
+
+class RemoteFile(RawIOBase):
+    r"""A read-only, seekable file that reads a URL with HTTP ``Range`` requests.
+
+    Only the parts of the file that are read are downloaded, so libraries that
+    accept a file object, like ``h5py`` or ``zarr``, can open large remote files.
+    The file is read in blocks of ``block_size`` bytes and the ``cache_size``
+    most recently used blocks are kept. A read fetches the blocks it needs that
+    are not cached with one request per run of adjacent blocks, and
+    ``readahead`` more blocks after the last one.
+
+    The server has to support range requests. For cross-origin requests the
+    ``Content-Length`` header of the response to a ``HEAD`` request or the
+    ``Content-Range`` header has to be exposed.
+
+    :py:meth:`read_async` and :py:meth:`readinto_async` can be awaited anywhere.
+    The usual synchronous file methods only work if
+    :py:func:`~pyodide.ffi.run_sync` does.
+
+    .. code-block:: python
+
+        from pyodide.http import RemoteFile
+
+        f = await RemoteFile.open("https://example.com/data.nc")
+        f.seek(1 << 30)
+        header = await f.read_async(1024)
+
+    Parameters
+    ----------
+    url :
+        URL of the file.
+
+    size :
+        The size of the file. If not given, it is requested from the server
+        when it is first needed.
+
+    block_size :
+        The number of bytes to request at a time.
+
+    cache_size :
+        The number of blocks to keep.
+
+    readahead :
+        The number of blocks to fetch after the ones that are read.
+
+    \*\*kwargs :
+        Passed on to :py:func:`pyfetch` for each request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        size: int | None = None,
+        block_size: int = 1 << 20,
+        cache_size: int = 32,
+        readahead: int = 1,
+        **kwargs: Any,
+    ):
+        if block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+        if cache_size < 0 or readahead < 0:
+            raise ValueError("cache_size and readahead can't be negative")
+        self.url = url
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.readahead = readahead
+        #: The number of requests made so far
+        self.requests = 0
+        self._size = size
+        self._pos = 0
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._headers = dict(kwargs.pop("headers", {}))
+        self._kwargs = kwargs
+
+    @classmethod
+    async def open(cls, url: str, **kwargs: Any) -> "RemoteFile":
+        """Create a :py:class:`RemoteFile` and request its size.
+
+        Takes the same arguments as :py:class:`RemoteFile`.
+        """
+        f = cls(url, **kwargs)
+        await f.size_async()
+        return f
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        self._checkClosed()
+        if whence == SEEK_SET:
+            pos = offset
+        elif whence == SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == SEEK_END:
+            pos = self._run_sync(self.size_async()) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence}, should be 0, 1 or 2)")
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def close(self) -> None:
+        self._blocks.clear()
+        super().close()
+
+    def _run_sync(self, awaitable: Awaitable[T]) -> T:
+        if not can_run_sync():
+            raise RuntimeError(
+                "Cannot read a RemoteFile synchronously here. Await "
+                "read_async() or readinto_async() instead."
+            )
+        return run_sync(awaitable)
+
+    def read(self, size: int | None = -1) -> bytes:
+        return self._run_sync(self.read_async(size))
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, b: Any) -> int:
+        return self._run_sync(self.readinto_async(b))
+
+    async def size_async(self) -> int:
+        """The size of the file in bytes."""
+        if self._size is None:
+            resp = await pyfetch(
+                self.url, **self._kwargs, method="HEAD", headers=self._headers
+            )
+            resp.raise_for_status()
+            length = resp.headers.get("content-length")
+            if length is None:
+                # Some servers leave it out, the size is part of Content-Range.
+                resp = await self._fetch_range(0, 1)
+                length = resp.headers.get("content-range", "").rpartition("/")[2]
+            if not length or not length.isdigit():
+                raise OSError(f"Could not determine the size of {self.url}")
+            self._size = int(length)
+        return self._size
+
+    async def read_async(self, size: int | None = -1) -> bytes:
+        """Read up to ``size`` bytes, or up to the end of the file if ``size``
+        is negative or ``None``."""
+        self._checkClosed()
+        file_size = await self.size_async()
+        if size is None or size < 0:
+            end = file_size
+        else:
+            end = min(self._pos + size, file_size)
+        if end <= self._pos:
+            return b""
+        start = self._pos
+        first = start // self.block_size
+        blocks = await self._get_blocks(first, (end - 1) // self.block_size)
+        offset = first * self.block_size
+        data = b"".join(blocks)[start - offset : end - offset]
+        self._pos = end
+        return data
+
+    async def readinto_async(self, b: Any) -> int:
+        """Read bytes into the writable buffer ``b`` and return their number."""
+        with memoryview(b) as view, view.cast("B") as view:
+            data = await self.read_async(len(view))
+            view[: len(data)] = data
+        return len(data)
+
+    async def _fetch_range(self, start: int, end: int) -> FetchResponse:
+        self.requests += 1
+        headers = {**self._headers, "Range": f"bytes={start}-{end - 1}"}
+        resp = await pyfetch(self.url, **self._kwargs, headers=headers)
+        resp.raise_for_status()
+        if resp.status != 206:
+            raise OSError(f"The server does not support range requests for {self.url}")
+        return resp
+
+    async def _fetch_blocks(self, first: int, last: int) -> list[bytes]:
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, await self.size_async())
+        data = await (await self._fetch_range(start, end)).bytes()
+        return [
+            data[i : i + self.block_size] for i in range(0, len(data), self.block_size)
+        ]
+
+    async def _get_blocks(self, first: int, last: int) -> list[bytes]:
+        """Get the blocks from ``first`` to ``last``, fetching the ones that are
+        not cached."""
+        found: dict[int, bytes] = {}
+        runs: list[list[int]] = []
+        for i in range(first, last + 1):
+            if (block := self._blocks.get(i)) is not None:
+                self._blocks.move_to_end(i)
+                found[i] = block
+            elif runs and runs[-1][1] == i - 1:
+                runs[-1][1] = i
+            else:
+                runs.append([i, i])
+        if runs:
+            num_blocks = -(-(await self.size_async()) // self.block_size)
+            run = runs[-1]
+            while (
+                run[1] < last + self.readahead
+                and run[1] + 1 < num_blocks
+                and run[1] + 1 not in self._blocks
+            ):
+                run[1] += 1
+        fetched = await gather(*(self._fetch_blocks(a, b) for a, b in runs))
+        for (a, _), blocks in zip(runs, fetched, strict=True):
+            for i, block in enumerate(blocks, a):
+                found[i] = block
+                self._blocks[i] = block
+        while len(self._blocks) > self.cache_size:
+            self._blocks.popitem(last=False)
+        return [found[i] for i in range(first, last + 1)]
+
+
+def _freshness_lifetime(headers: dict[str, str]) -> float:
+    """How many seconds a response is fresh according to its ``Cache-Control``
+    or ``Expires`` header. Zero means it has to be revalidated before use."""
+    directives = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().lower().partition("=")
+        directives[name] = value.strip('"')
+    if "no-cache" in directives:
+        return 0
+    if (max_age := directives.get("max-age", "")).isdigit():
+        return int(max_age)
+    if "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(expires - time.time(), 0)
+    return 0
+
+
+class ResponseCache:
+    """A cache for the responses of ``GET`` requests made with
+    :py:func:`pyfetch`, for data that is fetched again and again.
+
+    Use :py:meth:`fetch` instead of :py:func:`pyfetch` to go through the cache.
+    A cached response is used without a request while it is fresh according to
+    its ``Cache-Control: max-age`` or ``Expires`` header. Afterwards, or if it
+    has ``Cache-Control: no-cache``, it is revalidated with an ``If-None-Match``
+    or ``If-Modified-Since`` request if it has an ``ETag`` or
+    ``Last-Modified`` header, and the cached body is used if the server answers
+    ``304 Not Modified``. Responses with ``Cache-Control: no-store`` or without
+    freshness information or validators are not cached.
+
+    When the total size of the cached bodies exceeds ``max_size``, the least
+    recently used responses are dropped.
+
+    For cross-origin requests the server has to expose the ``ETag`` and
+    ``Last-Modified`` headers and allow the ``If-None-Match`` and
+    ``If-Modified-Since`` request headers.
+
+    .. code-block:: python
+
+        from pyodide.http import ResponseCache
+
+        cache = ResponseCache(directory="/home/pyodide/.http-cache")
+        resp = await cache.fetch("https://example.com/coastlines.json")
+        coastlines = await resp.json()
+
+    Parameters
+    ----------
+    max_size :
+        The maximum total size of the cached bodies in bytes.
+
+    directory :
+        A directory to store the responses in, so that they can be used by
+        later sessions. In Node, mount a host directory there with
+        :js:func:`pyodide.mountNodeFS`, in browsers mount an IDBFS file system
+        and call ``pyodide.FS.syncfs`` to persist it. If not given, responses
+        are only kept in memory.
+    """
+
+    def __init__(self, max_size: int = 64 << 20, *, directory: str | None = None):
+        if max_size < 0:
+            raise ValueError("max_size can't be negative")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bytes_saved = 0
+        self._size = 0
+        # key -> url, status, status_text, headers, size and expires
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._bodies: dict[str, bytes] = {}
+        self._directory = Path(directory) if directory else None
+        if self._directory:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            index = self._directory / "index.json"
+            if index.exists():
+                for key, entry in json.loads(index.read_text()):
+                    if "url" in entry and self._body_path(key).exists():
+                        self._entries[key] = entry
+                        self._size += entry["size"]
+            self._evict()
+
+    def stats(self) -> dict[str, int]:
+        """The number of hits, misses and revalidated responses, the number of
+        bytes that didn't have to be downloaded and the size of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "bytes_saved": self.bytes_saved,
+            "size": self._size,
+            "max_size": self.max_size,
+        }
+
+    def clear(self) -> None:
+        """Remove all responses from the cache."""
+        for key in list(self._entries):
+            self._remove(key)
+        self._save_index()
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchResponse:
+        """Fetch the url like :py:func:`pyfetch`, using the cache if possible.
+
+        Only ``GET`` requests are cached, other requests and requests for a
+        ``Range`` or with their own conditional headers are passed on to
+        :py:func:`pyfetch`. Responses are cached separately for each set of
+        request headers, so responses that vary with them are not mixed up.
+        """
+        request_headers = {
+            name.lower(): str(value)
+            for name, value in dict(kwargs.get("headers", {})).items()
+        }
+        if kwargs.get("method", "GET").upper() != "GET" or any(
+            name in request_headers
+            for name in ("range", "if-none-match", "if-modified-since")
+        ):
+            return await pyfetch(url, **kwargs)
+        key = json.dumps([url, sorted(request_headers.items())])
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return await self._store(key, url, await pyfetch(url, **kwargs))
+        self._entries.move_to_end(key)
+        if time.time() < entry["expires"]:
+            self.hits += 1
+            self.bytes_saved += entry["size"]
+            return self._response(key, entry)
+
+        headers = dict(kwargs.pop("headers", {}))
+        if etag := entry["headers"].get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = last_modified
+        resp = await pyfetch(url, **kwargs, headers=headers)
+        if resp.status != 304:
+            self.misses += 1
+            return await self._store(key, url, resp)
+        self.hits += 1
+        self.revalidated += 1
+        self.bytes_saved += entry["size"]
+        # The 304 response carries the new freshness information.
+        entry["headers"].update(resp.headers)
+        entry["expires"] = time.time() + _freshness_lifetime(entry["headers"])
+        self._save_index()
+        return self._response(key, entry)
+
+    def _body_path(self, key: str) -> Path:
+        assert self._directory
+        return self._directory / hashlib.sha256(key.encode()).hexdigest()
+
+    def _body(self, key: str) -> bytes:
+        if self._directory:
+            return self._body_path(key).read_bytes()
+        return self._bodies[key]
+
+    def _response(
+        self, key: str, entry: dict[str, Any], body: bytes | None = None
+    ) -> FetchResponse:
+        if body is None:
+            body = self._body(key)
+        init = {
+            "status": entry["status"],
+            "statusText": entry["status_text"],
+            "headers": entry["headers"],
+        }
+        js_response = Response.new(
+            to_js(body), to_js(init, dict_converter=Object.fromEntries)
+        )
+        return FetchResponse(entry["url"], js_response)
+
+    async def _store(self, key: str, url: str, resp: FetchResponse) -> FetchResponse:
+        headers = resp.headers
+        cacheable = (
+            resp.status == 200
+            and "no-store" not in headers.get("cache-control", "").lower()
+            # The request headers are part of the key, so only responses that
+            # vary with something else can't be cached.
+            and headers.get("vary", "").strip() != "*"
+            and (
+                _freshness_lifetime(headers) > 0
+                or "etag" in headers
+                or "last-modified" in headers
+            )
+        )
+        if not cacheable:
+            return resp
+        body = await resp.bytes()
+        if key in self._entries:
+            self._remove(key)
+        entry = {
+            "url": url,
+            "status": resp.status,
+            "status_text": resp.status_text,
+            "headers": headers,
+            "size": len(body),
+            "expires": time.time() + _freshness_lifetime(headers),
+        }
+        if len(body) <= self.max_size:
+            if self._directory:
+                self._body_path(key).write_bytes(body)
+            else:
+                self._bodies[key] = body
+            self._entries[key] = entry
+            self._size += len(body)
+            self._evict()
+        self._save_index()
+        return self._response(key, entry, body)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry["size"]
+        if self._directory:
+            self._body_path(key).unlink(missing_ok=True)
+        else:
+            del self._bodies[key]
+
+    def _evict(self) -> None:
+        while self._size > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _save_index(self) -> None:
+        if self._directory:
+            index = json.dumps(list(self._entries.items()))
+            (self._directory / "index.json").write_text(index)
+
+
+# Statuses that are worth retrying
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def _cancel_body(resp: FetchResponse) -> None:
+    """Stop downloading the body of a response that won't be read."""
+    if (body := resp.js_response.body) is not None and not resp.body_used:
+        body.cancel()
+
+
+class FetchPool:
+    r"""Makes many requests with :py:func:`pyfetch` at a bounded concurrency.
+
+    At most ``max_concurrency`` requests are in flight at a time and at most
+    ``max_per_host`` to the same host, the others wait. A request counts as in
+    flight until its response headers arrive, so read the bodies promptly.
+
+    Requests that fail with a network error or with one of the statuses 408,
+    429, 500, 502, 503 and 504 are retried up to ``retries`` times, after
+    ``backoff * 2**attempt`` seconds or the time the ``Retry-After`` header
+    asks for. If the last attempt fails with a status, that response is
+    returned.
+
+    Concurrent requests for the same URL without extra options are only made
+    once, the other callers get a clone of the response.
+
+    .. code-block:: python
+
+        from pyodide.http import FetchPool
+
+        pool = FetchPool(max_concurrency=32)
+        async for url, resp in pool.as_completed(tile_urls):
+            tiles[url] = await resp.bytes()
+
+    Parameters
+    ----------
+    max_concurrency :
+        The maximum number of requests in flight.
+
+    max_per_host :
+        The maximum number of requests in flight to the same host.
+
+    retries :
+        How many times to retry a failed request.
+
+    backoff :
+        The time in seconds to wait before the first retry. It doubles with
+        each retry.
+
+    \*\*kwargs :
+        Passed on to :py:func:`pyfetch` for each request.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        *,
+        max_per_host: int = 6,
+        retries: int = 2,
+        backoff: float = 0.5,
+        **kwargs: Any,
+    ):
+        if max_concurrency <= 0 or max_per_host <= 0:
+            raise ValueError("max_concurrency and max_per_host must be greater than 0")
+        if retries < 0:
+            raise ValueError("retries can't be negative")
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._kwargs = kwargs
+        self._semaphore = Semaphore(max_concurrency)
+        self._host_semaphores: dict[str, Semaphore] = {}
+        # url -> the task that makes the request and the futures of the
+        # callers waiting for it
+        self._in_flight: dict[
+            str, tuple[Future[None], list[Future[FetchResponse]]]
+        ] = {}
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchResponse:
+        """Fetch the url like :py:func:`pyfetch`.
+
+        ``kwargs`` are added to the options of the pool.
+        """
+        if kwargs:
+            return await self._fetch_with_retries(url, {**self._kwargs, **kwargs})
+        future: Future[FetchResponse] = get_event_loop().create_future()
+        if url in self._in_flight:
+            self._in_flight[url][1].append(future)
+        else:
+            self._in_flight[url] = (ensure_future(self._fetch_shared(url)), [future])
+        future.add_done_callback(lambda _: self._cancel_unused(url))
+        return await future
+
+    def _cancel_unused(self, url: str) -> None:
+        """Cancel the request to ``url`` if all callers waiting for it were
+        cancelled."""
+        if (entry := self._in_flight.get(url)) is None:
+            return
+        task, waiters = entry
+        if all(future.cancelled() for future in waiters):
+            del self._in_flight[url]
+            task.cancel()
+
+    async def gather(
+        self, urls: Iterable[str], *, return_exceptions: bool = False
+    ) -> list[Any]:
+        """Fetch all urls and return the responses in the same order.
+
+        If ``return_exceptions`` is true, exceptions are returned in place of
+        the responses of the requests that failed. Otherwise the first one is
+        raised and the other requests are cancelled.
+        """
+        tasks = [ensure_future(self.fetch(url)) for url in urls]
+        try:
+            return await gather(*tasks, return_exceptions=return_exceptions)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def as_completed(
+        self, urls: Iterable[str]
+    ) -> AsyncIterator[tuple[str, FetchResponse]]:
+        """Fetch all urls and yield ``(url, response)`` as the responses
+        arrive. If a request fails, its exception is raised and the other
+        requests are cancelled."""
+
+        async def fetch(url: str) -> tuple[str, FetchResponse]:
+            return url, await self.fetch(url)
+
+        tasks = [ensure_future(fetch(url)) for url in urls]
+        try:
+            for next_result in as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_shared(self, url: str) -> None:
+        try:
+            resp = await self._fetch_with_retries(url, self._kwargs)
+        except CancelledError:
+            raise
+        except BaseException as e:
+            for future in self._in_flight.pop(url)[1]:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        waiters = [f for f in self._in_flight.pop(url)[1] if not f.done()]
+        if not waiters:
+            _cancel_body(resp)
+            return
+        # Clone the response for the other callers before any of them can
+        # read the body.
+        clones = [resp.clone() for _ in waiters[1:]]
+        for future, r in zip(waiters, [resp, *clones], strict=True):
+            future.set_result(r)
+
+    async def _fetch_with_retries(
+        self, url: str, kwargs: dict[str, Any]
+    ) -> FetchResponse:
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = Semaphore(self.max_per_host)
+        attempt = 0
+        while True:
+            # Wait for the host first, so that requests to a slow host don't
+            # take up the slots of the other hosts.
+            async with self._host_semaphores[host], self._semaphore:
+                try:
+                    resp = await pyfetch(url, **kwargs)
+                except OSError:
+                    # pyfetch raises AbortError for network errors too, only
+                    # don't retry if the request was aborted on purpose.
+                    signal = kwargs.get("signal")
+                    if attempt >= self.retries or (signal and signal.aborted):
+                        raise
+                    resp = None
+            if resp is not None and (
+                resp.status not in _RETRY_STATUSES or attempt >= self.retries
+            ):
+                return resp
+            delay = self.backoff * 2**attempt
+            if resp is not None:
+                after = resp.headers.get("retry-after", "")
+                if after.isdigit():
+                    delay = max(delay, int(after))
+                _cancel_body(resp)
+            attempt += 1
+            await sleep(delay)
+
+
+async def gather_fetch(
+    urls: Iterable[str],
+    *,
+    max_concurrency: int = 16,
+    max_per_host: int = 6,
+    retries: int = 2,
+    backoff: float = 0.5,
+    return_exceptions: bool = False,
+    **kwargs: Any,
+) -> list[Any]:
+    r"""Fetch all urls with a :py:class:`FetchPool` and return the responses in
+    the same order.
+
+    See :py:class:`FetchPool` for the parameters and
+    :py:meth:`FetchPool.gather` for ``return_exceptions``. Use
+    :py:meth:`FetchPool.as_completed` to get the responses as they arrive.
+
+    .. code-block:: python
+
+        from pyodide.http import gather_fetch
+
+        responses = await gather_fetch(chunk_urls, max_concurrency=32)
+        chunks = [await resp.bytes() for resp in responses]
+    """
+    pool = FetchPool(
+        max_concurrency,
+        max_per_host=max_per_host,
+        retries=retries,
+        backoff=backoff,
+        **kwargs,
+    )
+    return await pool.gather(urls, return_exceptions=return_exceptions)
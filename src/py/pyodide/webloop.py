@@ -1,10 +1,12 @@
 import asyncio
 import contextvars
+import heapq
 import inspect
 import sys
 import time
 import traceback
 from asyncio import Future, Task
+from collections import deque
 from collections.abc import Awaitable, Callable, Coroutine
 from typing import Any, TypeVar, overload
 
@@ -16,6 +18,10 @@ if IN_BROWSER:
 T = TypeVar("T")
 S = TypeVar("S")
 
+# Same as in asyncio.base_events
+_MIN_SCHEDULED_TIMER_HANDLES = 100
+_MIN_CANCELLED_TIMER_HANDLES_FRACTION = 0.5
+
 
 class PyodideFuture(Future[T]):
     """A :py:class:`~asyncio.Future` with extra :js:meth:`~Promise.then`,
@@ -196,9 +202,21 @@ class WebLoop(asyncio.AbstractEventLoop):
     browser event loop as a task not as a microtask. ``setTimeout(callback, 0)``
     enqueues the callback as a task so it works well for our purposes.
 
+    Callbacks scheduled with :py:meth:`call_soon` are collected in a ready
+    queue which is drained by a single browser task. To keep the page
+    responsive, a drain stops after :py:attr:`ready_time_budget` seconds and
+    defers the remaining callbacks to the next browser task.
+
+    Delayed callbacks are kept in a heap and only the earliest deadline has a
+    browser timer, so cancelling a delayed callback doesn't involve JavaScript.
+
     See the Python :external:doc:`library/asyncio-eventloop` documentation.
     """
 
+    ready_time_budget: float = 0.05
+    """The maximum time in seconds spent running ready callbacks before yielding
+    to the browser event loop."""
+
     def __init__(self):
         self._task_factory = None
         asyncio._set_running_loop(self)
@@ -208,6 +226,13 @@ class WebLoop(asyncio.AbstractEventLoop):
         self._no_in_progress_handler = None
         self._keyboard_interrupt_handler = None
         self._system_exit_handler = None
+        self._ready: deque[asyncio.Handle] = deque()
+        self._ready_scheduled = False
+        self._scheduled: list[asyncio.TimerHandle] = []
+        self._timer_cancelled_count = 0
+        # Deadlines of the browser timers that have not fired yet
+        self._timer_wakeups: list[float] = []
+        self._default_executor = None
 
     def get_debug(self):
         return False
@@ -287,10 +312,56 @@ class WebLoop(asyncio.AbstractEventLoop):
         Any positional arguments after the callback will be passed to
         the callback when it is called.
 
-        This schedules the callback on the browser event loop using ``setTimeout(callback, 0)``.
+        The callback is added to the ready queue. If no drain of the ready queue
+        is scheduled yet, this schedules one on the browser event loop using
+        ``setTimeout(callback, 0)``.
         """
-        delay = 0
-        return self.call_later(delay, callback, *args, context=context)
+        h = asyncio.Handle(callback, args, self, context=context)
+        self._ready.append(h)
+        if not self._ready_scheduled:
+            self._schedule_ready()
+        return h
+
+    def _schedule_ready(self):
+        self._ready_scheduled = True
+        scheduleCallback(create_once_callable(self._run_ready, _may_syncify=True), 0)
+
+    def _run_ready(self):
+        """Run the callbacks that are in the ready queue.
+
+        Callbacks added while this runs are left for the next drain, like in
+        ``BaseEventLoop._run_once``. We clear ``_ready_scheduled`` first so that
+        adding one schedules the next drain even if a callback suspends with
+        ``run_sync``.
+        """
+        self._ready_scheduled = False
+        deadline = self.time() + self.ready_time_budget
+        try:
+            for _ in range(len(self._ready)):
+                if not self._ready:
+                    break
+                h = self._ready.popleft()
+                if not h.cancelled():
+                    self._run_handle(h)
+                if self.time() > deadline:
+                    break
+        finally:
+            if self._ready and not self._ready_scheduled:
+                self._schedule_ready()
+
+    def _run_handle(self, h: asyncio.Handle) -> None:
+        try:
+            h._run()
+        except SystemExit as e:
+            if self._system_exit_handler:
+                self._system_exit_handler(e.code)
+            else:
+                raise
+        except KeyboardInterrupt:
+            if self._keyboard_interrupt_handler:
+                self._keyboard_interrupt_handler()
+            else:
+                raise
 
     def call_soon_threadsafe(  # type: ignore[override]
         self,
@@ -310,7 +381,7 @@ class WebLoop(asyncio.AbstractEventLoop):
         callback: Callable[..., Any],
         *args: Any,
         context: contextvars.Context | None = None,
-    ) -> asyncio.Handle:
+    ) -> asyncio.TimerHandle:
         """Arrange for a callback to be called at a given time.
 
         Return a Handle: an opaque object with a cancel() method that
@@ -326,33 +397,11 @@ class WebLoop(asyncio.AbstractEventLoop):
         Any positional arguments after the callback will be passed to
         the callback when it is called.
 
-        This uses `setTimeout(callback, delay)`
+        This uses ``call_at(self.time() + delay, callback)``
         """
         if delay < 0:
             raise ValueError("Can't schedule in the past")
-        h = asyncio.Handle(callback, args, self, context=context)
-
-        def run_handle():
-            if h.cancelled():
-                return
-            try:
-                h._run()
-            except SystemExit as e:
-                if self._system_exit_handler:
-                    self._system_exit_handler(e.code)
-                else:
-                    raise
-            except KeyboardInterrupt:
-                if self._keyboard_interrupt_handler:
-                    self._keyboard_interrupt_handler()
-                else:
-                    raise
-
-        scheduleCallback(
-            create_once_callable(run_handle, _may_syncify=True), delay * 1000
-        )
-
-        return h
+        return self.call_at(self.time() + delay, callback, *args, context=context)
 
     def _decrement_in_progress(self, fut=None):
         if (
@@ -372,26 +421,100 @@ class WebLoop(asyncio.AbstractEventLoop):
         callback: Callable[..., Any],
         *args: Any,
         context: contextvars.Context | None = None,
-    ) -> asyncio.Handle:
+    ) -> asyncio.TimerHandle:
         """Like ``call_later()``, but uses an absolute time.
 
         Absolute time corresponds to the event loop's ``time()`` method.
 
-        This uses ``setTimeout(callback, when - cur_time)``
+        The handle is pushed onto the timer heap. If it is the earliest one,
+        this uses ``setTimeout(callback, when - cur_time)`` to wake up the loop.
+        """
+        h = asyncio.TimerHandle(when, callback, args, self, context=context)
+        heapq.heappush(self._scheduled, h)
+        h._scheduled = True  # type: ignore[attr-defined]
+        self._arm_timer()
+        return h
+
+    def _arm_timer(self) -> None:
+        """Make sure that a browser timer fires at the earliest deadline."""
+        if not self._scheduled:
+            return
+        when = self._scheduled[0].when()
+        if self._timer_wakeups and self._timer_wakeups[0] <= when:
+            return
+        heapq.heappush(self._timer_wakeups, when)
+        delay = max(0.0, when - self.time())
+        scheduleCallback(
+            create_once_callable(lambda: self._run_timers(when), _may_syncify=True),
+            delay * 1000,
+        )
+
+    def _run_timers(self, wakeup: float) -> None:
+        """Move the timer handles that are due to the ready queue."""
+        self._timer_wakeups.remove(wakeup)
+        heapq.heapify(self._timer_wakeups)
+        end_time = self.time()
+        while self._scheduled:
+            h = self._scheduled[0]
+            if not h.cancelled() and h.when() > end_time:
+                break
+            heapq.heappop(self._scheduled)
+            h._scheduled = False  # type: ignore[attr-defined]
+            if h.cancelled():
+                self._timer_cancelled_count -= 1
+            else:
+                self._ready.append(h)
+        self._arm_timer()
+        if self._ready and not self._ready_scheduled:
+            self._run_ready()
+
+    def _timer_handle_cancelled(self, handle: asyncio.TimerHandle) -> None:
+        """Called by ``TimerHandle.cancel()``.
+
+        Cancelled handles stay in the heap until they are due. Like
+        ``BaseEventLoop``, we rebuild the heap when more than half of it is
+        cancelled so it doesn't grow without bound.
         """
-        cur_time = self.time()
-        delay = when - cur_time
-        return self.call_later(delay, callback, *args, context=context)
+        if not handle._scheduled:  # type: ignore[attr-defined]
+            return
+        self._timer_cancelled_count += 1
+        if (
+            len(self._scheduled) > _MIN_SCHEDULED_TIMER_HANDLES
+            and self._timer_cancelled_count
+            > _MIN_CANCELLED_TIMER_HANDLES_FRACTION * len(self._scheduled)
+        ):
+            new_scheduled = []
+            for h in self._scheduled:
+                # handle is marked as cancelled only after this returns
+                if h.cancelled() or h is handle:
+                    h._scheduled = False  # type: ignore[attr-defined]
+                else:
+                    new_scheduled.append(h)
+            heapq.heapify(new_scheduled)
+            self._scheduled = new_scheduled
+            self._timer_cancelled_count = 0
 
     def run_in_executor(self, executor, func, *args):  # type: ignore[override]
         """Arrange for func to be called in the specified executor.
 
         This is normally supposed to run func(*args) in a separate process or
-        thread and signal back to our event loop when it is done. It's possible
-        to make the executor, but if we actually try to submit any functions to
-        it, it will try to create a thread and throw an error. Best we can do is
-        to run func(args) in this thread and stick the result into a future.
+        thread and signal back to our event loop when it is done. If the
+        executor (or the default executor if ``executor`` is ``None``) is a
+        :py:class:`~pyodide.executor.WorkerPoolExecutor`, func runs in a
+        worker.
+
+        Other executors would try to create a thread and throw an error. Best we
+        can do is to run func(args) in this thread and stick the result into a
+        future.
         """
+        if executor is None:
+            executor = self._default_executor
+        if executor is not None:
+            from .executor import WorkerPoolExecutor
+
+            if isinstance(executor, WorkerPoolExecutor):
+                return asyncio.wrap_future(executor.submit(func, *args), loop=self)
+
         fut = self.create_future()
         try:
             fut.set_result(func(*args))
@@ -399,6 +522,15 @@ class WebLoop(asyncio.AbstractEventLoop):
             fut.set_exception(e)
         return fut
 
+    def set_default_executor(self, executor):
+        """Set the executor used by :py:meth:`run_in_executor` when it is called
+        with ``None``.
+
+        Use a :py:class:`~pyodide.executor.WorkerPoolExecutor` to run these
+        functions in workers.
+        """
+        self._default_executor = executor
+
     def create_future(self) -> asyncio.Future[Any]:
         """Create a Future object attached to the loop."""
         self._in_progress += 1
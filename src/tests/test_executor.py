@@ -0,0 +1,147 @@
+import pytest
+from pytest_pyodide import run_in_pyodide
+
+from conftest import requires_jspi
+
+
+@pytest.mark.skip_pyproxy_check
+@run_in_pyodide(packages=["cloudpickle"])
+async def test_worker_pool_executor(selenium_standalone):
+    import asyncio
+
+    import pytest
+
+    from pyodide.code import run_js
+    from pyodide.executor import WorkerPoolExecutor
+
+    def add(a, b):
+        return a + b
+
+    async def async_add(a, b):
+        await asyncio.sleep(0)
+        return a + b
+
+    def fail():
+        raise ValueError("from the worker")
+
+    def double(buf):
+        return run_js("(a) => a.map((x) => 2 * x)")(buf)
+
+    loop = asyncio.get_event_loop()
+    with WorkerPoolExecutor(max_workers=2) as executor:
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, add, i, 1) for i in range(4))
+        )
+        assert results == [1, 2, 3, 4]
+        assert await loop.run_in_executor(executor, async_add, 2, 3) == 5
+        assert len(executor._pool.workers) == 2
+
+        with pytest.raises(ValueError, match="from the worker") as exc_info:
+            await loop.run_in_executor(executor, fail)
+        assert "in fail" in str(exc_info.value.__cause__)
+
+        # Buffers are transferred in both directions
+        buf = run_js("new Float64Array([1, 2, 3])")
+        result = await loop.run_in_executor(executor, double, buf)
+        assert buf.byteLength == 0
+        assert result.to_py().tolist() == [2, 4, 6]
+
+    with pytest.raises(RuntimeError, match="after shutdown"):
+        executor.submit(add, 1, 2)
+
+
+@pytest.mark.skip_pyproxy_check
+@run_in_pyodide(packages=["cloudpickle"])
+async def test_default_executor(selenium_standalone):
+    import asyncio
+
+    from pyodide.executor import WorkerPoolExecutor
+
+    def answer():
+        return 42
+
+    loop = asyncio.get_event_loop()
+    executor = WorkerPoolExecutor(max_workers=1)
+    loop.set_default_executor(executor)
+    try:
+        assert await loop.run_in_executor(None, answer) == 42
+        assert len(executor._pool.workers) == 1
+    finally:
+        loop.set_default_executor(None)
+        executor.shutdown()
+
+
+@requires_jspi
+@pytest.mark.skip_pyproxy_check
+@run_in_pyodide(packages=["cloudpickle"])
+def test_process_pool_executor(selenium_standalone):
+    import concurrent.futures
+
+    import pytest
+
+    from pyodide.executor import ProcessPoolExecutor, patch_concurrent_futures
+
+    def square(x):
+        return x * x
+
+    def set_offset(value):
+        import os
+
+        os.environ["EXECUTOR_TEST_OFFSET"] = str(value)
+
+    def add_offset(x):
+        import os
+
+        return x + int(os.environ["EXECUTOR_TEST_OFFSET"])
+
+    patch_concurrent_futures()
+    assert concurrent.futures.ProcessPoolExecutor is ProcessPoolExecutor
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(square, range(5))) == [0, 1, 4, 9, 16]
+        assert executor.submit(square, 7).result() == 49
+
+    with ProcessPoolExecutor(1, initializer=set_offset, initargs=(10,)) as executor:
+        assert executor.submit(add_offset, 1).result() == 11
+
+    async def sleep_then(delay):
+        import asyncio
+
+        await asyncio.sleep(delay)
+        return delay
+
+    executor = ProcessPoolExecutor(1)
+    future = executor.submit(sleep_then, 0.5)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0.01)
+    assert not future.done()
+    futures = [executor.submit(sleep_then, 0.1) for _ in range(2)]
+    executor.shutdown(wait=True)
+    assert all(f.done() for f in futures)
+    assert future.result(timeout=0) == 0.5
+
+
+def test_loaded_packages(monkeypatch):
+    import sys
+    from types import SimpleNamespace
+
+    from pyodide.executor import _loaded_packages
+
+    loaded = {
+        "numpy": "default channel",
+        "snowballstemmer": "https://files.pythonhosted.org/packages/snowballstemmer-2.2.0-py2.py3-none-any.whl#sha256=c8e1",
+        "local": "emfs:/tmp/local-1.0-py3-none-any.whl",
+        "other": "file:///tmp/other-1.0-py3-none-any.whl",
+        "unknown": "pip (index unknown)",
+    }
+    monkeypatch.setitem(
+        sys.modules,
+        "pyodide_js",
+        SimpleNamespace(loadedPackages=SimpleNamespace(to_py=lambda: loaded)),
+    )
+    with pytest.warns(RuntimeWarning, match="http\\(s\\) URL: local, other, unknown"):
+        packages = _loaded_packages()
+    assert packages == [
+        "numpy",
+        "https://files.pythonhosted.org/packages/snowballstemmer-2.2.0-py2.py3-none-any.whl",
+    ]
@@ -1259,7 +1259,14 @@ def test_duck_buffer_method_presence(selenium):
     )
     other = run_js("{}")
 
-    buffer_methods = {"assign", "assign_to", "to_string", "to_memoryview", "to_bytes"}
+    buffer_methods = {
+        "assign",
+        "assign_to",
+        "to_string",
+        "to_memoryview",
+        "to_bytes",
+        "to_numpy",
+    }
     assert buffer_methods < set(dir(bytes))
     assert not set(dir(other)).intersection(buffer_methods)
 
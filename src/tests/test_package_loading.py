@@ -456,6 +456,232 @@ def test_get_dynlibs():
         assert sorted(get_dynlibs(t, ".zip", Path("/p"))) == so_files
 
 
+class _FakeJsBuffer:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def _into_file(self, f):
+        f.write(self.data)
+        f.flush()
+
+
+def test_unpack_buffer(monkeypatch, tmp_path):
+    import io
+    import sys
+    import tarfile
+
+    from pyodide import _package_loader
+
+    monkeypatch.setattr(_package_loader, "to_js", lambda x: x)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "prefix"))
+
+    wheel_name = "dummy_pkg-0.1.0-py3-none-any.whl"
+    wheel_data = (Path(__file__).parent / "wheels" / wheel_name).read_bytes()
+    site = tmp_path / "site"
+    dynlibs = _package_loader.unpack_buffer(
+        _FakeJsBuffer(wheel_data),
+        filename=wheel_name,
+        format="zip",
+        extract_dir=str(site),
+        calculate_dynlibs=True,
+        metadata={"INSTALLER": "pytest"},
+    )
+    assert dynlibs == []
+    assert (site / "dummy_pkg" / "__init__.py").is_file()
+    assert (site / "dummy_pkg-0.1.0.dist-info" / "INSTALLER").read_text() == "pytest"
+    assert (tmp_path / "prefix" / "share" / "datafile").is_file()
+    assert (tmp_path / "prefix" / "etc" / "datafile2").is_file()
+
+    files = ["a.py", "a.so", "b/c.so", "b/d.txt"]
+    tar_data = io.BytesIO()
+    with tarfile.open(mode="w:gz", fileobj=tar_data) as t:
+        for file in files:
+            info = tarfile.TarInfo(file)
+            info.size = 1
+            t.addfile(info, io.BytesIO(b"x"))
+
+    tar_dir = tmp_path / "tar"
+    dynlibs = _package_loader.unpack_buffer(
+        _FakeJsBuffer(tar_data.getvalue()),
+        filename="archive.tar.gz",
+        extract_dir=str(tar_dir),
+        calculate_dynlibs=True,
+    )
+    assert sorted(dynlibs) == [str(tar_dir / "a.so"), str(tar_dir / "b/c.so")]
+    for file in files:
+        assert (tar_dir / file).read_bytes() == b"x"
+
+
+def test_unpack_buffer_manifest(monkeypatch, tmp_path):
+    import sys
+    from zipfile import ZipFile
+
+    from pyodide import _package_loader
+
+    monkeypatch.setattr(_package_loader, "to_js", lambda x: x)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "prefix"))
+
+    wheel_name = "dummy_pkg-0.1.0-py3-none-any.whl"
+    wheel_data = (Path(__file__).parent / "wheels" / wheel_name).read_bytes()
+    with ZipFile(Path(__file__).parent / "wheels" / wheel_name) as zf:
+        names = zf.namelist()
+
+    manifest = {
+        "dist_info_dir": _package_loader.find_wheel_metadata_dir(
+            names, _package_loader.DIST_INFO_DIR_SUFFIX
+        ),
+        "data_dir": _package_loader.find_wheel_metadata_dir(
+            names, _package_loader.DATA_FILES_DIR_SUFFIX
+        ),
+        # The manifest is trusted, the order of the dynlibs is kept as is
+        "dynlibs": ["b.so", "a.so"],
+    }
+    site = tmp_path / "site"
+    dynlibs = _package_loader.unpack_buffer(
+        _FakeJsBuffer(wheel_data),
+        filename=wheel_name,
+        format="zip",
+        extract_dir=str(site),
+        calculate_dynlibs=True,
+        metadata={"INSTALLER": "pytest"},
+        manifest=manifest,
+    )
+    assert dynlibs == [str((site / "b.so").resolve()), str((site / "a.so").resolve())]
+    assert (site / "dummy_pkg-0.1.0.dist-info" / "INSTALLER").read_text() == "pytest"
+    assert (tmp_path / "prefix" / "share" / "datafile").is_file()
+    assert (tmp_path / "prefix" / "etc" / "datafile2").is_file()
+
+
+def test_unpack_buffer_zipimport(monkeypatch, tmp_path):
+    import importlib.util
+    import io
+    import marshal
+    import sys
+    from zipfile import ZipFile
+
+    from pyodide import _package_loader
+
+    monkeypatch.setattr(_package_loader, "to_js", lambda x: x)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "prefix"))
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    monkeypatch.setattr(_package_loader.wheel_finder, "modules", {})
+
+    sub_code = compile("VALUE = 2", "zipimport_pkg/sub/__init__.py", "exec")
+    sub_pyc = importlib.util.MAGIC_NUMBER + b"\0" * 12 + marshal.dumps(sub_code)
+    wheel_name = "zipimport_pkg-0.1.0-py3-none-any.whl"
+    wheel_data = io.BytesIO()
+    with ZipFile(wheel_data, "w") as zf:
+        zf.writestr(
+            "zipimport_pkg/__init__.py",
+            "from pathlib import Path\n"
+            "DATA = (Path(__file__).parent / 'data.txt').read_text()\n",
+        )
+        zf.writestr("zipimport_pkg/mod.py", "VALUE = 1")
+        zf.writestr("zipimport_pkg/sub/__init__.pyc", sub_pyc)
+        zf.writestr("zipimport_pkg/data.txt", "data")
+        zf.writestr("zipimport_pkg/_ext.so", "")
+        zf.writestr("zipimport_pkg-0.1.0.dist-info/METADATA", "Name: zipimport-pkg")
+
+    site = tmp_path / "site"
+    dynlibs = _package_loader.unpack_buffer(
+        _FakeJsBuffer(wheel_data.getvalue()),
+        filename=wheel_name,
+        format="zip",
+        extract_dir=str(site),
+        calculate_dynlibs=True,
+        metadata={"INSTALLER": "pytest"},
+        zipimport=True,
+    )
+    assert dynlibs == [str((site / "zipimport_pkg" / "_ext.so").resolve())]
+    assert (site / "zipimport_pkg" / "data.txt").read_text() == "data"
+    assert (
+        site / "zipimport_pkg-0.1.0.dist-info" / "INSTALLER"
+    ).read_text() == "pytest"
+    assert not (site / "zipimport_pkg" / "__init__.py").exists()
+    assert not (site / "zipimport_pkg" / "mod.py").exists()
+    assert (site / _package_loader.ZIPIMPORT_WHEELS_DIR / wheel_name).is_file()
+
+    try:
+        import zipimport_pkg
+        import zipimport_pkg.mod
+        import zipimport_pkg.sub
+
+        assert zipimport_pkg.__file__ == str(site / "zipimport_pkg" / "__init__.py")
+        assert zipimport_pkg.DATA == "data"
+        assert zipimport_pkg.mod.VALUE == 1
+        assert zipimport_pkg.sub.VALUE == 2
+        assert zipimport_pkg.__path__ == [str(site / "zipimport_pkg")]
+    finally:
+        for name in ["zipimport_pkg", "zipimport_pkg.mod", "zipimport_pkg.sub"]:
+            sys.modules.pop(name, None)
+
+
+def test_extracted_package_cache(monkeypatch, tmp_path):
+    import sys
+
+    from pyodide import _package_loader
+
+    monkeypatch.setattr(_package_loader, "to_js", lambda x: x)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "prefix"))
+
+    wheel_name = "dummy_pkg-0.1.0-py3-none-any.whl"
+    wheel_data = (Path(__file__).parent / "wheels" / wheel_name).read_bytes()
+    cache_dir = tmp_path / "cache"
+    key = "abcdef"
+
+    assert (
+        _package_loader.install_cached_package(
+            cache_dir=str(cache_dir), key=key, extract_dir=str(tmp_path / "site1")
+        )
+        is None
+    )
+
+    _package_loader.cache_package(
+        _FakeJsBuffer(wheel_data),
+        filename=wheel_name,
+        cache_dir=str(cache_dir),
+        key=key,
+        metadata={"INSTALLER": "pytest"},
+    )
+    assert sorted(p.name for p in cache_dir.iterdir()) == [key, f"{key}.json"]
+
+    for site in [tmp_path / "site1", tmp_path / "site2"]:
+        dynlibs = _package_loader.install_cached_package(
+            cache_dir=str(cache_dir), key=key, extract_dir=str(site)
+        )
+        assert dynlibs == []
+        assert not (site / "dummy_pkg").is_symlink()
+        assert (site / "dummy_pkg" / "__init__.py").is_file()
+        dist_info = site / "dummy_pkg-0.1.0.dist-info"
+        assert (dist_info / "INSTALLER").read_text() == "pytest"
+
+    assert (tmp_path / "prefix" / "share" / "datafile").is_file()
+    assert (tmp_path / "prefix" / "etc" / "datafile2").is_file()
+
+    # Writing into an installed package must not modify the cache entry, and
+    # a dangling symlink left by an earlier install must be replaced
+    site = tmp_path / "site1"
+    (site / "dummy_pkg" / "__init__.py").write_text("changed")
+    assert (cache_dir / key / "dummy_pkg" / "__init__.py").read_text() != "changed"
+    shutil.rmtree(site / "dummy_pkg")
+    (site / "dummy_pkg").symlink_to(tmp_path / "missing")
+    _package_loader.install_cached_package(
+        cache_dir=str(cache_dir), key=key, extract_dir=str(site)
+    )
+    assert not (site / "dummy_pkg").is_symlink()
+    assert (site / "dummy_pkg" / "__init__.py").is_file()
+
+    # A second process populating the same entry must not break it
+    _package_loader.cache_package(
+        _FakeJsBuffer(wheel_data),
+        filename=wheel_name,
+        cache_dir=str(cache_dir),
+        key=key,
+    )
+    assert sorted(p.name for p in cache_dir.iterdir()) == [key, f"{key}.json"]
+
+
 def test_find_wheel_metadata_dir():
     from tempfile import NamedTemporaryFile
     from zipfile import ZipFile
@@ -38,6 +38,69 @@ def test_find_imports():
     assert res == []
 
 
+def test_find_imports_cache(monkeypatch):
+    from _pyodide import _base
+
+    source = "import numpy as np\nfrom scipy import sparse\n"
+    res = find_imports(source)
+    assert res == ["numpy", "scipy"]
+    # The result is a copy of the cached one
+    res.append("mutated")
+
+    def dedent(source):
+        raise AssertionError("find_imports should not parse the source")
+
+    with monkeypatch.context() as m:
+        m.setattr(_base, "dedent", dedent)
+        assert find_imports(source) == ["numpy", "scipy"]
+        assert find_imports("x = 1") == []
+
+    # The AST of code that was parsed already can fill the cache
+    source = "import pytz"
+    _base._cache_imports(source, _base._imports_from_ast(CodeRunner(source).ast))
+    assert find_imports(source) == ["pytz"]
+
+    for i in range(_base._IMPORTS_CACHE_SIZE + 1):
+        find_imports(f"import mod{i}")
+    assert len(_base._imports_cache) == _base._IMPORTS_CACHE_SIZE
+    assert "import mod0" not in _base._imports_cache
+
+
+def test_code_cache(monkeypatch):
+    from _pyodide import _base
+
+    monkeypatch.setattr(_base, "code_cache", _base.CodeCache())
+
+    ns: dict[str, Any] = {"x": 1}
+    assert eval_code("x += 1\nx", ns) == 2
+    assert eval_code("x += 1\nx", ns) == 3
+    # The compile options are part of the key
+    assert eval_code("x += 1\nx", ns, return_mode="none") is None
+    assert eval_code("x += 1\nx;", ns) is None
+    assert _base.get_code_cache_stats() == {
+        "hits": 1,
+        "misses": 3,
+        "size": 3,
+        "maxsize": 128,
+    }
+
+    with pytest.raises(SyntaxError):
+        eval_code("x +")
+    assert _base.get_code_cache_stats()["size"] == 3
+
+    _base.set_code_cache_size(1)
+    assert _base.get_code_cache_stats()["size"] == 1
+    # The most recently used code object is kept
+    eval_code("x += 1\nx;", ns)
+    assert _base.get_code_cache_stats()["hits"] == 2
+
+    _base.set_code_cache_size(0)
+    eval_code("x += 1\nx;", ns)
+    assert _base.get_code_cache_stats()["size"] == 0
+    with pytest.raises(ValueError, match="maxsize"):
+        _base.set_code_cache_size(-1)
+
+
 def test_ffi_import_star():
     exec("from pyodide.ffi import *", {})
 
@@ -1541,6 +1604,51 @@ def test_importhook_called_from_pytest(selenium):
     _import_module_using_spec("a.b")
 
 
+def test_bytecode_cache(monkeypatch, tmp_path):
+    import importlib
+
+    from _pyodide import _importhook
+
+    monkeypatch.setattr(sys, "path_hooks", list(sys.path_hooks))
+    monkeypatch.setattr(sys, "path_importer_cache", {})
+    monkeypatch.setattr(sys, "pycache_prefix", sys.pycache_prefix)
+    monkeypatch.setattr(sys, "dont_write_bytecode", sys.dont_write_bytecode)
+    monkeypatch.setattr(
+        _importhook, "bytecode_cache_stats", _importhook.BytecodeCacheStats()
+    )
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+
+    cache_dir = tmp_path / "cache"
+    source = tmp_path / "src" / "bytecode_cache_mod.py"
+    source.parent.mkdir()
+    source.write_text("VALUE = 1")
+
+    _importhook.enable_bytecode_cache(str(cache_dir))
+
+    def import_mod():
+        sys.modules.pop("bytecode_cache_mod", None)
+        importlib.invalidate_caches()
+        return importlib.import_module("bytecode_cache_mod")
+
+    try:
+        assert import_mod().VALUE == 1
+        assert _importhook.get_bytecode_cache_stats() == {"hits": 0, "misses": 1}
+        [pyc] = cache_dir.rglob("*.pyc")
+        # A checked hash-based pyc
+        assert pyc.read_bytes()[4:8] == (0b11).to_bytes(4, "little")
+
+        # The pyc stays valid when the file is extracted again
+        source.write_text("VALUE = 1")
+        assert import_mod().VALUE == 1
+        assert _importhook.get_bytecode_cache_stats() == {"hits": 1, "misses": 1}
+
+        source.write_text("VALUE = 2")
+        assert import_mod().VALUE == 2
+        assert _importhook.get_bytecode_cache_stats() == {"hits": 1, "misses": 2}
+    finally:
+        sys.modules.pop("bytecode_cache_mod", None)
+
+
 def test_args(selenium_standalone_noload):
     selenium = selenium_standalone_noload
     assert selenium.run_js(
@@ -1,6 +1,8 @@
 import pytest
 from pytest_pyodide import run_in_pyodide
 
+from conftest import requires_jspi
+
 
 @pytest.fixture
 def url_notfound(httpserver):
@@ -163,6 +165,351 @@ async def test_pyfetch_unpack_archive(selenium):
     ]
 
 
+@pytest.fixture
+def url_archive(httpserver):
+    import io
+    import tarfile
+
+    data = bytes(range(256)) * 4096
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as archive:
+        info = tarfile.TarInfo("archive/data.bin")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+    httpserver.expect_request("/archive.tar.gz").respond_with_data(
+        buf.getvalue(),
+        content_type="application/gzip",
+        headers={"Access-Control-Allow-Origin": "*"},
+    )
+    return httpserver.url_for("/archive.tar.gz")
+
+
+@run_in_pyodide
+async def test_pyfetch_iter_chunks(selenium, url_archive):
+    import gzip
+    from contextlib import aclosing
+
+    from pyodide.http import pyfetch
+
+    resp = await pyfetch(url_archive)
+    chunks = [chunk async for chunk in resp.iter_chunks()]
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert resp.body_used
+    data = gzip.decompress(b"".join(chunks))
+    assert bytes(range(256)) * 4096 in data
+
+    # Stopping early cancels the rest of the body and releases the stream
+    resp = await pyfetch(url_archive)
+    async with aclosing(resp.iter_chunks()) as chunks:
+        async for _ in chunks:
+            break
+    body = resp.js_response.body
+    assert not body.locked
+    assert (await body.getReader().read()).done
+
+    resp = await pyfetch(url_archive)
+    await resp.stream_to_file("/tmp/archive.tar.gz")
+    with open("/tmp/archive.tar.gz", "rb") as f:
+        assert gzip.decompress(f.read()) == data
+
+
+@run_in_pyodide
+async def test_pyfetch_unpack_archive_streaming(selenium, url_archive):
+    import pathlib
+
+    from pyodide.http import pyfetch
+
+    resp = await pyfetch(url_archive)
+    await resp.unpack_archive(extract_dir="/tmp/unpacked")
+    data = pathlib.Path("/tmp/unpacked/archive/data.bin").read_bytes()
+    assert data == bytes(range(256)) * 4096
+
+
+@requires_jspi
+@run_in_pyodide
+async def test_pyfetch_unpack_archive_stream_paths(selenium, url_archive):
+    import pathlib
+
+    import pyodide.http
+    from pyodide.ffi import can_run_sync
+    from pyodide.http import FetchResponse, pyfetch
+
+    calls = []
+    orig_unpack_tar_stream = FetchResponse._unpack_tar_stream
+
+    async def unpack_tar_stream(self, mode, extract_path):
+        calls.append(mode)
+        await orig_unpack_tar_stream(self, mode, extract_path)
+
+    FetchResponse._unpack_tar_stream = unpack_tar_stream
+    try:
+        # With run_sync the archive is unpacked while it is downloaded
+        assert can_run_sync()
+        resp = await pyfetch(url_archive)
+        await resp.unpack_archive(extract_dir="/tmp/stream")
+        assert calls == ["r|gz"]
+        data = pathlib.Path("/tmp/stream/archive/data.bin").read_bytes()
+        assert data == bytes(range(256)) * 4096
+
+        # Without it, the body goes through a temporary file
+        pyodide.http.can_run_sync = lambda: False
+        resp = await pyfetch(url_archive)
+        await resp.unpack_archive(extract_dir="/tmp/file")
+        assert calls == ["r|gz"]
+        data = pathlib.Path("/tmp/file/archive/data.bin").read_bytes()
+        assert data == bytes(range(256)) * 4096
+    finally:
+        FetchResponse._unpack_tar_stream = orig_unpack_tar_stream
+        pyodide.http.can_run_sync = can_run_sync
+
+
+@pytest.fixture
+def url_wheel(httpserver):
+    from pathlib import Path
+
+    wheel_name = "dummy_pkg-0.1.0-py3-none-any.whl"
+    httpserver.expect_request(f"/{wheel_name}").respond_with_data(
+        (Path(__file__).parent / "wheels" / wheel_name).read_bytes(),
+        headers={"Access-Control-Allow-Origin": "*"},
+    )
+    return httpserver.url_for(f"/{wheel_name}")
+
+
+@run_in_pyodide
+async def test_pyfetch_unpack_archive_wheel(selenium, url_wheel):
+    import pathlib
+    import sys
+
+    from pyodide.http import pyfetch
+
+    resp = await pyfetch(url_wheel)
+    await resp.unpack_archive(extract_dir="/tmp/wheel")
+    assert pathlib.Path("/tmp/wheel/dummy_pkg/__init__.py").is_file()
+    assert (pathlib.Path(sys.prefix) / "share" / "datafile").is_file()
+    assert (pathlib.Path(sys.prefix) / "etc" / "datafile2").is_file()
+
+
+@pytest.fixture
+def url_ranges(httpserver):
+    from werkzeug import Response
+
+    data = bytes(range(256)) * 1024
+
+    def handler(request):
+        headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Content-Length, Content-Range",
+            "Content-Length": str(len(data)),
+        }
+        if request.method == "HEAD":
+            return Response(b"", headers=headers)
+        start, end = map(int, request.headers["Range"][6:].split("-"))
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        headers["Content-Length"] = str(end - start + 1)
+        return Response(data[start : end + 1], status=206, headers=headers)
+
+    httpserver.expect_request("/ranges", method="OPTIONS").respond_with_data(
+        b"",
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Range",
+        },
+    )
+    httpserver.expect_request("/ranges").respond_with_handler(handler)
+    return httpserver.url_for("/ranges")
+
+
+@run_in_pyodide
+async def test_remote_file(selenium, url_ranges):
+    import pytest
+
+    from pyodide.http import RemoteFile
+
+    data = bytes(range(256)) * 1024
+    f = await RemoteFile.open(url_ranges, block_size=4096, cache_size=8)
+    assert f.seekable()
+    assert await f.size_async() == len(data)
+
+    f.seek(10_000)
+    assert await f.read_async(100) == data[10_000:10_100]
+    assert f.tell() == 10_100
+    # The block and the one after it were fetched with one request
+    assert f.requests == 1
+    assert await f.read_async(4000) == data[10_100:14_100]
+    assert f.requests == 1
+
+    buf = bytearray(50)
+    f.seek(len(data) - 50)
+    assert await f.readinto_async(buf) == 50
+    assert buf == data[-50:]
+    assert await f.read_async() == b""
+
+    f.seek(0)
+    assert await f.read_async() == data
+
+    f.close()
+    with pytest.raises(ValueError):
+        await f.read_async()
+
+
+@pytest.fixture
+def url_cached(httpserver):
+    from werkzeug import Response
+
+    cors = {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "ETag",
+        "Access-Control-Allow-Headers": "If-None-Match",
+    }
+
+    def handler(request):
+        headers = {**cors, "ETag": '"v1"'}
+        if request.path.endswith("/fresh"):
+            headers["Cache-Control"] = "max-age=3600"
+        else:
+            headers["Cache-Control"] = "no-cache"
+        if request.headers.get("If-None-Match") == '"v1"':
+            return Response(status=304, headers=headers)
+        return Response(b"reference data", headers=headers)
+
+    httpserver.expect_request("/cached/fresh", method="OPTIONS").respond_with_data(
+        b"", headers=cors
+    )
+    httpserver.expect_request("/cached/stale", method="OPTIONS").respond_with_data(
+        b"", headers=cors
+    )
+    httpserver.expect_request("/cached/fresh").respond_with_handler(handler)
+    httpserver.expect_request("/cached/stale").respond_with_handler(handler)
+    return httpserver.url_for("/cached")
+
+
+@run_in_pyodide
+async def test_response_cache(selenium, url_cached):
+    from pyodide.http import ResponseCache
+
+    cache = ResponseCache(directory="/tmp/http-cache")
+    for _ in range(3):
+        resp = await cache.fetch(url_cached + "/fresh")
+        assert await resp.text() == "reference data"
+    for _ in range(2):
+        resp = await cache.fetch(url_cached + "/stale")
+        assert resp.status == 200
+        assert await resp.text() == "reference data"
+    assert cache.stats() == {
+        "hits": 3,
+        "misses": 2,
+        "revalidated": 1,
+        "bytes_saved": 3 * len("reference data"),
+        "size": 2 * len("reference data"),
+        "max_size": 64 << 20,
+    }
+
+    # The responses are still there in a new session
+    cache = ResponseCache(directory="/tmp/http-cache")
+    resp = await cache.fetch(url_cached + "/fresh")
+    assert await resp.text() == "reference data"
+    assert cache.hits == 1
+
+    # Responses are cached separately for different request headers
+    cache = ResponseCache()
+    resp = await cache.fetch(url_cached + "/fresh")
+    assert resp.url == url_cached + "/fresh"
+    await cache.fetch(url_cached + "/fresh", headers={"Accept": "text/plain"})
+    assert cache.misses == 2
+    await cache.fetch(url_cached + "/fresh", headers={"accept": "text/plain"})
+    assert cache.hits == 1
+    # Range requests are not cached
+    await cache.fetch(url_cached + "/fresh", headers={"Range": "bytes=0-3"})
+    assert cache.stats()["size"] == 2 * len("reference data")
+
+    cache = ResponseCache(max_size=5)
+    await cache.fetch(url_cached + "/fresh")
+    await cache.fetch(url_cached + "/fresh")
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["size"] == 0
+
+
+@pytest.fixture
+def url_pool(httpserver):
+    from werkzeug import Response
+
+    failures = {"flaky": 1}
+
+    def handler(request):
+        name = request.path.rsplit("/", 1)[-1]
+        headers = {"Access-Control-Allow-Origin": "*"}
+        if failures.get(name):
+            failures[name] -= 1
+            return Response(b"", status=503, headers=headers)
+        return Response(name.encode(), headers=headers)
+
+    httpserver.expect_request("/pool/flaky").respond_with_handler(handler)
+    for i in range(20):
+        httpserver.expect_request(f"/pool/{i}").respond_with_handler(handler)
+    return httpserver.url_for("/pool")
+
+
+@run_in_pyodide
+async def test_gather_fetch(selenium, url_pool):
+    from pyodide.http import FetchPool, gather_fetch
+
+    urls = [f"{url_pool}/{i}" for i in range(20)]
+    responses = await gather_fetch(urls, max_concurrency=4, backoff=0.01)
+    assert [await resp.text() for resp in responses] == [str(i) for i in range(20)]
+
+    pool = FetchPool(2, backoff=0.01)
+    responses = await pool.gather([f"{url_pool}/flaky"] * 3)
+    assert [resp.status for resp in responses] == [200] * 3
+    assert [await resp.text() for resp in responses] == ["flaky"] * 3
+
+    results = {}
+    async for url, resp in pool.as_completed(urls[:5]):
+        results[url] = await resp.text()
+    assert results == {url: str(i) for i, url in enumerate(urls[:5])}
+
+
+@run_in_pyodide
+async def test_fetch_pool_cancel(selenium):
+    import asyncio
+
+    import pytest
+
+    import pyodide.http
+    from pyodide.http import FetchPool
+
+    calls = []
+
+    async def fake_pyfetch(url, **kwargs):
+        calls.append(url)
+        if url.endswith("fail"):
+            raise OSError("failed")
+        await asyncio.sleep(0.2 if "//slow/" in url else 0.01)
+        return url
+
+    orig_pyfetch = pyodide.http.pyfetch
+    pyodide.http.pyfetch = fake_pyfetch
+    try:
+        # A slow host doesn't hold up the others
+        pool = FetchPool(8, max_per_host=2)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        slow = asyncio.gather(*(pool.fetch(f"http://slow/{i}") for i in range(8)))
+        await pool.fetch("http://fast/0")
+        assert loop.time() - start < 0.1
+        await slow
+
+        # When one request fails, the ones that are waiting are not made
+        calls.clear()
+        pool = FetchPool(1, retries=0)
+        urls = ["http://host/fail"] + [f"http://host/{i}" for i in range(4)]
+        with pytest.raises(OSError, match="failed"):
+            await pool.gather(urls)
+        await asyncio.sleep(0.1)
+        assert len(calls) <= 2
+    finally:
+        pyodide.http.pyfetch = orig_pyfetch
+
+
 @pytest.mark.xfail_browsers(node="XMLHttpRequest is not available in node")
 def test_pyfetch_headers(selenium, httpserver):
     httpserver.expect_oneshot_request("/test_pyfetch_headers").respond_with_data(
@@ -255,3 +255,102 @@ def test_syncify_in_snapshot_load(selenium_standalone_noload):
         `)
         """
     )
+
+
+def test_snapshot_loaded_packages(selenium_standalone_noload):
+    """A snapshot contains the files of the loaded packages and their shared
+    libraries are loaded again at the same place when it is restored."""
+    selenium = selenium_standalone_noload
+    selenium.run_js(
+        """
+        const py1 = await loadPyodide({_makeSnapshot: true});
+        await py1.loadPackage(["pytz", "numpy"]);
+        py1.runPython(`
+            import numpy as np
+            import pytz
+
+            a = np.arange(10)
+        `);
+        const snapshot = py1.makeMemorySnapshot();
+        const py2 = await loadPyodide({_loadSnapshot: snapshot, _makeSnapshot: true});
+        assert(() => py2.loadedPackages.numpy !== undefined);
+        assert(() => py2.loadedPackages.pytz !== undefined);
+        py2.runPython(`
+            assert a.sum() == 45
+            assert (np.ones(3) * 2).tolist() == [2, 2, 2]
+            assert pytz.utc.zone == "UTC"
+            # The files are there too
+            import numpy.polynomial
+        `);
+        const snapshot2 = py2.makeMemorySnapshot();
+        const py3 = await loadPyodide({_loadSnapshot: snapshot2});
+        py3.runPython(`
+            assert (a * 2).sum() == 90
+        `);
+        """
+    )
+
+
+def test_snapshot_zero_pages(selenium_standalone_noload):
+    """Pages of memory that are all zeros are not stored in the snapshot."""
+    selenium = selenium_standalone_noload
+    selenium.run_js(
+        """
+        const py1 = await loadPyodide({_makeSnapshot: true});
+        py1.runPython("x = 7");
+        const snapshot = py1.makeMemorySnapshot();
+        assert(() => snapshot.length < py1._module.HEAPU8.length);
+        const py2 = await loadPyodide({_loadSnapshot: snapshot});
+        assert(() => py2._module.HEAPU8.length === py1._module.HEAPU8.length);
+        assert(() => py2.runPython("x") === 7);
+        """
+    )
+
+
+def test_snapshot_delta(selenium_standalone_noload):
+    selenium = selenium_standalone_noload
+    selenium.run_js(
+        """
+        const py1 = await loadPyodide({_makeSnapshot: true});
+        py1.runPython("x = 1");
+        const base = py1.makeMemorySnapshot();
+        py1.runPython("y = list(range(1000))");
+        const delta = py1.makeMemorySnapshot({ base });
+        assert(() => delta.length < base.length);
+        const py2 = await loadPyodide({_loadSnapshot: delta, _snapshotBase: base});
+        assert(() => py2.runPython("x + sum(y)") === 1 + 499500);
+        """
+    )
+
+
+def test_snapshot_delta_needs_base(selenium_standalone_noload):
+    selenium = selenium_standalone_noload
+    match = "The snapshot is a delta, pass its base snapshot as _snapshotBase"
+    with pytest.raises(selenium.JavascriptException, match=match):
+        selenium.run_js(
+            """
+            const py1 = await loadPyodide({_makeSnapshot: true});
+            const base = py1.makeMemorySnapshot();
+            const delta = py1.makeMemorySnapshot({ base });
+            await loadPyodide({_loadSnapshot: delta});
+            """
+        )
+
+
+def test_snapshot_gzip(selenium_standalone_noload):
+    selenium = selenium_standalone_noload
+    selenium.run_js(
+        """
+        const py1 = await loadPyodide({_makeSnapshot: true});
+        py1.runPython("x = 7");
+        const snapshot = py1.makeMemorySnapshot();
+        const compressed = new Uint8Array(
+          await new Response(
+            new Blob([snapshot]).stream().pipeThrough(new CompressionStream("gzip")),
+          ).arrayBuffer(),
+        );
+        assert(() => compressed.length < snapshot.length);
+        const py2 = await loadPyodide({_loadSnapshot: compressed});
+        assert(() => py2.runPython("x") === 7);
+        """
+    )
@@ -533,3 +533,55 @@ async def test_create_task_context(selenium):
 
     task = aio.create_task(get_cvar(), context=ctx_with_1)
     assert await task == 1
+
+
+@run_in_pyodide
+async def test_call_soon_ready_queue(selenium):
+    import asyncio
+
+    from pyodide.webloop import WebLoop
+
+    loop: WebLoop = asyncio.get_event_loop()  # type: ignore[assignment]
+    result: list[int] = []
+    handles = [loop.call_soon(result.append, i) for i in range(100)]
+    handles[50].cancel()
+    await asyncio.sleep(0)
+    assert result == [i for i in range(100) if i != 50]
+
+    # With no time budget every drain runs one callback and yields
+    result.clear()
+    loop.ready_time_budget = 0
+    try:
+        for i in range(10):
+            loop.call_soon(result.append, i)
+        await asyncio.sleep(0)
+        assert result == list(range(10))
+    finally:
+        del loop.ready_time_budget
+
+
+@run_in_pyodide
+async def test_timer_heap(selenium):
+    import asyncio
+
+    from pyodide.webloop import WebLoop
+
+    loop: WebLoop = asyncio.get_event_loop()  # type: ignore[assignment]
+    result: list[float] = []
+    for delay in [0.03, 0.01, 0.02]:
+        loop.call_later(delay, result.append, delay)
+
+    handles = [loop.call_later(10, result.append, -1) for _ in range(200)]
+    for h in handles:
+        h.cancel()
+    # Cancelled handles are dropped from the heap once they are the majority
+    assert len(loop._scheduled) < 100
+
+    await asyncio.sleep(0.1)
+    assert result == [0.01, 0.02, 0.03]
+
+    h = loop.call_at(loop.time() + 0.01, result.append, 0)
+    assert h.when() > loop.time()
+    h.cancel()
+    await asyncio.sleep(0.05)
+    assert result == [0.01, 0.02, 0.03]
@@ -0,0 +1,110 @@
+import json
+import sys
+from pathlib import Path
+from zipfile import ZipFile
+
+sys.path.append(str(Path(__file__).parents[1]))
+from write_package_manifests import get_needed_libs, make_manifest, write_manifests
+
+
+def _uleb128(value: int) -> bytes:
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def _name(name: str) -> bytes:
+    return _uleb128(len(name)) + name.encode()
+
+
+def make_dylib(needed: list[str]) -> bytes:
+    # mem_info subsection followed by the needed subsection
+    mem_info = b"\x01" + _uleb128(4) + b"\x00\x00\x00\x00"
+    needed_payload = _uleb128(len(needed)) + b"".join(_name(lib) for lib in needed)
+    needed_subsection = b"\x02" + _uleb128(len(needed_payload)) + needed_payload
+    section = _name("dylink.0") + mem_info + needed_subsection
+    return b"\0asm\x01\0\0\0" + b"\x00" + _uleb128(len(section)) + section
+
+
+def test_get_needed_libs():
+    assert get_needed_libs(make_dylib([])) == []
+    assert get_needed_libs(make_dylib(["libz.so", "libfoo.so"])) == [
+        "libz.so",
+        "libfoo.so",
+    ]
+    assert get_needed_libs(b"not a wasm module") == []
+
+
+def test_write_manifests(tmp_path):
+    with ZipFile(tmp_path / "foo-1.0-cp313-cp313-pyodide_2025_0_wasm32.whl", "w") as zf:
+        zf.writestr("foo/__init__.py", "")
+        zf.writestr(
+            "foo/_core.cpython-313-wasm32-emscripten.so",
+            make_dylib(["libfoo.so", "libc.so"]),
+        )
+        zf.writestr("foo.libs/libfoo.so", make_dylib([]))
+        zf.writestr("foo/_other.cpython-311-x86_64-linux-gnu.so", b"")
+        zf.writestr("foo-1.0.dist-info/METADATA", "")
+        zf.writestr("foo-1.0.data/data/share/foo.txt", "")
+
+    lockfile = {
+        "info": {"arch": "wasm32", "platform": "", "version": "", "python": "3.13.1"},
+        "packages": {
+            "foo": {
+                "name": "foo",
+                "version": "1.0",
+                "file_name": "foo-1.0-cp313-cp313-pyodide_2025_0_wasm32.whl",
+                "install_dir": "site",
+                "sha256": "abc",
+            },
+            "bar": {
+                "name": "bar",
+                "version": "1.0",
+                "file_name": "bar-1.0-py3-none-any.whl",
+                "install_dir": "site",
+                "sha256": "def",
+            },
+        },
+    }
+    (tmp_path / "pyodide-lock.json").write_text(json.dumps(lockfile))
+
+    output = write_manifests(tmp_path)
+
+    manifests = json.loads(output.read_text())
+    assert manifests == {
+        "foo": {
+            "sha256": "abc",
+            "dist_info_dir": "foo-1.0.dist-info",
+            "data_dir": "foo-1.0.data",
+            "dynlibs": [
+                "foo.libs/libfoo.so",
+                "foo/_core.cpython-313-wasm32-emscripten.so",
+            ],
+            "needed": {
+                "foo.libs/libfoo.so": [],
+                "foo/_core.cpython-313-wasm32-emscripten.so": [
+                    "foo.libs/libfoo.so",
+                    "libc.so",
+                ],
+            },
+        }
+    }
+
+
+def test_make_manifest_cycle(tmp_path, capsys):
+    wheel_path = tmp_path / "foo-1.0-cp313-cp313-pyodide_2025_0_wasm32.whl"
+    with ZipFile(wheel_path, "w") as zf:
+        zf.writestr("foo/liba.so", make_dylib(["libb.so"]))
+        zf.writestr("foo/libb.so", make_dylib(["liba.so"]))
+        zf.writestr("foo-1.0.dist-info/METADATA", "")
+
+    manifest = make_manifest(wheel_path, "abc", [""])
+
+    assert manifest["dynlibs"] == ["foo/liba.so", "foo/libb.so"]
+    assert "need each other" in capsys.readouterr().err
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+Write package-manifests.json next to pyodide-lock.json.
+
+For each zip or wheel in the lock file, the manifest records the names of the
+.dist-info and .data directories and the shared libraries in the order they
+need to be loaded together with the libraries they need. loadPackage uses the
+manifest to skip searching the extracted files for these.
+
+The lock file schema doesn't allow extra keys, which is why this is a separate
+file. Entries are keyed by the normalized package name and record the sha256
+of the wheel so that a manifest never gets applied to a different wheel.
+
+Usage:
+  write_package_manifests.py dist
+"""
+
+import argparse
+import json
+import sys
+from graphlib import CycleError, TopologicalSorter
+from pathlib import Path, PurePosixPath
+from typing import Any
+from zipfile import ZipFile
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src" / "py"))
+from pyodide._package_loader import (
+    DATA_FILES_DIR_SUFFIX,
+    DIST_INFO_DIR_SUFFIX,
+    find_wheel_metadata_dir,
+    should_load_dynlib,
+)
+
+MANIFEST_FILE = "package-manifests.json"
+WASM_MAGIC = b"\0asm"
+# https://github.com/WebAssembly/tool-conventions/blob/main/DynamicLinking.md
+WASM_DYLINK_NEEDED = 2
+
+
+def _read_uleb128(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def get_needed_libs(binary: bytes) -> list[str]:
+    """Read the names of the shared libraries a wasm module depends on from its
+    dylink.0 section. Returns an empty list if it isn't a wasm shared library."""
+    if binary[:4] != WASM_MAGIC or len(binary) <= 8:
+        return []
+
+    # The dylink.0 section has to be the first section of the module.
+    pos = 8
+    section_id = binary[pos]
+    if section_id != 0:
+        return []
+    section_size, pos = _read_uleb128(binary, pos + 1)
+    section_end = pos + section_size
+    name_len, pos = _read_uleb128(binary, pos)
+    if binary[pos : pos + name_len] != b"dylink.0":
+        return []
+    pos += name_len
+
+    while pos < section_end:
+        subsection_type = binary[pos]
+        subsection_size, pos = _read_uleb128(binary, pos + 1)
+        if subsection_type != WASM_DYLINK_NEEDED:
+            pos += subsection_size
+            continue
+        count, pos = _read_uleb128(binary, pos)
+        needed = []
+        for _ in range(count):
+            length, pos = _read_uleb128(binary, pos)
+            needed.append(binary[pos : pos + length].decode())
+            pos += length
+        return needed
+    return []
+
+
+def make_manifest(
+    wheel_path: Path, sha256: str, extension_tags: list[str]
+) -> dict[str, Any]:
+    with ZipFile(wheel_path) as archive:
+        names = archive.namelist()
+        dynlibs = [name for name in names if should_load_dynlib(name, extension_tags)]
+        needed = {name: get_needed_libs(archive.read(name)) for name in dynlibs}
+
+    # Resolve the needed libraries that are shipped in the wheel to their
+    # locations, the others are left as is.
+    by_basename = {PurePosixPath(name).name: name for name in dynlibs}
+    needed = {
+        name: [by_basename.get(lib, lib) for lib in libs]
+        for name, libs in needed.items()
+    }
+    # Load the libraries that others depend on first.
+    graph = {
+        name: [lib for lib in libs if lib in needed] for name, libs in needed.items()
+    }
+    try:
+        order = list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        print(
+            f"Warning: {wheel_path.name}: the shared libraries {' -> '.join(e.args[1])} "
+            "need each other, loading them in file order",
+            file=sys.stderr,
+        )
+        order = dynlibs
+
+    return {
+        "sha256": sha256,
+        "dist_info_dir": find_wheel_metadata_dir(names, DIST_INFO_DIR_SUFFIX),
+        "data_dir": find_wheel_metadata_dir(names, DATA_FILES_DIR_SUFFIX),
+        "dynlibs": order,
+        "needed": needed,
+    }
+
+
+def write_manifests(dist_dir: Path) -> Path:
+    lockfile = json.loads((dist_dir / "pyodide-lock.json").read_text())
+    python_version = "".join(lockfile["info"]["python"].split(".")[:2])
+    extension_tags = [f".cpython-{python_version}-wasm32-emscripten", ".abi3", ""]
+
+    manifests = {}
+    for name, pkg in lockfile["packages"].items():
+        wheel_path = dist_dir / pkg["file_name"]
+        if wheel_path.suffix not in {".whl", ".zip"} or not wheel_path.exists():
+            continue
+        manifests[name] = make_manifest(wheel_path, pkg["sha256"], extension_tags)
+
+    output = dist_dir / MANIFEST_FILE
+    output.write_text(json.dumps(manifests, sort_keys=True))
+    return output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "dist_dir",
+        type=Path,
+        help="The directory containing pyodide-lock.json and the packages",
+    )
+    args = parser.parse_args()
+    output = write_manifests(args.dist_dir)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()